@@ -0,0 +1,141 @@
+"""Генератор синтетических датасетов в схеме freelancer_earnings_bd.csv.
+
+Распределения берутся из исходного CSV: категории — с их частотами,
+числовые поля — по эмпирической функции распределения (с интерполяцией
+между соседними значениями и той же точностью округления).
+
+    python -m bench.generate --rows 1000000 --out .cache/bench/freelancers_1000000.csv
+"""
+import argparse, csv, os, random
+from bisect import bisect
+from itertools import accumulate
+from typing import Dict, Iterator, List, NamedTuple, Optional, Sequence
+from core.columns import CATEGORICAL_COLUMNS
+from core.config import settings
+
+ID_COLUMN = 'Freelancer_ID'
+_WRITE_BATCH = 10000
+
+
+class NumericProfile(NamedTuple):
+    values: List[float] # отсортированные значения исходной колонки
+    decimals: int
+
+
+class CategoricalProfile(NamedTuple):
+    values: List[str]
+    cum_weights: List[int]
+
+
+class DatasetProfile(NamedTuple):
+    header: List[str]
+    numeric: Dict[str, NumericProfile]
+    categorical: Dict[str, CategoricalProfile]
+
+
+def _decimals(raw: str) -> int:
+    return len(raw) - raw.index('.') - 1 if '.' in raw else 0
+
+
+def profile_dataset(path: str = settings.csv_path) -> DatasetProfile:
+    """Снимает распределения колонок исходного CSV."""
+    with open(path, 'r', encoding='utf-8') as f:
+        reader = csv.DictReader(f)
+        header = list(reader.fieldnames or [])
+        rows = list(reader)
+    numeric, categorical = {}, {}
+    for column in header:
+        if column == ID_COLUMN:
+            continue
+        raw = [row[column] for row in rows]
+        if column in CATEGORICAL_COLUMNS:
+            counts: Dict[str, int] = {}
+            for value in raw:
+                counts[value] = counts.get(value, 0) + 1
+            values = list(counts)
+            categorical[column] = CategoricalProfile(values, list(accumulate(counts[v] for v in values)))
+        else:
+            parsed = [(float(value), _decimals(value)) for value in raw if value.strip()]
+            numeric[column] = NumericProfile(sorted(v for v, _ in parsed), max(d for _, d in parsed))
+    return DatasetProfile(header, numeric, categorical)
+
+
+def _sample_numeric(rng: random.Random, column: NumericProfile) -> str:
+    values = column.values
+    position = rng.random() * (len(values) - 1)
+    i = int(position)
+    low = values[i]
+    high = values[min(i + 1, len(values) - 1)]
+    value = low + (high - low) * (position - i)
+    return f'{value:.{column.decimals}f}' if column.decimals else str(int(round(value)))
+
+
+def _sample_categorical(rng: random.Random, column: CategoricalProfile) -> str:
+    return column.values[bisect(column.cum_weights, rng.random() * column.cum_weights[-1])]
+
+
+def generate_rows(profile: DatasetProfile, rows: int, seed: int = 0) -> Iterator[List[str]]:
+    rng = random.Random(seed)
+    for i in range(rows):
+        row = []
+        for column in profile.header:
+            if column == ID_COLUMN:
+                row.append(str(i + 1))
+            elif column in profile.categorical:
+                row.append(_sample_categorical(rng, profile.categorical[column]))
+            else:
+                row.append(_sample_numeric(rng, profile.numeric[column]))
+        yield row
+
+
+def write_dataset(
+    out: str, rows: int, seed: int = 0, profile: Optional[DatasetProfile] = None, source: str = settings.csv_path
+) -> str:
+    """Пишет CSV из rows строк (атомарно через replace) и возвращает путь."""
+    profile = profile or profile_dataset(source)
+    directory = os.path.dirname(out)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f'{out}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f, lineterminator='\n')
+        writer.writerow(profile.header)
+        batch = []
+        for row in generate_rows(profile, rows, seed):
+            batch.append(row)
+            if len(batch) == _WRITE_BATCH:
+                writer.writerows(batch)
+                batch.clear()
+        writer.writerows(batch)
+    os.replace(tmp_path, out)
+    return out
+
+
+def dataset_path(rows: int, directory: str = '.cache/bench') -> str:
+    return os.path.join(directory, f'freelancers_{rows}.csv')
+
+
+def parse_rows(value: str) -> int:
+    """'10k' -> 10000, '1M' -> 1000000."""
+    value = value.strip().lower()
+    multiplier = {'k': 1_000, 'm': 1_000_000}.get(value[-1:], 1)
+    return int(float(value.rstrip('km')) * multiplier)
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Генерация синтетического датасета фрилансеров')
+    parser.add_argument('--rows', type=parse_rows, required=True, help='число строк: 10000, 10k, 1M')
+    parser.add_argument('--out', help='путь к CSV (по умолчанию .cache/bench/freelancers_<rows>.csv)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--source', default=settings.csv_path, help='CSV, с которого снимаются распределения')
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    args = parse_args(argv)
+    out = write_dataset(args.out or dataset_path(args.rows), args.rows, args.seed, source=args.source)
+    print(out)
+
+
+if __name__ == '__main__':
+    main()
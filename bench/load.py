@@ -0,0 +1,163 @@
+"""Нагрузочный тест сервера аналитики (server.py): пропускная способность и p50/p99 задержки.
+
+По умолчанию поднимает сервер в этом же процессе с моделью-заглушкой: заглушка
+ждёт --latency секунд (имитация LLM) и вызывает инструмент query, так что
+меряются сервер, граф агента и DataAnalyzer без сети и ключей провайдера.
+
+    python -m bench.load --requests 500 --concurrency 16 --latency 0.05
+    python -m bench.load --url http://127.0.0.1:8765 --requests 100
+    python -m bench.load --unix /tmp/freelance-analytics.sock
+"""
+import argparse, http.client, json, socket, sys, threading, time, uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence
+from urllib.parse import urlparse
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+# Вопросы и вызовы инструмента, которыми отвечает заглушка (по кругу)
+QUESTIONS = [
+    ('Средний доход по регионам', {'metric': 'earnings', 'group_by': 'region'}),
+    ('Сколько экспертов по платформам', {
+        'aggregate': 'count', 'group_by': 'platform', 'filters': [{'field': 'experience', 'op': '==', 'value': 'Expert'}]}),
+    ('Максимальная ставка по категориям', {'metric': 'hourly_rate', 'aggregate': 'max', 'group_by': 'category'}),
+]
+
+
+class StubModel(BaseChatModel):
+    """Модель-заглушка: после паузы latency вызывает query с аргументами по тексту вопроса."""
+    latency: float = 0.05
+
+    @property
+    def _llm_type(self) -> str:
+        return 'stub'
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        time.sleep(self.latency)
+        question = messages[-1].content
+        args = next((args for text, args in QUESTIONS if text == question), QUESTIONS[0][1])
+        message = AIMessage(
+            content='',
+            tool_calls=[{'name': 'query', 'args': args, 'id': f'call_{uuid.uuid4().hex[:8]}'}],
+            response_metadata={'token_usage': {'total_tokens': 0}},
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path: str) -> None:
+        super().__init__('localhost')
+        self._path = path
+
+    def connect(self) -> None:
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self._path)
+
+
+def percentile(samples: Sequence[float], q: float) -> float:
+    """Перцентиль по ближайшему рангу."""
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, max(0, int(round(q / 100 * len(ordered))) - 1))]
+
+
+def run_load(connect, requests: int, concurrency: int) -> Dict[str, Any]:
+    """requests запросов /v1/chat из concurrency клиентов; у каждого клиента своя сессия и keep-alive соединение."""
+    local = threading.local()
+    latencies: List[float] = []
+    errors = 0
+    lock = threading.Lock()
+
+    def one(i: int) -> None:
+        nonlocal errors
+        if not hasattr(local, 'conn'):
+            local.conn, local.thread_id = connect(), uuid.uuid4().hex
+        body = json.dumps({'message': QUESTIONS[i % len(QUESTIONS)][0], 'thread_id': local.thread_id})
+        start = time.perf_counter()
+        try:
+            local.conn.request('POST', '/v1/chat', body=body.encode('utf-8'), headers={'Content-Type': 'application/json'})
+            response = local.conn.getresponse()
+            payload = json.loads(response.read())
+            ok = response.status == 200 and not payload.get('error')
+        except (OSError, http.client.HTTPException, ValueError):
+            local.conn.close()
+            local.conn, ok = connect(), False
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            errors += not ok
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(requests)))
+    wall = time.perf_counter() - start
+    return {
+        'requests': requests,
+        'concurrency': concurrency,
+        'errors': errors,
+        'wall_s': round(wall, 3),
+        'throughput_rps': round(requests / wall, 2),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p90_ms': round(percentile(latencies, 90) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+        'max_ms': round(max(latencies) * 1000, 2),
+    }
+
+
+def start_stub_server(latency: float):
+    """Сервер с моделью-заглушкой на свободном порту в фоновом потоке."""
+    import server
+    server.main.analyzer.preload()
+    httpd = server.make_server(server.build_app(StubModel(latency=latency), 'system', answer_cache=False), port=0)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Нагрузочный тест сервера аналитики')
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--latency', type=float, default=0.05, help='задержка модели-заглушки, сек')
+    parser.add_argument('--url', help='уже запущенный сервер (http://host:port) вместо встроенного с заглушкой')
+    parser.add_argument('--unix', metavar='PATH', help='уже запущенный сервер на Unix-сокете')
+    parser.add_argument('--out', help='JSON с результатами')
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    args = parse_args(argv)
+    httpd = None
+    if args.unix:
+        connect = lambda: UnixHTTPConnection(args.unix)
+    else:
+        if args.url:
+            url = urlparse(args.url)
+            host, port = url.hostname, url.port or 80
+        else:
+            httpd = start_stub_server(args.latency)
+            host, port = httpd.server_address[:2]
+        connect = lambda: http.client.HTTPConnection(host, port, timeout=60)
+    try:
+        report = run_load(connect, args.requests, args.concurrency)
+    finally:
+        if httpd is not None:
+            httpd.shutdown()
+            httpd.server_close()
+    if httpd is not None:
+        report['stub_latency_s'] = args.latency
+    print(
+        f'{report["requests"]} запросов, {report["concurrency"]} клиентов: {report["throughput_rps"]} запр/сек, '
+        f'p50 {report["p50_ms"]} мс, p99 {report["p99_ms"]} мс, ошибок {report["errors"]}',
+        file=sys.stderr,
+    )
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    print(json.dumps(report))
+
+
+if __name__ == '__main__':
+    main()
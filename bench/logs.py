@@ -0,0 +1,108 @@
+"""Цена логирования на горячих путях: синхронные файловые обработчики против очереди.
+
+Для каждого сценария — время вызова в вызывающем потоке (мкс) в режимах:
+off — логирование выключено (база), sync — прежние TimedRotatingFileHandler
+прямо в логгерах, queue — QueueHandler и фоновый QueueListener (core/logger.py).
+total_us дополнительно включает дописывание очереди после цикла.
+trim_debug — sync с дампом стека сообщений на каждый вызов модели, как было раньше на INFO.
+
+    python -m bench.logs --calls 20000
+"""
+import argparse, json, logging, os, sys, tempfile, time
+from typing import Any, Callable, Dict, Optional, Sequence
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from core import logger as log_setup
+from main import TOOLS, LLMAgent, analyzer
+from bench.load import StubModel
+
+MODES = ('off', 'sync', 'queue', 'trim_debug')
+
+
+def make_history(turns: int):
+    messages = []
+    for i in range(turns):
+        call_id = f'call_{i}'
+        messages += [
+            HumanMessage(content=f'Вопрос {i}: средний доход по регионам'),
+            AIMessage(content='', tool_calls=[{'name': 'query', 'args': {'metric': 'earnings'}, 'id': call_id}]),
+            ToolMessage(content='Среднее earnings по region:\n' + 'Asia: 5000.00\n' * 5, tool_call_id=call_id),
+        ]
+    return messages
+
+
+def configure(mode: str) -> None:
+    logging.disable(logging.CRITICAL if mode == 'off' else logging.NOTSET)
+    log_setup.setup_logging(use_queue=mode == 'queue')
+    logging.getLogger('trim_logger').setLevel(logging.DEBUG if mode == 'trim_debug' else logging.INFO)
+
+
+def measure(call: Callable[[], Any], calls: int) -> Dict[str, float]:
+    call()
+    start = time.perf_counter()
+    for _ in range(calls):
+        call()
+    caller = time.perf_counter() - start
+    # Дожидаемся записи очереди, затем включаем её снова
+    queued = log_setup._listener is not None
+    log_setup.flush_logging()
+    total = time.perf_counter() - start
+    if queued:
+        log_setup.setup_logging()
+    return {'caller_us': round(caller / calls * 1e6, 2), 'total_us': round(total / calls * 1e6, 2)}
+
+
+def run(calls: int, turns: int) -> Dict[str, Dict[str, Dict[str, float]]]:
+    agent = LLMAgent(StubModel(latency=0), 'system', TOOLS)
+    history = make_history(turns)
+    raw = logging.getLogger('main_logger')
+    scenarios = {
+        'logger.info': lambda: raw.info('Ответ получен за %.3f сек', 0.125),
+        'analyzer_method': analyzer.income_by_region,
+        'trim_history': lambda: agent._trim_history(history),
+    }
+    report = {}
+    for name, call in scenarios.items():
+        report[name] = {}
+        for mode in MODES:
+            configure(mode)
+            report[name][mode] = measure(call, calls)
+    configure('queue')
+    return report
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Цена логирования на горячих путях')
+    parser.add_argument('--calls', type=int, default=20000)
+    parser.add_argument('--turns', type=int, default=10, help='ходов в истории для trim_history')
+    parser.add_argument('--out', help='JSON с результатами')
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    args = parse_args(argv)
+    # Датасет грузится до смены каталога: путь к CSV относительный
+    analyzer.get()
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        # Логи бенчмарка пишутся во временный каталог, а не в logs/ проекта
+        for sub_dir in log_setup.sub_dirs:
+            os.makedirs(os.path.join(tmp, log_setup.base_dir, sub_dir))
+        os.chdir(tmp)
+        try:
+            report = run(args.calls, args.turns)
+        finally:
+            log_setup.flush_logging()
+            os.chdir(cwd)
+    for name, modes in report.items():
+        base = modes['off']['caller_us']
+        print(name + ': ' + ', '.join(
+            f'{mode} {m["caller_us"]:.2f} мкс (+{m["caller_us"] - base:.2f}, с дописыванием {m["total_us"]:.2f})'
+            for mode, m in modes.items()), file=sys.stderr)
+    if args.out:
+        with open(os.path.join(cwd, args.out), 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    print(json.dumps(report))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""Ускорение параллельного разбора CSV в зависимости от числа процессов.
+
+    python -m bench.parse --rows 1M --workers 1,2,4,8,16,32
+"""
+import argparse, csv, json, os, sys, time
+from typing import Any, Dict, List, Optional, Sequence
+from bench.generate import dataset_path, parse_rows, write_dataset
+from core.csv_reader import parse_parallel, read_lines
+from core.columns import ColumnStore
+
+
+def parse_serial(path: str) -> ColumnStore:
+    # Тот же путь, что и DataAnalyzer._load_csv при parse_workers=1
+    return ColumnStore.from_rows(csv.DictReader(read_lines(path)))
+
+
+def measure(path: str, workers: Sequence[int], repeat: int = 1) -> List[Dict[str, Any]]:
+    results = []
+    baseline = None
+    for count in workers:
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            store = parse_serial(path) if count == 1 else parse_parallel(path, None, count)
+            best = min(best, time.perf_counter() - start)
+        baseline = baseline or best
+        results.append({
+            'workers': count,
+            'rows': len(store),
+            'seconds': round(best, 4),
+            'speedup': round(baseline / best, 2),
+        })
+        print(f'{count:>3} процессов: {best:.2f} сек, ускорение x{baseline / best:.2f}', file=sys.stderr)
+    return results
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    cores = os.cpu_count() or 1
+    default_workers = ','.join(str(n) for n in (1, 2, 4, 8, 16, 32) if n <= cores) or '1'
+    parser = argparse.ArgumentParser(description='Ускорение параллельного разбора CSV по числу процессов')
+    parser.add_argument('--rows', type=parse_rows, default=1_000_000, help='размер синтетического датасета')
+    parser.add_argument('--csv', help='готовый CSV вместо синтетического')
+    parser.add_argument('--workers', default=default_workers, help=f'число процессов через запятую (по умолчанию {default_workers}); первое — база')
+    parser.add_argument('--repeat', type=int, default=1, help='повторов, берётся лучшее время')
+    parser.add_argument('--out', help='JSON с результатами')
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    args = parse_args(argv)
+    path = args.csv or dataset_path(args.rows)
+    if not os.path.exists(path):
+        write_dataset(path, args.rows)
+    report = {
+        'csv': path,
+        'csv_bytes': os.path.getsize(path),
+        'cpu_count': os.cpu_count(),
+        'results': measure(path, [int(n) for n in args.workers.split(',')], args.repeat),
+    }
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    print(json.dumps(report['results']))
+
+
+if __name__ == '__main__':
+    main()
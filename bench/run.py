@@ -0,0 +1,206 @@
+"""Бенчмарк DataAnalyzer на синтетических датасетах разного размера.
+
+Для каждого размера отдельный процесс (чтобы пиковая память не смешивалась)
+замеряет разбор CSV, запись и загрузку снапшота, задержку каждого публичного
+метода и batch_analytics по всем методам. Результат пишется в JSON.
+
+    python -m bench.run --sizes 10k,100k,1M,10M
+    python -m bench.run --sizes 10k --compare .cache/bench/results/<прошлый прогон>.json
+"""
+import argparse, datetime, gc, json, os, platform, statistics, subprocess, sys, time
+from typing import Any, Callable, Dict, List, Optional, Sequence
+from bench.generate import dataset_path, parse_rows, write_dataset
+from core import snapshot
+from core.batch import BatchExecutor
+from core.config import settings
+from core.data_analyzer import PLANS, DataAnalyzer
+
+DEFAULT_SIZES = '10k,100k,1M,10M'
+RESULTS_DIR = '.cache/bench/results'
+# Настройки, влияющие на цифры: попадают в метаданные прогона
+RECORDED_SETTINGS = ('cube_enabled', 'cube_lazy', 'streaming', 'stream_chunk_rows', 'batch_executor', 'batch_workers')
+
+# Параметры методов для замера (остальные вызываются без аргументов)
+METHOD_PARAMS: Dict[str, Dict[str, Any]] = {
+    'avg_hourly_rate_by': {'by': 'region'},
+    'avg_success_rate_by': {'by': 'platform'},
+    'avg_client_rating_by': {'by': 'experience'},
+    'avg_marketing_spend_by': {'by': 'category'},
+}
+
+
+def analytics_methods() -> List[str]:
+    """Публичные аналитические методы DataAnalyzer: у каждого есть план в PLANS."""
+    return list(PLANS)
+
+
+def peak_rss_mb() -> Optional[float]:
+    try:
+        import resource
+    except ImportError:
+        return None
+    # ru_maxrss в Linux — килобайты, в macOS — байты
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1 << 20 if sys.platform == 'darwin' else 1 << 10), 1)
+
+
+def _timings(func: Callable[[], Any], repeat: int) -> Dict[str, float]:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return {
+        'first_ms': round(samples[0], 3),
+        'median_ms': round(statistics.median(samples), 3),
+        'min_ms': round(min(samples), 3),
+    }
+
+
+def run_batch(analyzer: DataAnalyzer, executor: BatchExecutor, calls) -> List[str]:
+    # Тот же путь, что и инструмент batch_analytics в main.py
+    with analyzer.fused(calls):
+        return executor.run(calls)
+
+
+def measure(path: str, repeat: int = 3) -> Dict[str, Any]:
+    """Замеры в текущем процессе; пиковая память осмысленна только в отдельном процессе."""
+    result: Dict[str, Any] = {'csv_bytes': os.path.getsize(path), 'rss_baseline_mb': peak_rss_mb()}
+    # Кэш результатов выключен: меряем вычисление, а не попадание в кэш
+    settings.result_cache_size = 0
+    settings.snapshot_enabled = False
+
+    start = time.perf_counter()
+    analyzer = DataAnalyzer(path)
+    load = {'parse_s': round(time.perf_counter() - start, 4), 'peak_rss_mb': peak_rss_mb()}
+    result['rows'] = len(analyzer.data)
+
+    start = time.perf_counter()
+    snapshot.write(path, analyzer.data)
+    load['snapshot_write_s'] = round(time.perf_counter() - start, 4)
+    del analyzer
+    gc.collect()
+    settings.snapshot_enabled = True
+    start = time.perf_counter()
+    analyzer = DataAnalyzer(path)
+    load['snapshot_load_s'] = round(time.perf_counter() - start, 4)
+    # Загрузка включает построение куба: выделяем его отдельно
+    start = time.perf_counter()
+    analyzer._rebuild_cube()
+    load['cube_build_s'] = round(time.perf_counter() - start, 4)
+    result['load'] = load
+
+    calls = [(name, METHOD_PARAMS.get(name, {})) for name in analytics_methods()]
+    result['methods'] = {
+        name: _timings(lambda: getattr(analyzer, name)(**params), repeat) for name, params in calls
+    }
+    executor = BatchExecutor(analyzer, workers=settings.batch_workers, kind='thread')
+    try:
+        result['batch_analytics'] = dict(_timings(lambda: run_batch(analyzer, executor, calls), repeat), methods=len(calls))
+    finally:
+        executor.shutdown()
+    result['peak_rss_mb'] = peak_rss_mb()
+    return result
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_size(rows: int, data_dir: str, repeat: int, seed: int, regenerate: bool) -> Dict[str, Any]:
+    path = dataset_path(rows, data_dir)
+    if regenerate or not os.path.exists(path):
+        start = time.perf_counter()
+        write_dataset(path, rows, seed)
+        print(f'Сгенерирован {path} за {time.perf_counter() - start:.1f} сек', file=sys.stderr)
+    # Холодный разбор: снапшот от прошлого прогона не должен подхватиться
+    if os.path.exists(snapshot.snapshot_path(path)):
+        os.remove(snapshot.snapshot_path(path))
+    completed = subprocess.run(
+        [sys.executable, '-m', 'bench.run', '--worker', path, '--repeat', str(repeat)],
+        capture_output=True, text=True, check=True,
+    )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def compare(base: Dict[str, Any], current: Dict[str, Any]) -> List[str]:
+    """Строки «метрика: было -> стало (xN)» по размерам, присутствующим в обоих прогонах."""
+    lines = []
+    base_by_rows = {entry['rows']: entry for entry in base['results']}
+    for entry in current['results']:
+        old = base_by_rows.get(entry['rows'])
+        if old is None:
+            continue
+        pairs = [(f'load.{key}', old['load'].get(key), value) for key, value in entry['load'].items()]
+        pairs += [
+            (f'{name}.median_ms', old['methods'].get(name, {}).get('median_ms'), timing['median_ms'])
+            for name, timing in entry['methods'].items()
+        ]
+        pairs.append(('batch_analytics.median_ms', old['batch_analytics']['median_ms'], entry['batch_analytics']['median_ms']))
+        lines.append(f'{entry["rows"]} строк:')
+        for name, was, now in pairs:
+            if was and now is not None:
+                lines.append(f'  {name}: {was} -> {now} (x{now / was:.2f})')
+    return lines
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Бенчмарк DataAnalyzer на синтетических данных')
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help=f'размеры датасетов через запятую (по умолчанию {DEFAULT_SIZES})')
+    parser.add_argument('--repeat', type=int, default=3, help='повторов каждого замера')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--data-dir', default='.cache/bench', help='каталог сгенерированных CSV')
+    parser.add_argument('--regenerate', action='store_true', help='пересоздать датасеты, даже если они есть')
+    parser.add_argument('--out', help=f'JSON с результатами (по умолчанию {RESULTS_DIR}/<время>-<коммит>.json)')
+    parser.add_argument('--compare', help='JSON прошлого прогона для сравнения')
+    parser.add_argument('--worker', metavar='CSV', help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    args = parse_args(argv)
+    if args.worker:
+        print(json.dumps(measure(args.worker, args.repeat)))
+        return
+
+    commit = _git_commit()
+    started = datetime.datetime.now(datetime.timezone.utc)
+    report: Dict[str, Any] = {
+        'meta': {
+            'commit': commit,
+            'started_at': started.isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'repeat': args.repeat,
+            'seed': args.seed,
+            'settings': {name: getattr(settings, name) for name in RECORDED_SETTINGS},
+        },
+        'results': [],
+    }
+    for rows in map(parse_rows, args.sizes.split(',')):
+        entry = run_size(rows, args.data_dir, args.repeat, args.seed, args.regenerate)
+        report['results'].append(entry)
+        print(
+            f'{rows} строк: разбор {entry["load"]["parse_s"]} сек, снапшот {entry["load"]["snapshot_load_s"]} сек, '
+            f'пик {entry["peak_rss_mb"]} МБ, batch_analytics {entry["batch_analytics"]["median_ms"]} мс',
+            file=sys.stderr,
+        )
+
+    out = args.out or os.path.join(RESULTS_DIR, f'{started:%Y%m%dT%H%M%S}-{commit or "nogit"}.json')
+    os.makedirs(os.path.dirname(out) or '.', exist_ok=True)
+    with open(out, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(out)
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            print('\n'.join(compare(json.load(f), report)))
+
+
+if __name__ == '__main__':
+    main()
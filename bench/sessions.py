@@ -0,0 +1,84 @@
+"""Память длинной сессии агента: InMemorySaver против SqliteSaver (core/checkpoint.py).
+
+Одна сессия из --turns ходов с моделью-заглушкой (bench/load.py, без задержки):
+каждый ход — вопрос, вызов query и его результат. Через каждые --every ходов
+снимаются RSS процесса, время хода и размер файла чекпоинтов; с --tracemalloc
+ещё и память объектов Python (замедляет ход в разы).
+
+    python -m bench.sessions --saver sqlite --turns 10000
+    python -m bench.sessions --saver memory --turns 1000 --every 100
+"""
+import argparse, gc, json, os, resource, sys, tempfile, time, tracemalloc
+from typing import Any, Dict, List, Optional, Sequence
+from bench.load import QUESTIONS, StubModel
+from core.checkpoint import SqliteSaver
+from main import TOOLS, LLMAgent, analyzer
+
+
+def rss_mb() -> float:
+    """Текущий RSS процесса (Linux), иначе пиковый."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_session(saver: Optional[SqliteSaver], turns: int, every: int, trace: bool = False) -> List[Dict[str, Any]]:
+    agent = LLMAgent(StubModel(latency=0), 'system', TOOLS, checkpointer=saver)
+    samples = []
+    if trace:
+        tracemalloc.start()
+    start = last = time.perf_counter()
+    for turn in range(1, turns + 1):
+        agent.ask(QUESTIONS[turn % len(QUESTIONS)][0])
+        if turn % every == 0 or turn == turns:
+            gc.collect()
+            now = time.perf_counter()
+            sample = {
+                'turn': turn,
+                'rss_mb': round(rss_mb(), 1),
+                'ms_per_turn': round((now - last) * 1000 / (turn - (samples[-1]['turn'] if samples else 0)), 2),
+                'elapsed_s': round(now - start, 1),
+            }
+            if trace:
+                sample['python_mb'] = round(tracemalloc.get_traced_memory()[0] / 2 ** 20, 2)
+            if saver is not None:
+                sample['db_mb'] = round(os.path.getsize(saver.path) / 2 ** 20, 2)
+                sample.update(saver.stats())
+            samples.append(sample)
+            last = now
+            print(json.dumps(sample, ensure_ascii=False), file=sys.stderr)
+    if trace:
+        tracemalloc.stop()
+    return samples
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Память длинной сессии агента по типу чекпоинтера')
+    parser.add_argument('--saver', choices=('memory', 'sqlite'), default='sqlite')
+    parser.add_argument('--turns', type=int, default=10000)
+    parser.add_argument('--every', type=int, default=1000, help='шаг замеров, ходов')
+    parser.add_argument('--window', type=int, default=100, help='ходов в рабочем состоянии (sqlite)')
+    parser.add_argument('--tracemalloc', action='store_true', help='мерить и память объектов Python')
+    parser.add_argument('--out', help='JSON с результатами')
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    args = parse_args(argv)
+    analyzer.preload()
+    with tempfile.TemporaryDirectory() as tmp:
+        saver = SqliteSaver(os.path.join(tmp, 'checkpoints.sqlite'), window_turns=args.window) if args.saver == 'sqlite' else None
+        samples = run_session(saver, args.turns, args.every, args.tracemalloc)
+        if saver is not None:
+            saver.close()
+    report = {'saver': args.saver, 'turns': args.turns, 'window_turns': args.window, 'samples': samples}
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    print(json.dumps(report))
+
+
+if __name__ == '__main__':
+    main()
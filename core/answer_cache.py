@@ -0,0 +1,123 @@
+import json, os, re, threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+ToolCalls = List[Dict[str, Any]]
+
+# Окончания для грубого стемминга: «регионам», «регионов», «региону» -> «регион»
+_ENDINGS = sorted((
+    'ами', 'ями', 'ого', 'его', 'ому', 'ему', 'ыми', 'ими', 'ов', 'ев', 'ам', 'ям', 'ах', 'ях',
+    'ой', 'ей', 'ий', 'ый', 'ая', 'яя', 'ое', 'ее', 'ие', 'ые', 'ом', 'ем', 'ую', 'юю',
+    'а', 'я', 'о', 'е', 'ы', 'и', 'у', 'ю', 'ь', 'й',
+), key=len, reverse=True)
+_MIN_STEM = 4
+# Вопросы-уточнения зависят от предыдущего ответа («а по категориям?»), их не кэшируем
+_CONTEXT_STARTS = {'а', 'и', 'ну', 'еще', 'тоже', 'также'}
+_CONTEXT_WORDS = {'это', 'этот', 'эти', 'их', 'там', 'тоже', 'также', 'его', 'ее'}
+
+
+def _stem(word: str) -> str:
+    for ending in _ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= _MIN_STEM:
+            return word[:-len(ending)]
+    return word
+
+
+def _words(text: str) -> List[str]:
+    text = text.lower().replace('ё', 'е')
+    return re.findall(r'\w+', text)
+
+
+def is_contextual(text: str) -> bool:
+    words = _words(text)
+    return not words or words[0] in _CONTEXT_STARTS or bool(_CONTEXT_WORDS.intersection(words))
+
+
+def normalize_question(text: str) -> str:
+    """Ключ вопроса: регистр, пунктуация, пробелы и словоформы не важны.
+
+    Порядок слов сохраняется: «больше 1000 и меньше 50» и «больше 50 и меньше 1000» —
+    разные вопросы.
+    """
+    return ' '.join(_stem(word) for word in _words(text))
+
+
+class AnswerCache:
+    """Кэш «вопрос -> вызовы инструментов», сохраняемый на диск, с LRU-вытеснением.
+
+    Хранит не сам ответ, а вызовы инструментов, которые на него ответили:
+    повторный вопрос переигрывается на текущих данных без обращения к LLM.
+    """
+
+    def __init__(self, path: Optional[str], maxsize: int) -> None:
+        self.path = path
+        self.maxsize = maxsize
+        self._entries: 'OrderedDict[str, ToolCalls]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._load()
+
+    def _load(self) -> None:
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+            for key, calls in entries:
+                self._entries[key] = calls
+        except (OSError, ValueError, TypeError):
+            # Повреждённый файл кэша просто игнорируем: он перезапишется
+            self._entries.clear()
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def _save(self) -> None:
+        if not self.path:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(list(self._entries.items()), f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def lookup(self, question: str) -> Optional[ToolCalls]:
+        if is_contextual(question):
+            return None
+        key = normalize_question(question)
+        with self._lock:
+            calls = self._entries.get(key)
+            if calls is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return calls
+
+    def remember(self, question: str, calls: ToolCalls) -> None:
+        if not calls or is_contextual(question):
+            return
+        with self._lock:
+            key = normalize_question(question)
+            self._entries[key] = calls
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+            try:
+                self._save()
+            except OSError:
+                # Кэш ответов — оптимизация: без записи на диск продолжаем работать в памяти
+                pass
+
+    def forget(self, question: str) -> None:
+        with self._lock:
+            if self._entries.pop(normalize_question(question), None) is not None:
+                try:
+                    self._save()
+                except OSError:
+                    pass
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,211 @@
+import contextvars, functools, inspect, logging, time
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from typing import Any, Dict, FrozenSet, List, Optional, Sequence, Tuple
+from core.data_analyzer import PLANS, DataAnalyzer
+
+batch_analytics_logger = logging.getLogger('batch_analytics_logger')
+
+Call = Tuple[str, Dict[str, Any]]
+
+NOT_FOUND_MESSAGE = 'Извините, отвлёкся, повторите ваш вопрос.'
+ERROR_MESSAGE = 'Извините, отвлёкся) повторите вопрос.'
+
+
+# Методы, доступные модели через batch_analytics: пресеты с планом агрегатов и query.
+# Остальные публичные методы анализатора (ingest, append, fused, ...) из вызова инструмента недоступны.
+BATCH_METHODS = frozenset(PLANS) | {'query'}
+# Как часто run проверяет, начались ли методы из очереди пула, сек
+POLL_SECONDS = 0.05
+
+
+@functools.lru_cache(maxsize=None)
+def accepted_params(method: str) -> Optional[FrozenSet[str]]:
+    """Имена параметров метода из BATCH_METHODS; сигнатура разбирается один раз."""
+    if method not in BATCH_METHODS:
+        return None
+    return frozenset(name for name in inspect.signature(getattr(DataAnalyzer, method)).parameters if name != 'self')
+
+
+class StaleWorker(Exception):
+    """Данные процесса-воркера не совпадают с данными анализатора."""
+
+
+# Анализатор процесса-воркера (для executor='process')
+_worker_analyzer: Optional[DataAnalyzer] = None
+
+
+def _init_worker(path: str) -> None:
+    global _worker_analyzer
+    _worker_analyzer = DataAnalyzer(path)
+
+
+def _call_in_worker(method: str, params: Dict[str, Any], offset: Optional[int]) -> str:
+    # offset — сколько байт CSV видит анализатор основного процесса: воркер догоняет его
+    # дочитыванием файла, а если не может совпасть (файл ушёл дальше) — отказывается
+    if offset is not None and _worker_analyzer.file_offset != offset:
+        if _worker_analyzer.file_offset < offset:
+            _worker_analyzer.ingest()
+        if _worker_analyzer.file_offset != offset:
+            raise StaleWorker(f'воркер прочитал {_worker_analyzer.file_offset} байт CSV, анализатор — {offset}')
+    return getattr(_worker_analyzer, method)(**params)
+
+
+class BatchExecutor:
+    """Параллельное выполнение методов DataAnalyzer для batch_analytics.
+
+    Методы выполняются в пуле потоков или процессов, результаты возвращаются
+    в порядке запроса. У каждого метода свой бюджет timeout, отсчитываемый от
+    начала его выполнения (с точностью до POLL_SECONDS): не уложившийся метод
+    заменяется явной отметкой о частичном результате, остальные не ждут его.
+    batch_timeout ограничивает ожидание свободного воркера: метод, не начавшийся
+    за это время от старта батча, не выполняется (0 — без ограничения).
+
+    Начавшийся метод отменить нельзя: после таймаута он продолжает занимать
+    воркер до своего завершения. Чтобы такие воркеры не копились и не задерживали
+    следующие батчи, пул с зависшим методом отпускается (shutdown без ожидания),
+    а новые вызовы идут в свежий пул — так же, как при StaleWorker.
+
+    Пул процессов читает CSV сам и годится, только пока данные анализатора —
+    начало этого файла: при строках из append или присвоенных данных батч
+    выполняется в потоках.
+    """
+
+    def __init__(
+        self,
+        analyzer: DataAnalyzer,
+        workers: int,
+        kind: str = 'thread',
+        timeout: float = 30.0,
+        path: Optional[str] = None,
+        batch_timeout: float = 0.0,
+    ) -> None:
+        if kind not in ('thread', 'process'):
+            raise ValueError(f'Неизвестный тип пула: {kind}')
+        self._analyzer = analyzer
+        self._workers = workers
+        self._kind = kind
+        self._path = path
+        self.timeout = timeout
+        self.batch_timeout = batch_timeout
+        self._threads: Optional[Executor] = None
+        self._processes: Optional[Executor] = None
+
+    @property
+    def threads(self) -> Executor:
+        if self._threads is None:
+            self._threads = ThreadPoolExecutor(max_workers=self._workers, thread_name_prefix='batch')
+        return self._threads
+
+    @property
+    def processes(self) -> Executor:
+        if self._processes is None:
+            self._processes = ProcessPoolExecutor(
+                max_workers=self._workers, initializer=_init_worker, initargs=(self._path,))
+        return self._processes
+
+    def _submit(self, method: str, params: Dict[str, Any], process: bool, offset: Optional[int]) -> Tuple[Executor, Future]:
+        if process:
+            pool = self.processes
+            return pool, pool.submit(_call_in_worker, method, params, offset)
+        # Копия контекста: интервалы analyzer вкладываются в интервал инструмента (core/metrics.py)
+        pool = self.threads
+        return pool, pool.submit(contextvars.copy_context().run, getattr(self._analyzer, method), **params)
+
+    def _release(self, pool: Executor) -> bool:
+        """Отпускает пул, воркер которого занят методом после таймаута: следующие вызовы получат новый."""
+        if pool is self._threads:
+            self._threads = None
+        elif pool is self._processes:
+            self._processes = None
+        else:
+            return False
+        # Зависший метод завершится сам, после чего воркеры старого пула выйдут
+        pool.shutdown(wait=False)
+        batch_analytics_logger.warning('batch_analytics: воркер занят методом после таймаута, пул заменён')
+        return True
+
+    def _use_processes(self) -> Tuple[bool, Optional[int]]:
+        if self._kind != 'process':
+            return False, None
+        if self._analyzer is None:
+            return True, None
+        offset = self._analyzer.file_offset
+        if offset is None:
+            batch_analytics_logger.warning('batch_analytics: в данных есть строки не из CSV, пул процессов их не видит — батч выполняется в потоках')
+            return False, None
+        return True, offset
+
+    def timeout_marker(self, method: str) -> str:
+        return f'[частичный результат] {method}: не уложился в {self.timeout:g} сек, данные не получены.'
+
+    def queue_marker(self, method: str) -> str:
+        return f'[частичный результат] {method}: не дождался свободного воркера за {self.batch_timeout:g} сек, данные не получены.'
+
+    def run(self, calls: Sequence[Call]) -> List[str]:
+        process, offset = self._use_processes()
+        results: List[Optional[str]] = [None] * len(calls)
+        filtered: Dict[int, Dict[str, Any]] = {}
+        pending: Dict[Future, int] = {}
+        pools: Dict[Future, Executor] = {}
+
+        def submit(index: int, process: bool, offset: Optional[int]) -> None:
+            pool, future = self._submit(calls[index][0], filtered[index], process, offset)
+            pending[future], pools[future] = index, pool
+
+        for index, (method, params) in enumerate(calls):
+            accepted = accepted_params(method)
+            if accepted is None:
+                batch_analytics_logger.warning('batch_analytics: метод %s не найден', method)
+                results[index] = NOT_FOUND_MESSAGE
+                continue
+            filtered[index] = {k: v for k, v in params.items() if k in accepted}
+            batch_analytics_logger.debug('batch_analytics: вызываю %s с параметрами %s', method, filtered[index])
+            submit(index, process, offset)
+
+        started: Dict[Future, float] = {}
+        queue_deadline = time.monotonic() + self.batch_timeout if self.batch_timeout > 0 else None
+        while pending:
+            done, _ = wait(pending, timeout=POLL_SECONDS, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = pending.pop(future)
+                method, params = calls[index]
+                try:
+                    results[index] = f'{future.result()}'
+                    batch_analytics_logger.debug('batch_analytics: результат %s', method)
+                except StaleWorker as e:
+                    batch_analytics_logger.warning('batch_analytics: %s (%s), выполняю в потоке', method, e)
+                    submit(index, False, None)
+                except Exception as e:
+                    batch_analytics_logger.error('batch_analytics: ошибка при вызове %s с параметрами %s: %s', method, params, e)
+                    results[index] = ERROR_MESSAGE
+            now = time.monotonic()
+            for future, index in list(pending.items()):
+                if future not in pending:
+                    continue
+                method = calls[index][0]
+                if future not in started:
+                    if future.running():
+                        started[future] = now
+                    elif queue_deadline is not None and now >= queue_deadline:
+                        future.cancel()
+                        del pending[future]
+                        batch_analytics_logger.error('batch_analytics: %s не начался за %g сек', method, self.batch_timeout)
+                        results[index] = self.queue_marker(method)
+                elif now - started[future] >= self.timeout:
+                    del pending[future]
+                    batch_analytics_logger.error('batch_analytics: %s не уложился в %g сек', method, self.timeout)
+                    results[index] = self.timeout_marker(method)
+                    pool = pools[future]
+                    if self._release(pool):
+                        # Не начавшиеся методы старого пула переходят в новый, а не ждут зависший воркер
+                        for queued, queued_index in list(pending.items()):
+                            if pools[queued] is pool and queued not in started and queued.cancel():
+                                del pending[queued]
+                                submit(queued_index, isinstance(pool, ProcessPoolExecutor), offset)
+        return results
+
+    def shutdown(self) -> None:
+        for pool in (self._threads, self._processes):
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
+        self._threads = self._processes = None
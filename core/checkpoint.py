@@ -0,0 +1,406 @@
+import asyncio, os, random, sqlite3, threading, time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT, ns TEXT, id TEXT, parent_id TEXT,
+    type TEXT, checkpoint BLOB, meta_type TEXT, metadata BLOB,
+    PRIMARY KEY (thread_id, ns, id)
+);
+CREATE TABLE IF NOT EXISTS blobs (
+    thread_id TEXT, ns TEXT, channel TEXT, version TEXT, type TEXT, data BLOB,
+    PRIMARY KEY (thread_id, ns, channel, version)
+);
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT, ns TEXT, checkpoint_id TEXT, task_id TEXT, idx INTEGER,
+    channel TEXT, type TEXT, data BLOB, task_path TEXT,
+    PRIMARY KEY (thread_id, ns, checkpoint_id, task_id, idx)
+);
+CREATE TABLE IF NOT EXISTS threads (thread_id TEXT PRIMARY KEY, last_used REAL);
+CREATE INDEX IF NOT EXISTS threads_last_used ON threads (last_used);
+CREATE TABLE IF NOT EXISTS archive (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT, thread_id TEXT, message_id TEXT, type TEXT, data BLOB,
+    UNIQUE (thread_id, message_id)
+);
+'''
+
+# Канал графа с историей диалога
+MESSAGES = 'messages'
+
+
+class _Latest(NamedTuple):
+    """Последний чекпоинт потока в сериализованном виде (рабочий набор в памяти)."""
+    row: tuple # id, parent_id, type, checkpoint, meta_type, metadata
+    blobs: Dict[str, Tuple[str, str, bytes]] # канал -> (версия, type, data)
+    writes: List[tuple] # (task_id, channel, type, data, task_path, idx) в порядке writes_sort_key
+
+
+def split_window(messages: Sequence[BaseMessage], turns: int) -> Tuple[List[BaseMessage], List[BaseMessage]]:
+    """(в архив, в рабочее состояние): в состоянии — системное сообщение и последние turns ходов."""
+    starts = [i for i, m in enumerate(messages) if isinstance(m, HumanMessage)]
+    if turns <= 0 or len(starts) <= turns:
+        return [], list(messages)
+    cut = starts[-turns]
+    skip = 1 if isinstance(messages[0], SystemMessage) else 0
+    return list(messages[skip:cut]), list(messages[:skip]) + list(messages[cut:])
+
+
+class SqliteSaver(BaseCheckpointSaver[str]):
+    """Чекпоинтер LangGraph на stdlib sqlite3 с ограниченной памятью.
+
+    - Полная история диалога хранится на диске: из рабочего состояния потока
+      уходят ходы старше window_turns, они переносятся в таблицу archive
+      (см. history). Модель и так видит только обрезанную историю.
+    - Компактация: у потока остаются keep_checkpoints последних чекпоинтов,
+      старые удаляются вместе с записями и неиспользуемыми значениями каналов.
+    - В памяти — только последние чекпоинты cache_threads недавно активных
+      потоков (LRU, в сериализованном виде); простаивающие вытесняются и читаются с диска.
+    - На диске — не более max_threads потоков: дольше всех простаивающие удаляются (LRU).
+    """
+
+    def __init__(
+        self,
+        path: str,
+        window_turns: int = 100,
+        keep_checkpoints: int = 2,
+        cache_threads: int = 32,
+        max_threads: int = 1000,
+    ) -> None:
+        super().__init__()
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.path = path
+        self.window_turns = window_turns
+        self.keep_checkpoints = max(keep_checkpoints, 1)
+        self.cache_threads = cache_threads
+        self.max_threads = max_threads
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.RLock()
+        self._latest: 'OrderedDict[Tuple[str, str], _Latest]' = OrderedDict()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    # --- рабочий набор в памяти -------------------------------------------------
+
+    def _load_latest(self, thread_id: str, ns: str) -> Optional[_Latest]:
+        key = (thread_id, ns)
+        latest = self._latest.get(key)
+        if latest is not None:
+            self._latest.move_to_end(key)
+            return latest
+        row = self._conn.execute(
+            'SELECT id, parent_id, type, checkpoint, meta_type, metadata FROM checkpoints '
+            'WHERE thread_id = ? AND ns = ? ORDER BY id DESC LIMIT 1', (thread_id, ns)).fetchone()
+        if row is None:
+            return None
+        latest = self._read(thread_id, ns, row)
+        self._remember(key, latest)
+        return latest
+
+    def _remember(self, key: Tuple[str, str], latest: _Latest) -> None:
+        self._latest[key] = latest
+        self._latest.move_to_end(key)
+        while len(self._latest) > self.cache_threads:
+            self._latest.popitem(last=False)
+
+    def _read(self, thread_id: str, ns: str, row: tuple) -> _Latest:
+        checkpoint = self.serde.loads_typed((row[2], row[3]))
+        blobs = {}
+        for channel, version in checkpoint['channel_versions'].items():
+            blob = self._conn.execute(
+                'SELECT type, data FROM blobs WHERE thread_id = ? AND ns = ? AND channel = ? AND version = ?',
+                (thread_id, ns, channel, str(version))).fetchone()
+            if blob is not None:
+                blobs[channel] = (str(version), blob[0], blob[1])
+        writes = self._conn.execute(
+            'SELECT task_id, channel, type, data, task_path, idx FROM writes '
+            'WHERE thread_id = ? AND ns = ? AND checkpoint_id = ? ORDER BY task_path, task_id, idx',
+            (thread_id, ns, row[0])).fetchall()
+        return _Latest(row, blobs, writes)
+
+    def _tuple(self, thread_id: str, ns: str, latest: _Latest) -> CheckpointTuple:
+        checkpoint_id, parent_id, type_, data, meta_type, metadata = latest.row
+        checkpoint = self.serde.loads_typed((type_, data))
+        values = {
+            channel: self.serde.loads_typed((type_, data))
+            for channel, (_, type_, data) in latest.blobs.items() if type_ != 'empty'
+        }
+        return CheckpointTuple(
+            config=self._config(thread_id, ns, checkpoint_id),
+            checkpoint={**checkpoint, 'channel_values': values},
+            metadata=self.serde.loads_typed((meta_type, metadata)),
+            parent_config=self._config(thread_id, ns, parent_id) if parent_id else None,
+            pending_writes=[(task_id, channel, self.serde.loads_typed((t, d))) for task_id, channel, t, d, _, _ in latest.writes],
+        )
+
+    @staticmethod
+    def _config(thread_id: str, ns: str, checkpoint_id: str) -> RunnableConfig:
+        return {'configurable': {'thread_id': thread_id, 'checkpoint_ns': ns, 'checkpoint_id': checkpoint_id}}
+
+    # --- интерфейс BaseCheckpointSaver ----------------------------------------
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config['configurable']['thread_id']
+        ns = config['configurable'].get('checkpoint_ns', '')
+        checkpoint_id = get_checkpoint_id(config)
+        with self._lock:
+            if checkpoint_id is None:
+                latest = self._load_latest(thread_id, ns)
+            else:
+                row = self._conn.execute(
+                    'SELECT id, parent_id, type, checkpoint, meta_type, metadata FROM checkpoints '
+                    'WHERE thread_id = ? AND ns = ? AND id = ?', (thread_id, ns, checkpoint_id)).fetchone()
+                latest = self._read(thread_id, ns, row) if row is not None else None
+            return self._tuple(thread_id, ns, latest) if latest is not None else None
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        query, params = 'SELECT thread_id, ns, id, parent_id, type, checkpoint, meta_type, metadata FROM checkpoints', []
+        conditions = []
+        if config:
+            conditions.append('thread_id = ?')
+            params.append(config['configurable']['thread_id'])
+            if config['configurable'].get('checkpoint_ns') is not None:
+                conditions.append('ns = ?')
+                params.append(config['configurable']['checkpoint_ns'])
+            if get_checkpoint_id(config):
+                conditions.append('id = ?')
+                params.append(get_checkpoint_id(config))
+        if before and get_checkpoint_id(before):
+            conditions.append('id < ?')
+            params.append(get_checkpoint_id(before))
+        if conditions:
+            query += ' WHERE ' + ' AND '.join(conditions)
+        query += ' ORDER BY id DESC'
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+            results = []
+            for thread_id, ns, *row in rows:
+                if limit is not None and len(results) >= limit:
+                    break
+                metadata = self.serde.loads_typed((row[4], row[5]))
+                if filter and not all(metadata.get(k) == v for k, v in filter.items()):
+                    continue
+                results.append(self._tuple(thread_id, ns, self._read(thread_id, ns, tuple(row))))
+        yield from results
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id = config['configurable']['thread_id']
+        ns = config['configurable'].get('checkpoint_ns', '')
+        c = checkpoint.copy()
+        values: Dict[str, Any] = c.pop('channel_values')
+        parent_id = config['configurable'].get('checkpoint_id')
+        with self._lock:
+            previous = self._latest.pop((thread_id, ns), None)
+            blobs = {}
+            self._conn.execute('BEGIN')
+            try:
+                for channel, version in new_versions.items():
+                    value = values.get(channel)
+                    if channel == MESSAGES and isinstance(value, list):
+                        value = self._archive(thread_id, value)
+                    typed = self.serde.dumps_typed(value) if channel in values else ('empty', b'')
+                    blobs[channel] = (str(version), typed[0], typed[1])
+                    self._conn.execute(
+                        'INSERT OR REPLACE INTO blobs VALUES (?, ?, ?, ?, ?, ?)',
+                        (thread_id, ns, channel, str(version), typed[0], typed[1]))
+                typed, meta = self.serde.dumps_typed(c), self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
+                row = (checkpoint['id'], parent_id, typed[0], typed[1], meta[0], meta[1])
+                self._conn.execute('INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?)', (thread_id, ns, *row))
+                self._touch(thread_id)
+                self._compact(thread_id, ns)
+                self._conn.execute('COMMIT')
+            except BaseException:
+                self._conn.execute('ROLLBACK')
+                raise
+            # Новый чекпоинт сразу становится рабочим набором: неизменившиеся каналы
+            # берутся из предыдущего, так что следующий ход не читает диск
+            if previous is not None and previous.row[0] == parent_id:
+                for channel, version in c['channel_versions'].items():
+                    if channel not in blobs and channel in previous.blobs and previous.blobs[channel][0] == str(version):
+                        blobs[channel] = previous.blobs[channel]
+            if set(blobs) >= set(c['channel_versions']):
+                self._remember((thread_id, ns), _Latest(row, blobs, []))
+        return self._config(thread_id, ns, checkpoint['id'])
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = '',
+    ) -> None:
+        thread_id = config['configurable']['thread_id']
+        ns = config['configurable'].get('checkpoint_ns', '')
+        checkpoint_id = config['configurable']['checkpoint_id']
+        with self._lock:
+            rows = []
+            for idx, (channel, value) in enumerate(writes):
+                idx = WRITES_IDX_MAP.get(channel, idx)
+                typed = self.serde.dumps_typed(value)
+                rows.append((thread_id, ns, checkpoint_id, task_id, idx, channel, typed[0], typed[1], task_path))
+            # Специальные записи (ошибки, прерывания) перезаписываются, обычные — только первая
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', [r for r in rows if r[4] < 0])
+            self._conn.executemany(
+                'INSERT OR IGNORE INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', [r for r in rows if r[4] >= 0])
+            latest = self._latest.get((thread_id, ns))
+            if latest is not None and latest.row[0] == checkpoint_id:
+                merged = {(w[0], w[5]): w for w in latest.writes}
+                for _, _, _, task_id, idx, channel, type_, data, path in rows:
+                    if idx < 0 or (task_id, idx) not in merged:
+                        merged[(task_id, idx)] = (task_id, channel, type_, data, path, idx)
+                latest.writes[:] = sorted(merged.values(), key=lambda w: (w[4], w[0], w[5]))
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            self._delete(thread_id)
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        items = await asyncio.to_thread(lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+        for item in items:
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = '',
+    ) -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+    def get_next_version(self, current: Optional[str], channel: None) -> str:
+        # Та же схема версий, что у InMemorySaver: монотонный счётчик и случайный хвост
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split('.')[0])
+        return f'{current_v + 1:032}.{random.random():016}'
+
+    # --- архив, компактация, вытеснение -----------------------------------------
+
+    def _archive(self, thread_id: str, messages: List[BaseMessage]) -> List[BaseMessage]:
+        """Переносит ходы старше окна в archive; возвращает рабочее окно истории."""
+        old, window = split_window(messages, self.window_turns)
+        rows = []
+        for message in old:
+            typed = self.serde.dumps_typed(message)
+            rows.append((thread_id, message.id or f'{id(message)}', typed[0], typed[1]))
+        if rows:
+            self._conn.executemany(
+                'INSERT OR IGNORE INTO archive (thread_id, message_id, type, data) VALUES (?, ?, ?, ?)', rows)
+        return window
+
+    def _compact(self, thread_id: str, ns: str) -> None:
+        """Оставляет keep_checkpoints последних чекпоинтов потока и нужные им значения каналов."""
+        stale = [r[0] for r in self._conn.execute(
+            'SELECT id FROM checkpoints WHERE thread_id = ? AND ns = ? ORDER BY id DESC LIMIT -1 OFFSET ?',
+            (thread_id, ns, self.keep_checkpoints))]
+        if not stale:
+            return
+        marks = ','.join('?' * len(stale))
+        self._conn.execute(f'DELETE FROM checkpoints WHERE thread_id = ? AND ns = ? AND id IN ({marks})', (thread_id, ns, *stale))
+        self._conn.execute(f'DELETE FROM writes WHERE thread_id = ? AND ns = ? AND checkpoint_id IN ({marks})', (thread_id, ns, *stale))
+        used = set()
+        for (type_, data) in self._conn.execute(
+                'SELECT type, checkpoint FROM checkpoints WHERE thread_id = ? AND ns = ?', (thread_id, ns)):
+            used.update((channel, str(version)) for channel, version in self.serde.loads_typed((type_, data))['channel_versions'].items())
+        garbage = [
+            (thread_id, ns, channel, version)
+            for channel, version in self._conn.execute('SELECT channel, version FROM blobs WHERE thread_id = ? AND ns = ?', (thread_id, ns))
+            if (channel, version) not in used
+        ]
+        self._conn.executemany('DELETE FROM blobs WHERE thread_id = ? AND ns = ? AND channel = ? AND version = ?', garbage)
+
+    def _touch(self, thread_id: str) -> None:
+        self._conn.execute('INSERT OR REPLACE INTO threads VALUES (?, ?)', (thread_id, time.time()))
+        count = self._conn.execute('SELECT COUNT(*) FROM threads').fetchone()[0]
+        if count > self.max_threads:
+            for (idle,) in self._conn.execute(
+                    'SELECT thread_id FROM threads ORDER BY last_used LIMIT ?', (count - self.max_threads,)).fetchall():
+                self._delete(idle)
+
+    def _delete(self, thread_id: str) -> None:
+        for table in ('checkpoints', 'blobs', 'writes', 'threads', 'archive'):
+            self._conn.execute(f'DELETE FROM {table} WHERE thread_id = ?', (thread_id,))
+        for key in [k for k in self._latest if k[0] == thread_id]:
+            del self._latest[key]
+
+    def history(self, thread_id: str) -> List[BaseMessage]:
+        """Полная история потока: архив и рабочее окно последнего чекпоинта."""
+        with self._lock:
+            archived = [
+                self.serde.loads_typed((type_, data))
+                for type_, data in self._conn.execute(
+                    'SELECT type, data FROM archive WHERE thread_id = ? ORDER BY seq', (thread_id,))
+            ]
+        latest = self.get_tuple({'configurable': {'thread_id': thread_id}})
+        window = latest.checkpoint['channel_values'].get(MESSAGES, []) if latest else []
+        return [m for m in window if isinstance(m, SystemMessage)][:1] + archived + \
+            [m for m in window if not isinstance(m, SystemMessage)]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            count = lambda table: self._conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+            return {
+                'threads': count('threads'),
+                'checkpoints': count('checkpoints'),
+                'blobs': count('blobs'),
+                'archived_messages': count('archive'),
+                'cached_threads': len(self._latest),
+            }
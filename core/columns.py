@@ -0,0 +1,228 @@
+from array import array
+from math import isfinite
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional
+
+
+class Column(NamedTuple):
+    """Колонка схемы датасета: имя в CSV и тип значения ('int', 'float', 'category')."""
+    name: str
+    kind: str
+
+
+# Схема датасета. Числовые колонки хранятся в array('d'), категориальные — как
+# небольшие целочисленные коды + словарь. Значения приводятся к типу один раз,
+# при записи строки в ColumnStore; запросы работают с готовыми числами.
+SCHEMA = (
+    Column('Freelancer_ID', 'int'),
+    Column('Job_Completed', 'int'),
+    Column('Earnings_USD', 'float'),
+    Column('Hourly_Rate', 'float'),
+    Column('Job_Success_Rate', 'float'),
+    Column('Client_Rating', 'float'),
+    # Длительность бывает дробной (12.5 дня) — как в прежнем разборе через float()
+    Column('Job_Duration_Days', 'float'),
+    Column('Rehire_Rate', 'float'),
+    Column('Marketing_Spend', 'float'),
+    Column('Job_Category', 'category'),
+    Column('Platform', 'category'),
+    Column('Experience_Level', 'category'),
+    Column('Client_Region', 'category'),
+    Column('Payment_Method', 'category'),
+    Column('Project_Type', 'category'),
+)
+NUMERIC_COLUMNS = tuple(column.name for column in SCHEMA if column.kind != 'category')
+CATEGORICAL_COLUMNS = tuple(column.name for column in SCHEMA if column.kind == 'category')
+# Пропуск или некорректное значение числовой колонки — NaN: это и есть маска
+# валидности (isnan), метрики такие строки не учитывают, а не считают нулями
+MISSING = float('nan')
+UNKNOWN = 'Unknown'
+# Ячейки CSV, которые означают отсутствие значения
+NULL_VALUES = frozenset({'', 'NA', 'N/A', 'n/a', 'NaN', 'nan', 'null', 'NULL', 'None', 'none', '-'})
+
+
+def parse_float(value: Any) -> float:
+    """Число из ячейки: пропуск — MISSING, нечисловое или бесконечное значение — ValueError."""
+    if value is None or value in NULL_VALUES:
+        return MISSING
+    result = float(value)
+    if result != result:
+        return MISSING
+    if not isfinite(result):
+        raise ValueError(f'Не конечное число: {value!r}')
+    return result
+
+
+def parse_int(value: Any) -> float:
+    """Целое из ячейки (хранится как float): дробное значение — ValueError, а не округление."""
+    result = parse_float(value)
+    if result == result and not result.is_integer():
+        raise ValueError(f'Не целое число: {value!r}')
+    return result
+
+
+def parse_category(value: Any) -> str:
+    return UNKNOWN if value is None or value in NULL_VALUES else str(value)
+
+
+_PARSERS: Dict[str, Callable[[Any], Any]] = {'int': parse_int, 'float': parse_float, 'category': parse_category}
+# Преобразователи колонок, собранные из схемы один раз при импорте
+CONVERTERS: Dict[str, Callable[[Any], Any]] = {column.name: _PARSERS[column.kind] for column in SCHEMA}
+_NUMERIC_CONVERTERS = tuple((name, CONVERTERS[name]) for name in NUMERIC_COLUMNS)
+
+
+class CategoricalColumn:
+    """Категориальная колонка: коды в компактном array + словарь значений."""
+
+    # Тип кодов расширяется только когда словарь перестаёт в него помещаться
+    _TYPECODES = (('B', 0xFF), ('H', 0xFFFF), ('I', 0xFFFFFFFF))
+
+    def __init__(self) -> None:
+        self.codes = array('B')
+        self.dictionary: List[str] = []
+        self._index: Dict[str, int] = {}
+
+    @classmethod
+    def from_codes(cls, codes, dictionary: List[str]) -> 'CategoricalColumn':
+        column = cls()
+        column.codes = codes
+        column.dictionary = list(dictionary)
+        column._index = {value: code for code, value in enumerate(column.dictionary)}
+        return column
+
+    def encode(self, value: str) -> Optional[int]:
+        return self._index.get(value)
+
+    def _code_for(self, value: str) -> int:
+        code = self._index.get(value)
+        if code is None:
+            code = len(self.dictionary)
+            self._index[value] = code
+            self.dictionary.append(value)
+            self._widen(code)
+        return code
+
+    def _widen(self, code: int) -> None:
+        for typecode, limit in self._TYPECODES:
+            if code <= limit:
+                if typecode != self.codes.typecode:
+                    self.codes = array(typecode, self.codes)
+                return
+
+    def append(self, value: Any) -> None:
+        code = self._code_for(parse_category(value))
+        self.codes.append(code)
+
+    def extend_column(self, other: 'CategoricalColumn') -> None:
+        """Дописывает коды другой колонки, перекодируя их в словарь этой.
+
+        Новые значения добавляются в порядке словаря other, поэтому склейка
+        колонок, собранных по частям файла, даёт тот же словарь, что и чтение подряд.
+        """
+        mapping = [self._code_for(value) for value in other.dictionary]
+        if mapping == list(range(len(mapping))):
+            codes = other.codes
+        elif self.codes.typecode == 'B' and other.codes.typecode == 'B':
+            # Перекодировка байтовых кодов целиком на уровне C
+            table = bytes(mapping) + bytes(256 - len(mapping))
+            codes = array('B', other.codes.tobytes().translate(table))
+        else:
+            codes = array(self.codes.typecode, [mapping[code] for code in other.codes])
+        self.codes.extend(codes if codes.typecode == self.codes.typecode else array(self.codes.typecode, codes))
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __getitem__(self, idx: int) -> str:
+        return self.dictionary[self.codes[idx]]
+
+
+class ColumnStore:
+    """Колоночное хранилище датасета вместо списка dict-строк.
+
+    Колонки — array либо memoryview поверх mmap снапшота (только чтение);
+    при первой записи отображённые колонки копируются в array. invalid — число
+    значений по колонкам, которые не разобрались по схеме и записаны как пропуск.
+    """
+
+    def __init__(self) -> None:
+        self.numeric: Dict[str, array] = {name: array('d') for name in NUMERIC_COLUMNS}
+        self.categorical: Dict[str, CategoricalColumn] = {
+            name: CategoricalColumn() for name in CATEGORICAL_COLUMNS
+        }
+        self.invalid: Dict[str, int] = {}
+        self._size = 0
+        # mmap снапшота, если колонки отображены из файла
+        self.mapped = None
+
+    def _ensure_writable(self) -> None:
+        for name, column in self.numeric.items():
+            self.numeric[name] = array(column.format, column) if isinstance(column, memoryview) else column
+        for column in self.categorical.values():
+            if isinstance(column.codes, memoryview):
+                column.codes = array(column.codes.format, column.codes)
+        self.mapped = None
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Dict[str, Any]]) -> 'ColumnStore':
+        store = cls()
+        store.extend(rows)
+        return store
+
+    def append(self, row: Dict[str, Any]) -> None:
+        if self.mapped is not None:
+            self._ensure_writable()
+        numeric = self.numeric
+        for name, convert in _NUMERIC_CONVERTERS:
+            try:
+                value = convert(row.get(name))
+            except (TypeError, ValueError):
+                value = MISSING
+                self.invalid[name] = self.invalid.get(name, 0) + 1
+            numeric[name].append(value)
+        for name, column in self.categorical.items():
+            column.append(row.get(name))
+        self._size += 1
+
+    def extend(self, rows: Iterable[Dict[str, Any]]) -> None:
+        for row in rows:
+            self.append(row)
+
+    def extend_store(self, other: 'ColumnStore') -> None:
+        """Дописывает строки другого хранилища (категории перекодируются в словари этого)."""
+        if self.mapped is not None:
+            self._ensure_writable()
+        for name, column in self.numeric.items():
+            column.extend(other.numeric[name])
+        for name, column in self.categorical.items():
+            column.extend_column(other.categorical[name])
+        for name, count in other.invalid.items():
+            self.invalid[name] = self.invalid.get(name, 0) + count
+        self._size += len(other)
+
+    def fill(self, name: str, value: str) -> None:
+        """Заменяет все значения категориальной колонки одним (например, ключом партиции из пути)."""
+        if self.mapped is not None:
+            self._ensure_writable()
+        column = self.categorical[name]
+        code = column._code_for(value)
+        column.codes = array(column.codes.typecode, [code]) * self._size
+
+    def clear_rows(self) -> None:
+        """Удаляет строки, сохраняя словари категорий (коды остаются прежними)."""
+        self._ensure_writable()
+        for name in self.numeric:
+            self.numeric[name] = array('d')
+        for column in self.categorical.values():
+            column.codes = array(column.codes.typecode)
+        self._size = 0
+
+    def row(self, idx: int) -> Dict[str, Any]:
+        result: Dict[str, Any] = {name: column[idx] for name, column in self.numeric.items()}
+        result.update({name: column[idx] for name, column in self.categorical.items()})
+        return result
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return (self.row(idx) for idx in range(self._size))
@@ -13,6 +13,8 @@ class LLMGroqConfiguration(BaseModel):
     model: str = 'llama3-70b-8192'
     base_url: str = 'https://api.groq.com/openai/v1'
     api_key: str = os.getenv('GROQ_API_KEY', '')
+    context_tokens: int = 8192 # окно контекста модели: системный промпт, схемы инструментов, история и ответ
+    reply_tokens: int = 1024 # запас токенов на ответ модели
 
     BASE_PROMPT: str = (
         'Ты — ассистент, аналитик данных о фрилансерах.\n'
@@ -34,6 +36,8 @@ class LLMGigaChatConfiguration(BaseModel):
     model: str = 'GigaChat-2-max'
     verify_ssl_certs: bool = False
     api_key: str = os.getenv('GIGACHAT_API_KEY', '')
+    context_tokens: int = 32768
+    reply_tokens: int = 2048
 
     BASE_PROMPT: str = (
         'Ты — ассистент, аналитик данных о фрилансерах.\n'
@@ -81,7 +85,17 @@ class LLMGigaChatConfiguration(BaseModel):
             - {"method": "<имя_метода>", "by": "<значение>"} — для методов с параметром by
     """
 
-    system_prompt: str = f'{BASE_PROMPT}\n\n{METHODS_LIST}'
+    QUERY_GUIDE: str = """
+        Для любого вопроса о метриках вызывай query(metric, aggregate, group_by, filters, top_k).
+        aggregate: avg, sum, count, min, max, var, std; group_by: category, region, experience, platform, project_type, payment_method.
+        Несколько вопросов сразу — batch_analytics(queries=[<аргументы query>, ...]).
+        Готовые отчёты для batch_analytics(methods=[{"method": ...}]): crypto_vs_other_income, percent_experts_lt_100_projects, percent_high_rehire.
+    """
+
+    # tools_mode='query': только инструменты query и batch_analytics
+    system_prompt: str = f'{BASE_PROMPT}\n\n{QUERY_GUIDE}'
+    # tools_mode='methods': каждый метод — отдельный инструмент
+    methods_prompt: str = f'{BASE_PROMPT}\n\n{METHODS_LIST}'
 
 
 class Setting(BaseSettings):
@@ -90,17 +104,66 @@ class Setting(BaseSettings):
     llm_gigachat: LLMGigaChatConfiguration = LLMGigaChatConfiguration()
     allowed_llm_model: str = 'llama3-70b-8192'
     # allowed_llm_model: str = 'GigaChat-2-max'
-    csv_path: str = 'data/freelancer_earnings_bd.csv'
+    csv_path: str = 'data/freelancer_earnings_bd.csv' # файл, каталог или glob CSV-партиций (сегменты key=value)
 
     first_message: str = 'Привет! Я ассистент, аналитик данных о фрилансерах. Чем могу помочь сегодня?'
 
     temperature: float = 0.1
     llm_response_color: str = '\033[35m'
     llm_response_color_reset: str = '\033[0m'
+    stream_output: bool = True # печатать ответ LLM по мере генерации (astream), а не целиком
 
     max_length_human_prompt: int = 128
-    max_history_pairs: int = 3
+    llm_retry_attempts: int = 5 # повторов запроса к LLM после 429/503
+    llm_retry_base_delay: float = 1.0 # база экспоненциальной паузы между повторами, сек (пауза с джиттером)
+    llm_retry_max_delay: float = 30.0 # потолок паузы между повторами, сек
+    questions_concurrency: int = 4 # одновременных вопросов в пакетном режиме (--questions)
+    max_history_pairs: int = 0 # предел числа ходов в истории (0 — без предела, историю ограничивает context_tokens провайдера)
+    tools_mode: str = 'query' # 'query' — единый инструмент query + batch_analytics, 'methods' — плюс все методы отдельными инструментами
     max_batch_methods: int = 15 # максимальное количество инструментов (tools) за раз в batch_analytics
-    
+
+    checkpoint_path: str = '.cache/checkpoints.sqlite' # история сессий агента в sqlite ('' — в памяти процесса, без ограничений)
+    checkpoint_window_turns: int = 100 # ходов в рабочем состоянии сессии, более старые уходят в архив на диске (0 — все)
+    checkpoint_keep: int = 2 # последних чекпоинтов на сессию после компактации
+    checkpoint_cache_threads: int = 32 # сессий, чьё состояние держится в памяти (LRU)
+    checkpoint_max_threads: int = 1000 # сессий на диске, дольше всех простаивающие удаляются (LRU)
+
+    metrics_path: str = '' # файл метрик в формате Prometheus, переписывается при выходе CLI ('' — не писать)
+    profile_dir: str = '.cache/profile' # каталог профилей сессий main.py --profile
+    profile_top: int = 15 # строк в таблицах топ-функций профиля
+    profile_frames: int = 32 # глубина стеков tracemalloc в профиле (0 — без профиля памяти)
+
+    answer_cache_enabled: bool = True # повторные вопросы отвечаются вызовом тех же инструментов без LLM
+    answer_cache_path: str = '.cache/answer_cache.json'
+    answer_cache_size: int = 500 # максимум запомненных вопросов (LRU)
+
+    batch_executor: str = 'thread' # пул для batch_analytics: 'thread' или 'process'
+    batch_workers: int = 4 # число воркеров пула batch_analytics
+    batch_method_timeout: float = 30.0 # бюджет одного метода в batch_analytics от начала его выполнения, сек
+    batch_timeout: float = 120.0 # сколько метод batch_analytics может ждать свободного воркера от старта батча, сек (0 — без ограничения)
+    # Начавшийся метод не прервать: после таймаута он занимает воркер до конца, поэтому такой пул заменяется новым
+
+    cube_enabled: bool = True # отвечать на агрегаты из предрасчитанного куба, а не проходом по строкам
+    cube_lazy: bool = False # строить срезы куба по измерениям при первом запросе, а не при загрузке
+    index_enabled: bool = True # сортированные и bitmap-индексы для запросов с фильтрами
+    scan_backend: str = 'auto' # ядро агрегации: 'auto' — NumPy от vectorized_min_rows строк (если установлен), 'numpy' или 'python' — принудительно
+    vectorized_min_rows: int = 10000 # с этого числа строк 'auto' считает агрегаты и куб на NumPy
+    parse_workers: int = 0 # процессов для разбора CSV (0 — по числу ядер, 1 — последовательно)
+    parse_parallel_min_bytes: int = 16 * 1024 * 1024 # CSV меньше этого размера разбирается в одном процессе
+    result_cache_size: int = 256 # размер LRU-кэша результатов методов DataAnalyzer (0 — выключен)
+    snapshot_enabled: bool = True # кэшировать разобранный CSV в бинарный снапшот рядом с файлом
+    snapshot_verify_hash: bool = False # сверять хэш CSV при каждом старте, а не только при смене mtime
+    streaming: bool = False # потоковый режим: CSV читается чанками, в памяти только агрегаты
+    stream_chunk_rows: int = 10000 # размер чанка (строк) в потоковом режиме
+    tail_enabled: bool = False # следить за дописыванием строк в CSV и дочитывать их без перезапуска
+    tail_interval: float = 5.0 # период проверки CSV в режиме tail, сек
+
+    @property
+    def llm(self):
+        """Конфигурация выбранного провайдера (allowed_llm_model)."""
+        if self.allowed_llm_model == self.llm_gigachat.model:
+            return self.llm_gigachat
+        return self.llm_groq
+
 
 settings = Setting()
\ No newline at end of file
@@ -0,0 +1,92 @@
+import csv, os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from core.columns import ColumnStore
+
+Converter = Callable[[Dict[str, Any]], Dict[str, Any]]
+
+
+class UnsafeSplit(Exception):
+    """Файл нельзя резать по переводам строк (многострочные записи или пустые строки)."""
+
+
+def read_lines(path: str, start: int = 0, end: Optional[int] = None) -> Iterator[str]:
+    """Строки CSV из диапазона байт [start, end): дописанное после end не читается."""
+    with open(path, 'rb') as f:
+        f.seek(start)
+        position = start
+        for line in f:
+            if end is not None and position >= end:
+                return
+            position += len(line)
+            yield line.decode('utf-8')
+
+
+def read_header(path: str) -> Tuple[List[str], int]:
+    """Имена колонок и смещение первой строки данных."""
+    with open(path, 'rb') as f:
+        line = f.readline()
+    return next(csv.reader([line.decode('utf-8')]), []), len(line)
+
+
+def split_ranges(path: str, start: int, end: int, parts: int) -> List[Tuple[int, int]]:
+    """Делит [start, end) на parts диапазонов, границы выровнены по переводу строки."""
+    bounds = [start]
+    with open(path, 'rb') as f:
+        for i in range(1, parts):
+            f.seek(max(start + (end - start) * i // parts, bounds[-1]))
+            # Дочитываем до конца текущей строки: граница — начало следующей
+            f.readline()
+            position = min(f.tell(), end)
+            if position > bounds[-1]:
+                bounds.append(position)
+    if bounds[-1] < end:
+        bounds.append(end)
+    return list(zip(bounds, bounds[1:]))
+
+
+def parse_range(path: str, start: int, end: int, fields: List[str], convert: Optional[Converter]) -> ColumnStore:
+    """Разбирает диапазон байт в ColumnStore теми же DictReader и convert, что и serial-загрузка.
+
+    Типы колонок приводит ColumnStore по схеме; convert (если задан) — подготовка сырой строки.
+    Любая запись, которую граница диапазона могла разрезать, поднимает UnsafeSplit:
+    запись на нескольких строках файла, число значений не равно числу колонок
+    (хвост или начало разрезанной записи), диапазон кончается внутри кавычек.
+    """
+    # strict: конец диапазона внутри открытой кавычки — ошибка, а не обрезанная запись
+    reader = csv.DictReader(read_lines(path, start, end), fieldnames=fields, strict=True)
+    store = ColumnStore()
+    line_num = 0
+    try:
+        for row in reader:
+            # Запись длиннее одной строки файла: граница диапазона могла разрезать её
+            if reader.line_num - line_num != 1:
+                raise UnsafeSplit(f'{path}: запись на строках {line_num + 1}-{reader.line_num} диапазона {start}-{end}')
+            # DictReader кладёт лишние значения под ключ None, недостающие — как None
+            if None in row or None in row.values():
+                raise UnsafeSplit(f'{path}: в строке {reader.line_num} диапазона {start}-{end} не {len(fields)} значений')
+            line_num = reader.line_num
+            store.append(convert(row) if convert is not None else row)
+    except csv.Error as e:
+        raise UnsafeSplit(f'{path}: диапазон {start}-{end}, строка {reader.line_num}: {e}')
+    return store
+
+
+def parse_parallel(path: str, convert: Optional[Converter], workers: int, end: Optional[int] = None) -> ColumnStore:
+    """Параллельный разбор CSV: диапазоны байт в процессах, склейка в порядке файла.
+
+    Результат совпадает с последовательным разбором, включая порядок словарей
+    категорий. Если запись пересекает границу диапазона, поднимается UnsafeSplit.
+    """
+    fields, data_start = read_header(path)
+    end = os.path.getsize(path) if end is None else end
+    # Диапазонов больше, чем процессов: выравнивает нагрузку при неравных строках
+    ranges = split_ranges(path, data_start, end, workers * 4)
+    store = ColumnStore()
+    if not ranges:
+        return store
+    with ProcessPoolExecutor(max_workers=min(workers, len(ranges))) as pool:
+        chunks = pool.map(parse_range, *zip(*[(path, s, e, fields, convert) for s, e in ranges]))
+        for chunk in chunks:
+            store.extend_store(chunk)
+    return store
@@ -0,0 +1,129 @@
+import threading
+from itertools import islice, repeat
+from typing import Dict, Iterable, Optional, Tuple
+from core.columns import ColumnStore
+from core import vectorized
+from core.kernel import DIMENSIONS, METRICS, AggSpec, GroupStats, Stats, metric_value, validate
+
+_DIM_ORDER = {name: idx for idx, name in enumerate(DIMENSIONS)}
+# Набор группировки: кортеж измерений в каноническом порядке, () — итог по всем строкам
+GroupingSet = Tuple[str, ...]
+# Ячейки набора: метрика (None — количество строк) -> ключ из кодов измерений -> Stats
+Cells = Dict[Optional[str], Dict[Tuple[int, ...], Stats]]
+
+
+class AggregateCube:
+    """Материализованный куб count/sum/min/max всех метрик по измерениям.
+
+    Отвечает на агрегаты с группировкой и фильтрами-равенствами по измерениям
+    за O(групп). Итог и одиночные измерения строятся сразу (или по запросу при
+    lazy=True), комбинации измерений для фильтров — по запросу либо заранее
+    через grouping_sets. При on_demand=False куб отвечает только из уже
+    построенных наборов (потоковый режим, где строк для достройки нет).
+    """
+
+    def __init__(
+        self,
+        store: ColumnStore,
+        lazy: bool = False,
+        grouping_sets: Iterable[GroupingSet] = (),
+        on_demand: bool = True,
+    ) -> None:
+        self._store = store
+        self._sets: Dict[GroupingSet, Cells] = {}
+        self._size = 0
+        self._lock = threading.Lock()
+        self._on_demand = on_demand
+        eager = list(grouping_sets)
+        if not lazy:
+            eager = [()] + [(name,) for name in DIMENSIONS] + eager
+        for dims in eager:
+            if dims not in self._sets:
+                self._build(dims)
+        self._size = len(store)
+
+    @staticmethod
+    def grouping_set(spec: AggSpec) -> GroupingSet:
+        dims = {p.field for p in spec.where}
+        if spec.by is not None:
+            dims.add(spec.by)
+        return tuple(sorted(dims, key=_DIM_ORDER.__getitem__))
+
+    def can_answer(self, spec: AggSpec) -> bool:
+        if not all(p.field in DIMENSIONS and p.op in ('==', '!=') for p in spec.where):
+            return False
+        return self._on_demand or self.grouping_set(spec) in self._sets
+
+    def _fold(self, dims: GroupingSet, cells: Cells, start: int) -> None:
+        if start == 0 and not cells and vectorized.enabled(len(self._store)):
+            vectorized.fold(self._store, dims, cells)
+            return
+
+        def keys():
+            if not dims:
+                return repeat((), len(self._store) - start)
+            columns = [islice(self._store.categorical[DIMENSIONS[d]].codes, start, None) for d in dims]
+            return zip(*columns)
+
+        counts = cells.setdefault(None, {})
+        for key in keys():
+            stats = counts.get(key)
+            if stats is None:
+                stats = counts[key] = Stats()
+            stats.add(None)
+        for name, metric in METRICS.items():
+            acc = cells.setdefault(name, {})
+            values = islice(self._store.numeric[metric.column], start, None)
+            for key, raw in zip(keys(), values):
+                value = metric_value(metric, raw)
+                if value is None:
+                    continue
+                stats = acc.get(key)
+                if stats is None:
+                    stats = acc[key] = Stats()
+                stats.add(value)
+
+    def _build(self, dims: GroupingSet) -> Cells:
+        cells: Cells = {}
+        self._fold(dims, cells, 0)
+        self._sets[dims] = cells
+        return cells
+
+    def _cells(self, dims: GroupingSet) -> Cells:
+        cells = self._sets.get(dims)
+        if cells is None:
+            with self._lock:
+                cells = self._sets.get(dims) or self._build(dims)
+        return cells
+
+    def patch(self, start: Optional[int] = None) -> None:
+        """Досчитывает в построенные наборы строки хранилища, начиная со start.
+
+        По умолчанию — строки, добавленные после прошлого patch.
+        """
+        with self._lock:
+            start = self._size if start is None else start
+            for dims, cells in self._sets.items():
+                self._fold(dims, cells, start)
+            self._size = len(self._store)
+
+    def answer(self, spec: AggSpec) -> GroupStats:
+        validate(spec)
+        dims = self.grouping_set(spec)
+        acc = self._cells(dims)[spec.metric]
+        checks = []
+        for p in spec.where:
+            code = self._store.categorical[DIMENSIONS[p.field]].encode(str(p.value))
+            checks.append((dims.index(p.field), p.op == '==', code))
+        by_pos = dims.index(spec.by) if spec.by is not None else None
+        dictionary = self._store.categorical[DIMENSIONS[spec.by]].dictionary if spec.by else None
+        result: GroupStats = {}
+        for key, stats in acc.items():
+            if not all((key[pos] == code) == equal for pos, equal, code in checks):
+                continue
+            label = dictionary[key[by_pos]] if by_pos is not None else None
+            merged = result.get(label)
+            if merged is None:
+                merged = result[label] = Stats()
+            merged.merge(stats)
+        return result
@@ -1,54 +1,538 @@
-from typing import List, Dict, Any
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+from contextlib import contextmanager
+from itertools import islice
 from core.config import settings
-import csv, time, functools,logging.config
-from core.logger import logger_config
+from core.columns import ColumnStore
+from core.cache import ResultCache
+from core.cube import AggregateCube
+from core import snapshot, vectorized
+from core.csv_reader import UnsafeSplit, parse_parallel, read_lines
+from core.partitions import PartitionedDataset, is_partitioned
+from core.indexes import IndexSet
+from core.query import compile_query, execute, render
+from core.schemas import QueryInput
+from core.kernel import DIMENSIONS, AggSpec, GroupStats, Predicate, Stats, merge_groups, scan, validate
+import csv, os, time, functools, inspect, threading, logging
+from core.logger import setup_logging
+from core.metrics import tracer
 
-logging.config.dictConfig(logger_config)
+setup_logging()
 logger = logging.getLogger('data_analyzer_logger')
 
+# Допустимые значения параметра by
+GROUP_KEYS = ('category', 'region', 'experience', 'platform', 'project_type')
+EXPERT = Predicate('experience', '==', 'Expert')
+
+
+def _by(by: str) -> str:
+    return by if by in GROUP_KEYS else 'category'
+
+
+# План каждого метода: какие агрегаты ему нужны. По планам batch_analytics
+# собирает агрегаты всех запрошенных методов в один проход по данным.
+PLANS = {
+    'crypto_vs_other_income': lambda: (
+        AggSpec('earnings', where=(Predicate('payment_method', '==', 'Crypto'),)),
+        AggSpec('earnings', where=(Predicate('payment_method', '!=', 'Crypto'),)),
+    ),
+    'income_by_region': lambda: (AggSpec('earnings', 'region'),),
+    'percent_experts_lt_100_projects': lambda: (
+        AggSpec(None, where=(EXPERT,)),
+        AggSpec(None, where=(EXPERT, Predicate('job_completed', '<', 100))),
+    ),
+    'avg_income_by_category': lambda: (AggSpec('earnings', 'category'),),
+    'avg_income_by_experience': lambda: (AggSpec('earnings', 'experience'),),
+    'top5_regions_by_experts': lambda: (AggSpec(None, 'region', (EXPERT,)),),
+    'percent_high_rehire': lambda threshold=50.0: (
+        AggSpec(None, where=(Predicate('rehire_rate', '>', threshold),)),
+        AggSpec(None),
+    ),
+    'avg_job_duration_all': lambda: (AggSpec('job_duration'),),
+    'avg_job_duration_by_category': lambda: (AggSpec('job_duration', 'category'),),
+    'avg_job_duration_by_region': lambda: (AggSpec('job_duration', 'region'),),
+    'avg_job_duration_by_experience': lambda: (AggSpec('job_duration', 'experience'),),
+    'avg_job_duration_by_platform': lambda: (AggSpec('job_duration', 'platform'),),
+    'avg_job_duration_by_project_type': lambda: (AggSpec('job_duration', 'project_type'),),
+    'avg_income_by_platform': lambda: (AggSpec('earnings', 'platform'),),
+    'avg_income_by_project_type': lambda: (AggSpec('earnings', 'project_type'),),
+    'avg_hourly_rate_by': lambda by='category': (AggSpec('hourly_rate', _by(by)),),
+    'avg_success_rate_by': lambda by='category': (AggSpec('success_rate', _by(by)),),
+    'avg_client_rating_by': lambda by='category': (AggSpec('client_rating', _by(by)),),
+    'avg_marketing_spend_by': lambda by='category': (AggSpec('marketing_spend', _by(by)),),
+}
+
+
+def _query_plan(metric=None, aggregate='avg', group_by=None, filters=(), top_k=None) -> Tuple[AggSpec, ...]:
+    # План метода query для batch_analytics: его единственный агрегат
+    query = QueryInput(metric=metric, aggregate=aggregate, group_by=group_by, filters=list(filters), top_k=top_k)
+    return (compile_query(query).spec,)
+
+
+# Параметры плана каждого метода batch_analytics: сигнатуры разбираются один раз при импорте
+_PLAN_PARAMS = {
+    method: frozenset(inspect.signature(plan).parameters)
+    for method, plan in {**PLANS, 'query': _query_plan}.items()
+}
+
+
+# Комбинации измерений из планов методов (например, регион × опыт для топ-5 по экспертам).
+# В потоковом режиме они копятся заранее, так как достроить их по строкам уже нельзя.
+PLAN_GROUPING_SETS = sorted({
+    AggregateCube.grouping_set(spec)
+    for plan in PLANS.values()
+    for spec in plan()
+    if all(p.field in DIMENSIONS for p in spec.where) and len(AggregateCube.grouping_set(spec)) > 1
+})
+
+
+
+# Сколько байт с начала и перед концом прочитанной части CSV сверяем, чтобы заметить перезапись файла
+FINGERPRINT_BYTES = 4096
+
+
+def parse_workers() -> int:
+    """Число процессов для разбора CSV: settings.parse_workers, 0 — по числу ядер."""
+    return settings.parse_workers or os.cpu_count() or 1
+
+
+def log_invalid(path: str, store: ColumnStore) -> None:
+    """Предупреждение о значениях, не разобранных по схеме колонок (они записаны как пропуски)."""
+    if store.invalid:
+        counts = ', '.join(f'{name}: {count}' for name, count in sorted(store.invalid.items()))
+        logger.warning('Некорректные значения в %s записаны как пропуски (%s)', path, counts)
+
+
+def stream_memory_ceiling(chunk_rows: int) -> int:
+    """Потолок пиковой памяти потоковой загрузки, байт.
+
+    Буфер чанка (~3 КБ на строку, пока строка — dict от csv.DictReader) плюс
+    4 МБ на агрегаты куба при словарях категорий до сотни значений.
+    От размера файла не зависит.
+    """
+    return 4 * 1024 * 1024 + chunk_rows * 3 * 1024
+
+
+def _total(groups: GroupStats) -> Optional[Stats]:
+    return groups.get(None)
+
+
 class DataAnalyzer:
     """Класс для аналитики данных о фрилансерах."""
-    def __init__(self, path: str = settings.csv_path):
-        self.data: List[Dict[str, Any]] = self._load_csv(path)
+    rows_scanned: int = 0
+    data_version: int = 0
+    streaming: bool = False
+    _result_cache: Optional[ResultCache] = None
+    _prefetched: Optional[Dict[AggSpec, GroupStats]] = None
+    _cube: Optional[AggregateCube] = None
+    _indexes: Optional[IndexSet] = None
+    # Сколько байт CSV уже загружено и отпечаток этих байт (для ingest)
+    _offset: int = 0
+    _fingerprint: Tuple[bytes, bytes] = (b'', b'')
+    _tail_stop: Optional[threading.Event] = None
+    # В данных есть строки не из CSV (append, присвоение data): процессы batch_analytics их не видят
+    _detached: bool = False
+    # Датасет из нескольких CSV (каталог или glob), если path указывает на партиции
+    _partitions: Optional[PartitionedDataset] = None
 
-    def _load_csv(self, path: str) -> List[Dict[str, Any]]:
-        with open(path, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            return [self._convert_types(row) for row in reader]
-    
-    def _safe_duration(self, val):
-        try:
-            return float(val)
-        except Exception:
+    def __init__(self, path: str = settings.csv_path, streaming: bool = settings.streaming):
+        self.path = path
+        self.streaming = streaming
+        if is_partitioned(path):
+            self._partitions = PartitionedDataset(
+                path, lambda file, keys: PartitionAnalyzer(file, keys, streaming=streaming)
+            )
+            self.data_version += 1
+        elif streaming:
+            self._load_stream(path)
+        else:
+            self.data = self._load_dataset(path)
+            self._detached = False
+
+    @property
+    def data(self) -> ColumnStore:
+        if self._partitions is not None:
+            return self._partitions.store()
+        return self._store
+
+    @data.setter
+    def data(self, rows) -> None:
+        # Принимаем как готовое хранилище, так и список dict-строк (например, в тестах)
+        self._partitions = None
+        self._store = rows if isinstance(rows, ColumnStore) else ColumnStore.from_rows(rows)
+        self._detached = True
+        # Индексы строятся лениво и сами досчитывают строки, добавленные через append
+        self._indexes = IndexSet(self._store) if settings.index_enabled else None
+        self.data_version += 1
+        self._rebuild_cube()
+
+    @property
+    def result_cache(self) -> Optional[ResultCache]:
+        if self._result_cache is None and settings.result_cache_size > 0:
+            self._result_cache = ResultCache(settings.result_cache_size)
+        return self._result_cache
+
+    def _rebuild_cube(self) -> None:
+        if not settings.cube_enabled:
+            self._cube = None
+            return
+        start = time.time()
+        self._cube = AggregateCube(self._store, lazy=settings.cube_lazy)
+        logger.info('Куб агрегатов построен за %.3f сек (lazy=%s)', time.time() - start, settings.cube_lazy)
+
+    def append(self, rows) -> None:
+        """Добавляет строки в датасет и досчитывает их в куб без полной перестройки."""
+        with self._data_lock:
+            self._append(rows)
+            self._detached = True
+
+    def _append(self, rows) -> None:
+        if self._partitions is not None:
+            raise ValueError('В датасет из партиций строки добавляются дописыванием файлов (см. ingest)')
+        self.data_version += 1
+        if self.streaming:
+            # В потоковом режиме строки не хранятся: буфер чанка сразу сворачивается в куб
+            self._store.clear_rows()
+            self._store.extend(rows)
+            self.row_count += len(self._store)
+            if self._cube is not None:
+                self._cube.patch(0)
+            self._store.clear_rows()
+            return
+        self._store.extend(rows)
+        if self._cube is not None:
+            self._cube.patch()
+
+    @property
+    def _data_lock(self) -> threading.RLock:
+        # Ленивое создание: тестовые подклассы не вызывают __init__
+        return self.__dict__.setdefault('_lock', threading.RLock())
+
+    @staticmethod
+    def _read_fingerprint(path: str, end: int) -> Tuple[bytes, bytes]:
+        with open(path, 'rb') as f:
+            head = f.read(min(end, FINGERPRINT_BYTES))
+            f.seek(max(0, end - FINGERPRINT_BYTES))
+            tail = f.read(min(end, FINGERPRINT_BYTES))
+        return head, tail
+
+    def _track(self, path: str, end: int) -> None:
+        self._offset = end
+        self._fingerprint = self._read_fingerprint(path, end)
+
+    @property
+    def file_offset(self) -> Optional[int]:
+        """Сколько байт CSV отражают данные; None — данные не совпадают с началом одного файла."""
+        if self._partitions is not None or self._detached:
             return None
+        return self._offset
+
+    def ingest(self) -> int:
+        """Дочитывает строки, дописанные в CSV после последней загрузки.
+
+        Читаются только новые байты, строки досчитываются в куб через append —
+        время пропорционально числу новых строк. Незавершённая последняя строка
+        ждёт следующего вызова. Если файл укорочен или перезаписан (не совпал
+        отпечаток уже прочитанных байт), датасет перезагружается целиком.
+        Возвращает число добавленных строк (при перезагрузке — всех строк).
+        Для датасета из партиций подхватываются новые и удалённые файлы, а
+        изменённые загруженные партиции дочитываются так же, по отдельности.
+        """
+        with self._data_lock:
+            if self._partitions is not None:
+                version = self._partitions.version
+                added = self._partitions.refresh()
+                if self._partitions.version != version:
+                    self.data_version += 1
+                return added
+            size = os.path.getsize(self.path)
+            if size < self._offset or self._read_fingerprint(self.path, self._offset) != self._fingerprint:
+                return self._reload()
+            if size == self._offset:
+                return 0
+            with open(self.path, 'rb') as f:
+                f.seek(self._offset)
+                appended = f.read(size - self._offset)
+            complete = appended.rfind(b'\n') + 1
+            if not complete:
+                return 0
+            header = self._fingerprint[0].split(b'\n', 1)[0].decode('utf-8')
+            fields = next(csv.reader([header]))
+            lines = appended[:complete].decode('utf-8').splitlines(keepends=True)
+            rows = [self._prepare_row(row) for row in csv.DictReader(lines, fieldnames=fields)]
+            self._append(rows)
+            self._track(self.path, self._offset + complete)
+            logger.info('Дочитано %d строк (%d байт) из %s', len(rows), complete, self.path)
+            return len(rows)
 
-    def _convert_types(self, row: Dict[str, str]) -> Dict[str, Any]:
-        # Приводим нужные поля к числам
-        for key in ['Earnings_USD', 'Job_Completed', 'Rehire_Rate', 'Marketing_Spend']:
+    def _reload(self) -> int:
+        logger.warning('CSV %s укорочен или перезаписан, датасет перезагружается целиком', self.path)
+        if self.streaming:
+            self._load_stream(self.path)
+            self.data_version += 1
+            return self.row_count
+        self.data = self._load_dataset(self.path)
+        self._detached = False
+        return len(self.data)
+
+    def start_tail(self, interval: float = settings.tail_interval) -> None:
+        """Режим tail: фоновый поток раз в interval секунд вызывает ingest."""
+        if self._tail_stop is not None:
+            return
+        stop = self._tail_stop = threading.Event()
+
+        def follow() -> None:
+            while not stop.wait(interval):
+                try:
+                    self.ingest()
+                except Exception as e:
+                    logger.error('Ошибка дочитывания %s: %s', self.path, e)
+
+        threading.Thread(target=follow, name='csv-tail', daemon=True).start()
+        logger.info('Режим tail для %s: проверка каждые %s сек', self.path, interval)
+
+    def stop_tail(self) -> None:
+        if self._tail_stop is not None:
+            self._tail_stop.set()
+            self._tail_stop = None
+
+    def _load_csv(self, path: str, end: Optional[int] = None) -> ColumnStore:
+        workers = parse_workers()
+        size = os.path.getsize(path) if end is None else end
+        store = None
+        if workers > 1 and size >= settings.parse_parallel_min_bytes:
+            start = time.time()
             try:
-                row[key] = float(row[key]) if '.' in row[key] else int(row[key])
-            except Exception:
-                row[key] = 0
+                store = parse_parallel(path, None, workers, end=size)
+                logger.info('CSV разобран в %d процессах за %.3f сек', workers, time.time() - start)
+            except UnsafeSplit as e:
+                logger.warning('Параллельный разбор невозможен (%s), разбираю последовательно', e)
+        if store is None:
+            reader = csv.DictReader(read_lines(path, end=end))
+            store = ColumnStore.from_rows(self._prepare_row(row) for row in reader)
+        log_invalid(path, store)
+        return store
+
+    def _load_dataset(self, path: str) -> ColumnStore:
+        """Загружает датасет из бинарного снапшота, а при его отсутствии/устаревании — из CSV."""
+        if not settings.snapshot_enabled:
+            size = os.path.getsize(path)
+            store = self._load_csv(path, end=size)
+            self._track(path, size)
+            return store
+        start = time.time()
+        # Размер снимаем до проверки: свежий снапшот (размер совпал) покрывает ровно эти байты
+        size = os.path.getsize(path)
+        store = snapshot.load(path, verify_hash=settings.snapshot_verify_hash)
+        if store is not None:
+            self._track(path, size)
+            logger.info('Датасет загружен из снапшота за %.3f сек (%d строк)', time.time() - start, len(store))
+            log_invalid(path, store)
+            return store
+        # Ключ CSV снимаем до разбора, чтобы правка файла во время загрузки не дала «свежий» снапшот,
+        # а строки, дописанные во время разбора, не попали в него (их подхватит ingest)
+        source = snapshot.source_key(path)
+        store = self._load_csv(path, end=source['size'])
+        self._track(path, source['size'])
+        try:
+            snapshot.write(path, store, source)
+        except OSError as e:
+            logger.warning('Не удалось записать снапшот для %s: %s', path, e)
+        logger.info('Датасет разобран из CSV за %.3f сек (%d строк)', time.time() - start, len(store))
+        return store
+
+    def _read_chunks(self, path: str, end: Optional[int] = None) -> Iterator[List[Dict[str, Any]]]:
+        """Генератор строк CSV пачками по settings.stream_chunk_rows."""
+        reader = csv.DictReader(read_lines(path, end=end))
+        while True:
+            chunk = [self._prepare_row(row) for row in islice(reader, settings.stream_chunk_rows)]
+            if not chunk:
+                return
+            yield chunk
+
+    def _load_stream(self, path: str) -> None:
+        """Потоковая загрузка: в памяти только буфер одного чанка и накопленные агрегаты."""
+        start = time.time()
+        # Буфер переиспользуется между чанками, чтобы коды категорий в кубе были едиными
+        self._store = ColumnStore()
+        self._cube = AggregateCube(
+            self._store, grouping_sets=PLAN_GROUPING_SETS, on_demand=False
+        ) if settings.cube_enabled else None
+        self.row_count = 0
+        size = os.path.getsize(path)
+        for chunk in self._read_chunks(path, end=size):
+            self.append(chunk)
+        self._track(path, size)
+        self._detached = False
+        log_invalid(path, self._store)
+        logger.info('Потоковая загрузка %d строк за %.3f сек', self.row_count, time.time() - start)
+    
+    def _prepare_row(self, row: Dict[str, str]) -> Dict[str, Any]:
+        """Строка CSV перед записью в хранилище; типы колонок приводит ColumnStore по схеме."""
         return row
 
+    def _scan(self, specs: Sequence[AggSpec]) -> List[GroupStats]:
+        if self._partitions is not None:
+            scanned = self._partitions.rows_scanned
+            results = self._partitions.resolve(specs)
+            self.rows_scanned += self._partitions.rows_scanned - scanned
+            return results
+        if self.streaming:
+            return self._scan_stream(specs)
+        store = self.data
+        results = vectorized.scan(store, specs) if vectorized.enabled(len(store)) else scan(store, specs)
+        self.rows_scanned += len(store)
+        return results
+
+    def _scan_stream(self, specs: Sequence[AggSpec]) -> List[GroupStats]:
+        """Повторный потоковый проход по файлу для агрегатов, которых нет в кубе."""
+        results: List[GroupStats] = [{} for _ in specs]
+        for rows in self._read_chunks(self.path, end=self._offset or None):
+            chunk = ColumnStore.from_rows(rows)
+            partials = vectorized.scan(chunk, specs) if vectorized.enabled(len(chunk)) else scan(chunk, specs)
+            for merged, partial in zip(results, partials):
+                merge_groups(merged, partial)
+            self.rows_scanned += len(chunk)
+        return results
+
+    def _resolve(self, specs: Sequence[AggSpec]) -> List[GroupStats]:
+        """Агрегаты из prefetch, куба или индексов; остальное считается за один проход по строкам."""
+        known = dict(self._prefetched or {})
+        missing = []
+        # Под блокировкой: ingest из потока tail не должен менять куб и колонки посреди запроса
+        with self._data_lock:
+            for spec in specs:
+                if spec in known:
+                    continue
+                if self._cube is not None and self._cube.can_answer(spec):
+                    known[spec] = self._cube.answer(spec)
+                elif self._indexes is not None and spec.where:
+                    known[spec] = self._indexes.answer(spec)
+                else:
+                    missing.append(spec)
+            if missing:
+                known.update(zip(missing, self._scan(missing)))
+        return [known[spec] for spec in specs]
+
+    def _fetch(self, method: str, **params) -> List[GroupStats]:
+        return self._resolve(PLANS[method](**params))
+
+    def aggregate(
+        self,
+        metric: Optional[str],
+        aggregate: str = 'avg',
+        by: Optional[str] = None,
+        where: Sequence[Predicate] = (),
+    ) -> Dict[Optional[str], float]:
+        """Универсальное ядро агрегации: metric/aggregate в разрезе by с фильтром where."""
+        (groups,) = self._resolve([AggSpec(metric, by, tuple(where))])
+        return {key: stats.get(aggregate) for key, stats in groups.items()}
+
+    def filtered_count(self, where: Sequence[Predicate]) -> int:
+        """Число строк, удовлетворяющих всем условиям where.
+
+        Пример: [Predicate('experience', '==', 'Expert'), Predicate('region', '==', 'Asia'),
+        Predicate('rehire_rate', '>', 70)] — эксперты в Азии с Rehire_Rate > 70.
+        """
+        where = tuple(where)
+        validate(AggSpec(None, where=where))
+        if self._indexes is not None:
+            with self._data_lock:
+                return self._indexes.count(where)
+        return int(self.aggregate(None, 'count', where=where).get(None) or 0)
+
+    def filtered_avg(self, metric: str, where: Sequence[Predicate] = ()) -> Optional[float]:
+        """Среднее metric по строкам, удовлетворяющим where (None, если таких строк нет)."""
+        return self.aggregate(metric, 'avg', where=where).get(None)
+
+    def plan_batch(self, calls: Sequence[Tuple[str, Dict[str, Any]]]) -> List[AggSpec]:
+        """Уникальные агрегаты, нужные для списка вызовов (метод, параметры)."""
+        specs: Dict[AggSpec, None] = {}
+        for method, params in calls:
+            accepted = _PLAN_PARAMS.get(method)
+            if accepted is None:
+                continue
+            plan = PLANS.get(method, _query_plan)
+            try:
+                planned = plan(**{k: v for k, v in params.items() if k in accepted})
+            except (TypeError, ValueError):
+                # ValidationError запроса query — тоже ValueError; ошибку покажет сам вызов
+                continue
+            specs.update(dict.fromkeys(planned))
+        return list(specs)
+
+    @contextmanager
+    def fused(self, calls: Sequence[Tuple[str, Dict[str, Any]]]):
+        """Считает агрегаты всех вызовов за один проход; методы внутри блока берут готовое."""
+        specs = self.plan_batch(calls)
+        self._prefetched = dict(zip(specs, self._resolve(specs))) if specs else {}
+        try:
+            yield specs
+        finally:
+            self._prefetched = None
+
     @staticmethod
-    def log_time(func):
+    def timed(func):
+        """Интервал analyzer и гистограмма analyzer_method_seconds{method=...} (core/metrics.py)."""
+        name = func.__name__
+
         def wrapper(self, *args, **kwargs):
-            start = time.time()
-            result = func(self, *args, **kwargs)
-            elapsed = time.time() - start
-            logger.info(f'{func.__name__} выполнен за {elapsed:.3f} сек')
+            with tracer.span('analyzer', metric='analyzer_method_seconds', method=name) as span:
+                result = func(self, *args, **kwargs)
+            logger.debug('%s выполнен за %.6f сек', name, span.seconds)
             return result
         return functools.wraps(func)(wrapper)
 
-    @log_time
+    @staticmethod
+    def memoize(func):
+        """Кэширует результат по имени метода и нормализованным аргументам.
+
+        Аргументы приводятся к именованным со значениями по умолчанию, так что
+        percent_high_rehire() и percent_high_rehire(threshold=50.0) — одна запись.
+        Тип значения входит в ключ: 50 и 50.0 печатаются по-разному.
+        """
+        signature = inspect.signature(func)
+
+        def wrapper(self, *args, **kwargs):
+            cache = self.result_cache
+            if cache is None:
+                return func(self, *args, **kwargs)
+            bound = signature.bind(self, *args, **kwargs)
+            bound.apply_defaults()
+            params = list(bound.arguments.items())[1:]
+            key = (func.__name__,) + tuple((name, type(value).__name__, value) for name, value in params)
+            try:
+                hash(key)
+            except TypeError:
+                return func(self, *args, **kwargs)
+            return cache.get_or_compute(key, self.data_version, lambda: func(self, *args, **kwargs))
+        return functools.wraps(func)(wrapper)
+
+    @timed
+    @memoize
+    def query(
+        self,
+        metric: Optional[str] = None,
+        aggregate: str = 'avg',
+        group_by: Optional[str] = None,
+        filters: Sequence[Any] = (),
+        top_k: Optional[int] = None,
+    ) -> str:
+        """Произвольный агрегат по схеме QueryInput: metric/aggregate в разрезе group_by с фильтрами.
+
+        Именованные методы ниже — готовые пресеты над теми же агрегатами ядра.
+        """
+        plan = compile_query(QueryInput(
+            metric=metric, aggregate=aggregate, group_by=group_by, filters=list(filters), top_k=top_k))
+        return render(plan, execute(self, plan))
+
+    @timed
+    @memoize
     def crypto_vs_other_income(self) -> str:
-        crypto = [r.get('Earnings_USD', 0) for r in self.data if r.get('Payment_Method') == 'Crypto']
-        other = [r.get('Earnings_USD', 0) for r in self.data if r.get('Payment_Method') != 'Crypto']
+        crypto, other = map(_total, self._fetch('crypto_vs_other_income'))
         if not crypto or not other:
             return 'Недостаточно данных для анализа.'
-        avg_crypto = sum(crypto) / len(crypto)
-        avg_other = sum(other) / len(other)
+        avg_crypto = crypto.mean
+        avg_other = other.mean
         diff = avg_crypto - avg_other
         percent = (diff / avg_other) * 100
         return (
@@ -57,310 +541,255 @@ class DataAnalyzer:
             f'Разница: {diff:.2f} USD ({percent:.1f}%)'
         )
 
-    @log_time
+    @timed
+    @memoize
     def income_by_region(self) -> str:
-        region_sums: Dict[str, float] = {}
-        region_counts: Dict[str, int] = {}
-        for r in self.data:
-            region = r.get('Client_Region', 'Unknown')
-            region_sums[region] = region_sums.get(region, 0.0) + r.get('Earnings_USD', 0)
-            region_counts[region] = region_counts.get(region, 0) + 1
-        if not region_sums:
+        (groups,) = self._fetch('income_by_region')
+        if not groups:
             return 'Недостаточно данных для анализа.'
-        region_avg = {region: region_sums[region] / region_counts[region] for region in region_sums}
+        region_avg = {region: stats.mean for region, stats in groups.items()}
         sorted_regions = sorted(region_avg.items(), key=lambda x: x[1], reverse=True)
         result = 'Средний доход по регионам:\n'
         for region, income in sorted_regions:
             result += f'- {region}: {income:.2f} USD\n'
         return result
 
-    @log_time
+    @timed
+    @memoize
     def percent_experts_lt_100_projects(self) -> str:
-        experts = [r for r in self.data if r.get('Experience_Level') == 'Expert']
+        experts, lt_100 = map(_total, self._fetch('percent_experts_lt_100_projects'))
         if not experts:
             return 'Нет данных по экспертам.'
-        lt_100 = [r for r in experts if r.get('Job_Completed', 0) < 100]
-        percent = (len(lt_100) / len(experts)) * 100
-        return f"{percent:.1f}% экспертов выполнили менее 100 проектов ({len(lt_100)}/{len(experts)})."
+        lt_100 = lt_100.count if lt_100 else 0
+        percent = (lt_100 / experts.count) * 100
+        return f"{percent:.1f}% экспертов выполнили менее 100 проектов ({lt_100}/{experts.count})."
 
-    @log_time
+    @timed
+    @memoize
     def avg_income_by_category(self) -> str:
-        categories: Dict[str, float] = {}
-        counts: Dict[str, int] = {}
-        for r in self.data:
-            cat = r.get('Job_Category', 'Unknown')
-            categories[cat] = categories.get(cat, 0) + r.get('Earnings_USD', 0)
-            counts[cat] = counts.get(cat, 0) + 1
-        if not categories:
+        (groups,) = self._fetch('avg_income_by_category')
+        if not groups:
             return 'Недостаточно данных для анализа.'
         result = 'Средний доход по категориям работ:\n'
-        for cat in categories:
-            avg = categories[cat] / counts[cat]
-            result += f'- {cat}: {avg:.2f} USD\n'
+        for cat, stats in groups.items():
+            result += f'- {cat}: {stats.mean:.2f} USD\n'
         return result
 
-    @log_time
+    @timed
+    @memoize
     def avg_income_by_experience(self) -> str:
-        levels: Dict[str, float] = {}
-        counts: Dict[str, int] = {}
-        for r in self.data:
-            lvl = r.get('Experience_Level', 'Unknown')
-            levels[lvl] = levels.get(lvl, 0) + r.get('Earnings_USD', 0)
-            counts[lvl] = counts.get(lvl, 0) + 1
-        if not levels:
+        (groups,) = self._fetch('avg_income_by_experience')
+        if not groups:
             return 'Недостаточно данных для анализа.'
         result = 'Средний доход по уровню опыта:\n'
-        for lvl in levels:
-            avg = levels[lvl] / counts[lvl]
-            result += f'- {lvl}: {avg:.2f} USD\n'
+        for lvl, stats in groups.items():
+            result += f'- {lvl}: {stats.mean:.2f} USD\n'
         return result
 
-    @log_time
+    @timed
+    @memoize
     def top5_regions_by_experts(self) -> str:
-        region_experts: Dict[str, int] = {}
-        for r in self.data:
-            if r.get('Experience_Level') == 'Expert':
-                region = r.get('Client_Region', 'Unknown')
-                region_experts[region] = region_experts.get(region, 0) + 1
-        if not region_experts:
+        (groups,) = self._fetch('top5_regions_by_experts')
+        if not groups:
             return 'Нет данных по регионам.'
+        region_experts = {region: stats.count for region, stats in groups.items()}
         sorted_regions = sorted(region_experts.items(), key=lambda x: x[1], reverse=True)[:5]
         result = 'Топ-5 регионов по количеству экспертов:\n'
         for region, count in sorted_regions:
             result += f'- {region}: {count}\n'
         return result
 
-    @log_time
+    @timed
+    @memoize
     def percent_high_rehire(self, threshold: float = 50.0) -> str:
-        high_rehire = [r for r in self.data if r.get('Rehire_Rate', 0) > threshold]
-        percent = (len(high_rehire) / len(self.data)) * 100 if self.data else 0
-        return f'Процент фрилансеров с повторным наймом выше {threshold}%: {percent:.1f}% ({len(high_rehire)}/{len(self.data)})'
+        high, total = map(_total, self._fetch('percent_high_rehire', threshold=threshold))
+        high = high.count if high else 0
+        total = total.count if total else 0
+        percent = (high / total) * 100 if total else 0
+        return f'Процент фрилансеров с повторным наймом выше {threshold}%: {percent:.1f}% ({high}/{total})'
 
-    @log_time
+    @timed
+    @memoize
     def avg_job_duration_all(self) -> str:
-        durations = [self._safe_duration(r.get('Job_Duration_Days', 0)) for r in self.data]
-        durations = [d for d in durations if d and d > 0]
+        durations = _total(self._fetch('avg_job_duration_all')[0])
         if not durations:
             return 'Нет данных о длительности выполнения работ.'
-        avg = sum(durations) / len(durations)
-        return f'Среднее время выполнения работ: {avg:.1f} дней'
+        return f'Среднее время выполнения работ: {durations.mean:.1f} дней'
 
-    @log_time
-    def avg_job_duration_by_category(self) -> str:
-        sum_map, count_map = {}, {}
-        for r in self.data:
-            k = r.get('Job_Category', 'Unknown')
-            dur = self._safe_duration(r.get('Job_Duration_Days', 0))
-            if dur and dur > 0:
-                sum_map[k] = sum_map.get(k, 0) + dur
-                count_map[k] = count_map.get(k, 0) + 1
-        if not sum_map:
-            return 'Нет данных по категориям.'
-        res = ['Среднее время выполнения по категориям:']
-        for k in sum_map:
-            res.append(f'- {k}: {sum_map[k]/count_map[k]:.1f} дней')
+    def _avg_job_duration_by(self, method: str, title: str, empty: str) -> str:
+        (groups,) = self._fetch(method)
+        if not groups:
+            return empty
+        res = [title]
+        for k, stats in groups.items():
+            res.append(f'- {k}: {stats.mean:.1f} дней')
         return '\n'.join(res)
 
-    @log_time
+    @timed
+    @memoize
+    def avg_job_duration_by_category(self) -> str:
+        return self._avg_job_duration_by(
+            'avg_job_duration_by_category', 'Среднее время выполнения по категориям:', 'Нет данных по категориям.')
+
+    @timed
+    @memoize
     def avg_job_duration_by_region(self) -> str:
-        sum_map, count_map = {}, {}
-        for r in self.data:
-            k = r.get('Client_Region', 'Unknown')
-            dur = self._safe_duration(r.get('Job_Duration_Days', 0))
-            if dur and dur > 0:
-                sum_map[k] = sum_map.get(k, 0) + dur
-                count_map[k] = count_map.get(k, 0) + 1
-        if not sum_map:
-            return 'Нет данных по регионам.'
-        res = ['Среднее время выполнения по регионам:']
-        for k in sum_map:
-            res.append(f'- {k}: {sum_map[k]/count_map[k]:.1f} дней')
-        return '\n'.join(res)
+        return self._avg_job_duration_by(
+            'avg_job_duration_by_region', 'Среднее время выполнения по регионам:', 'Нет данных по регионам.')
 
-    @log_time
+    @timed
+    @memoize
     def avg_job_duration_by_experience(self) -> str:
-        sum_map, count_map = {}, {}
-        for r in self.data:
-            k = r.get('Experience_Level', 'Unknown')
-            dur = self._safe_duration(r.get('Job_Duration_Days', 0))
-            if dur and dur > 0:
-                sum_map[k] = sum_map.get(k, 0) + dur
-                count_map[k] = count_map.get(k, 0) + 1
-        if not sum_map:
-            return 'Нет данных по уровню опыта.'
-        res = ['Среднее время выполнения по уровню опыта:']
-        for k in sum_map:
-            res.append(f'- {k}: {sum_map[k]/count_map[k]:.1f} дней')
-        return '\n'.join(res)
+        return self._avg_job_duration_by(
+            'avg_job_duration_by_experience', 'Среднее время выполнения по уровню опыта:', 'Нет данных по уровню опыта.')
 
-    @log_time
+    @timed
+    @memoize
     def avg_job_duration_by_platform(self) -> str:
-        sum_map, count_map = {}, {}
-        for r in self.data:
-            k = r.get('Platform', 'Unknown')
-            dur = self._safe_duration(r.get('Job_Duration_Days', 0))
-            if dur and dur > 0:
-                sum_map[k] = sum_map.get(k, 0) + dur
-                count_map[k] = count_map.get(k, 0) + 1
-        if not sum_map:
-            return 'Нет данных по платформам.'
-        res = ['Среднее время выполнения по платформам:']
-        for k in sum_map:
-            res.append(f'- {k}: {sum_map[k]/count_map[k]:.1f} дней')
-        return '\n'.join(res)
+        return self._avg_job_duration_by(
+            'avg_job_duration_by_platform', 'Среднее время выполнения по платформам:', 'Нет данных по платформам.')
 
-    @log_time
+    @timed
+    @memoize
     def avg_job_duration_by_project_type(self) -> str:
-        sum_map, count_map = {}, {}
-        for r in self.data:
-            k = r.get('Project_Type', 'Unknown')
-            dur = self._safe_duration(r.get('Job_Duration_Days', 0))
-            if dur and dur > 0:
-                sum_map[k] = sum_map.get(k, 0) + dur
-                count_map[k] = count_map.get(k, 0) + 1
-        if not sum_map:
-            return 'Нет данных по типу проекта.'
-        res = ['Среднее время выполнения по типу проекта:']
-        for k in sum_map:
-            res.append(f'- {k}: {sum_map[k]/count_map[k]:.1f} дней')
-        return '\n'.join(res)
+        return self._avg_job_duration_by(
+            'avg_job_duration_by_project_type', 'Среднее время выполнения по типу проекта:', 'Нет данных по типу проекта.')
 
-    @log_time
+    @timed
+    @memoize
     def avg_income_by_platform(self) -> str:
-        sums, counts = {}, {}
-        for r in self.data:
-            plat = r.get('Platform', 'Unknown')
-            sums[plat] = sums.get(plat, 0) + r.get('Earnings_USD', 0)
-            counts[plat] = counts.get(plat, 0) + 1
-        if not sums:
+        (groups,) = self._fetch('avg_income_by_platform')
+        if not groups:
             return 'Нет данных по платформам.'
         res = 'Средний доход по платформам:\n'
-        for plat in sums:
-            res += f'- {plat}: {sums[plat]/counts[plat]:.2f} USD\n'
+        for plat, stats in groups.items():
+            res += f'- {plat}: {stats.mean:.2f} USD\n'
         return res
     
-    @log_time
+    @timed
+    @memoize
     def avg_income_by_project_type(self) -> str:
-        sums, counts = {}, {}
-        for r in self.data:
-            t = r.get('Project_Type', 'Unknown')
-            sums[t] = sums.get(t, 0) + r.get('Earnings_USD', 0)
-            counts[t] = counts.get(t, 0) + 1
-        if not sums:
+        (groups,) = self._fetch('avg_income_by_project_type')
+        if not groups:
             return 'Нет данных по типу проекта.'
         res = 'Средний доход по типу проекта:\n'
-        for t in sums:
-            res += f'- {t}: {sums[t]/counts[t]:.2f} USD\n'
+        for t, stats in groups.items():
+            res += f'- {t}: {stats.mean:.2f} USD\n'
         return res
 
-    @log_time
+    @timed
+    @memoize
     def avg_hourly_rate_by(self, by: str = 'category') -> str:
-        key_map = {
-            'category': 'Job_Category',
-            'region': 'Client_Region',
-            'experience': 'Experience_Level',
-            'platform': 'Platform',
-            'project_type': 'Project_Type'
-        }
-        key = key_map.get(by, 'Job_Category')
-        sums, counts = {}, {}
-        for r in self.data:
-            k = r.get(key, 'Unknown')
-            rate = r.get('Hourly_Rate', None)
-            if rate is not None:
-                try:
-                    rate = float(rate)
-                except Exception:
-                    continue
-                sums[k] = sums.get(k, 0) + rate
-                counts[k] = counts.get(k, 0) + 1
-        if not sums:
+        (groups,) = self._fetch('avg_hourly_rate_by', by=by)
+        if not groups:
             return f'Нет данных по {by}.'
         res = f'Средняя ставка (Hourly Rate) по {by}:\n'
-        for k in sums:
-            res += f'- {k}: {sums[k]/counts[k]:.2f} USD/ч\n'
+        for k, stats in groups.items():
+            res += f'- {k}: {stats.mean:.2f} USD/ч\n'
         return res
 
-    @log_time
+    @timed
+    @memoize
     def avg_success_rate_by(self, by: str = 'category') -> str:
-        key_map = {
-            'category': 'Job_Category',
-            'region': 'Client_Region',
-            'experience': 'Experience_Level',
-            'platform': 'Platform',
-            'project_type': 'Project_Type'
-        }
-        key = key_map.get(by, 'Job_Category')
-        sums, counts = {}, {}
-        for r in self.data:
-            k = r.get(key, 'Unknown')
-            rate = r.get('Job_Success_Rate', None)
-            if rate is not None:
-                try:
-                    rate = float(rate)
-                except Exception:
-                    continue
-                sums[k] = sums.get(k, 0) + rate
-                counts[k] = counts.get(k, 0) + 1
-        if not sums:
+        (groups,) = self._fetch('avg_success_rate_by', by=by)
+        if not groups:
             return f'Нет данных по {by}.'
         res = f'Средний Job Success Rate по {by}:\n'
-        for k in sums:
-            res += f'- {k}: {sums[k]/counts[k]:.1f}%\n'
+        for k, stats in groups.items():
+            res += f'- {k}: {stats.mean:.1f}%\n'
         return res
 
-    @log_time
+    @timed
+    @memoize
     def avg_client_rating_by(self, by: str = 'category') -> str:
-        key_map = {
-            'category': 'Job_Category',
-            'region': 'Client_Region',
-            'experience': 'Experience_Level',
-            'platform': 'Platform',
-            'project_type': 'Project_Type'
-        }
-        key = key_map.get(by, 'Job_Category')
-        sums, counts = {}, {}
-        for r in self.data:
-            k = r.get(key, 'Unknown')
-            rating = r.get('Client_Rating', None)
-            if rating is not None:
-                try:
-                    rating = float(rating)
-                except Exception:
-                    continue
-                sums[k] = sums.get(k, 0) + rating
-                counts[k] = counts.get(k, 0) + 1
-        if not sums:
+        (groups,) = self._fetch('avg_client_rating_by', by=by)
+        if not groups:
             return f'Нет данных по {by}.'
         res = f'Средний рейтинг клиента по {by}:\n'
-        for k in sums:
-            res += f'- {k}: {sums[k]/counts[k]:.2f}\n'
+        for k, stats in groups.items():
+            res += f'- {k}: {stats.mean:.2f}\n'
         return res
 
-    @log_time
+    @timed
+    @memoize
     def avg_marketing_spend_by(self, by: str = 'category') -> str:
-        key_map = {
-            'category': 'Job_Category',
-            'region': 'Client_Region',
-            'experience': 'Experience_Level',
-            'platform': 'Platform',
-            'project_type': 'Project_Type'
-        }
-        key = key_map.get(by, 'Job_Category')
-        sums, counts = {}, {}
-        for r in self.data:
-            k = r.get(key, 'Unknown')
-            spend = r.get('Marketing_Spend', None)
-            if spend is not None:
-                try:
-                    spend = float(spend)
-                except Exception:
-                    continue
-                sums[k] = sums.get(k, 0) + spend
-                counts[k] = counts.get(k, 0) + 1
-        if not sums:
+        (groups,) = self._fetch('avg_marketing_spend_by', by=by)
+        if not groups:
             return f'Нет данных по {by}.'
         res = f'Средние маркетинговые расходы по {by}:\n'
-        for k in sums:
-            res += f'- {k}: {sums[k]/counts[k]:.2f} USD\n'
-        return res
\ No newline at end of file
+        for k, stats in groups.items():
+            res += f'- {k}: {stats.mean:.2f} USD\n'
+        return res
+
+
+class PartitionAnalyzer(DataAnalyzer):
+    """DataAnalyzer одного файла партиции: значения ключей из пути подставляются в строки."""
+
+    def __init__(self, path: str, keys: Dict[str, str], streaming: bool = False):
+        self.keys = {DIMENSIONS[key]: value for key, value in keys.items() if key in DIMENSIONS}
+        super().__init__(path, streaming)
+
+    def _prepare_row(self, row: Dict[str, str]) -> Dict[str, Any]:
+        row.update(self.keys)
+        return row
+
+    def _load_dataset(self, path: str) -> ColumnStore:
+        # Снапшот и параллельный разбор не проходят через _prepare_row: ключи ставим после загрузки
+        store = super()._load_dataset(path)
+        for column, value in self.keys.items():
+            store.fill(column, value)
+        return store
+
+
+class LazyDataAnalyzer:
+    """Отложенный DataAnalyzer: грузится в фоне (preload) или при первом обращении.
+
+    Атрибуты и методы проксируются в загруженный экземпляр, так что инструменты
+    работают с ним как с обычным DataAnalyzer.
+    """
+
+    def __init__(self, *args, **kwargs) -> None:
+        self._args = args
+        self._kwargs = kwargs
+        self._instance: Optional[DataAnalyzer] = None
+        self._error: Optional[BaseException] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.load_seconds: Optional[float] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._instance is not None
+
+    def _load(self) -> None:
+        start = time.perf_counter()
+        try:
+            self._instance = DataAnalyzer(*self._args, **self._kwargs)
+            if settings.tail_enabled:
+                self._instance.start_tail(settings.tail_interval)
+        except BaseException as e:
+            self._error = e
+            logger.error('Ошибка загрузки датасета: %s', e)
+        self.load_seconds = time.perf_counter() - start
+
+    def preload(self) -> None:
+        """Запускает загрузку датасета в фоновом потоке."""
+        with self._lock:
+            if self._instance is None and self._thread is None:
+                self._thread = threading.Thread(target=self._load, name='dataset-loader', daemon=True)
+                self._thread.start()
+
+    def get(self) -> DataAnalyzer:
+        if self._instance is None:
+            with self._lock:
+                thread = self._thread
+                if thread is None and self._instance is None and self._error is None:
+                    self._load()
+            if thread is not None:
+                thread.join()
+            if self._instance is None:
+                raise RuntimeError(f'Датасет не загружен: {self._error}')
+        return self._instance
+
+    def __getattr__(self, name: str):
+        return getattr(self.get(), name)
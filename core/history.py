@@ -0,0 +1,75 @@
+import json
+from typing import List, Sequence
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage, ToolMessage
+
+# Служебные токены роли и разметки одного сообщения
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Оценка числа токенов без токенизатора провайдера: ~4 байта UTF-8 на токен.
+
+    Кириллица (2 байта на символ) оценивается с запасом, так что бюджет не переполняется.
+    """
+    return len(text.encode('utf-8')) // 4 + 1
+
+
+def message_tokens(message: BaseMessage) -> int:
+    content = message.content if isinstance(message.content, str) else json.dumps(message.content, ensure_ascii=False)
+    tokens = MESSAGE_OVERHEAD_TOKENS + estimate_tokens(content)
+    for call in getattr(message, 'tool_calls', None) or []:
+        tokens += estimate_tokens(call['name'] + json.dumps(call['args'], ensure_ascii=False))
+    return tokens
+
+
+def split_turns(messages: Sequence[BaseMessage]) -> List[List[BaseMessage]]:
+    """Ходы диалога: HumanMessage и всё, что после него (вызовы инструментов, ответы)."""
+    turns: List[List[BaseMessage]] = []
+    for msg in messages:
+        if isinstance(msg, SystemMessage):
+            continue
+        if isinstance(msg, HumanMessage):
+            turns.append([msg])
+        elif turns:
+            turns[-1].append(msg)
+    return turns
+
+
+def summarize_tool_output(message: ToolMessage) -> ToolMessage:
+    """Короткая замена старого результата инструмента: первая строка и пометка о сокращении.
+
+    Текст детерминирован: однажды сокращённая история остаётся байт-в-байт той же
+    в следующих ходах и не сбивает кэш префикса у провайдера. tool_call_id сохраняется,
+    чтобы вызов инструмента в AIMessage по-прежнему имел ответ.
+    """
+    lines = message.content.splitlines() if isinstance(message.content, str) else []
+    head = lines[0] if lines else ''
+    if len(lines) <= 1 and estimate_tokens(head) <= 32:
+        return message
+    summary = f'{head[:120]} … [результат сокращён: было ~{estimate_tokens(message.content)} токенов]'
+    return message.model_copy(update={'content': summary})
+
+
+def trim_history(messages: Sequence[BaseMessage], budget: int, max_turns: int = 0) -> List[BaseMessage]:
+    """История без системного сообщения, уложенная в бюджет токенов.
+
+    Последний ход сохраняется всегда и целиком. Сначала сокращаются результаты
+    инструментов в старых ходах (от старых к новым), и только если этого мало —
+    отбрасываются старые ходы целиком. max_turns > 0 — дополнительный предел числа ходов.
+    """
+    turns = split_turns(messages)
+    if max_turns > 0:
+        turns = turns[-max_turns:]
+    sizes = [sum(message_tokens(m) for m in turn) for turn in turns]
+    total = sum(sizes)
+    for i in range(len(turns) - 1):
+        if total <= budget:
+            break
+        turn = [summarize_tool_output(m) if isinstance(m, ToolMessage) else m for m in turns[i]]
+        size = sum(message_tokens(m) for m in turn)
+        turns[i], total, sizes[i] = turn, total - sizes[i] + size, size
+    start = 0
+    while total > budget and start < len(turns) - 1:
+        total -= sizes[start]
+        start += 1
+    return [m for turn in turns[start:] for m in turn]
@@ -0,0 +1,211 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from operator import itemgetter
+from typing import Dict, Iterator, List, Optional, Sequence
+from core.columns import CategoricalColumn, ColumnStore
+from core.kernel import DIMENSIONS, METRICS, AggSpec, GroupStats, Metric, Predicate, Stats, metric_value, validate
+
+_ONE, _ZERO = ord('1'), ord('0')
+
+
+def _bits(positions: Iterator[int], size: int) -> int:
+    """int-битсет строк: бит i установлен, если i есть в positions."""
+    digits = bytearray(b'0') * size
+    for i in positions:
+        digits[size - 1 - i] = _ONE
+    return int(digits, 2) if size else 0
+
+
+def iter_bits(mask: int) -> Iterator[int]:
+    """Номера установленных битов по возрастанию (то есть строки в порядке файла)."""
+    digits = bin(mask)[:1:-1]
+    i = digits.find('1')
+    while i >= 0:
+        yield i
+        i = digits.find('1', i + 1)
+
+
+class BitmapIndex:
+    """Bitmap-индекс категориальной колонки: для каждого кода — int, где бит i — строка i.
+
+    Конъюнкция условий по разным колонкам — побитовое AND, число строк — bit_count().
+    """
+
+    def __init__(self) -> None:
+        self.bitmaps: List[int] = []
+        self.size = 0
+
+    def patch(self, column: CategoricalColumn, size: int) -> None:
+        """Досчитывает битовые маски для строк [self.size, size)."""
+        start, count = self.size, size - self.size
+        if count <= 0:
+            return
+        self.bitmaps += [0] * (len(column.dictionary) - len(self.bitmaps))
+        codes = column.codes[start:size]
+        if getattr(codes, 'typecode', None) == 'B' or getattr(codes, 'format', None) == 'B':
+            # Байтовые коды: маска кода — translate в строку из '0'/'1' и разбор как двоичного числа (всё в C)
+            raw = bytes(codes)[::-1]
+            for code in set(raw):
+                table = bytes(_ONE if c == code else _ZERO for c in range(256))
+                self.bitmaps[code] |= int(raw.translate(table), 2) << start
+        else:
+            positions: Dict[int, List[int]] = {}
+            for i, code in enumerate(codes):
+                positions.setdefault(code, []).append(i)
+            for code, rows in positions.items():
+                self.bitmaps[code] |= _bits(iter(rows), count) << start
+        self.size = size
+
+    def mask(self, op: str, code: Optional[int], everything: int) -> int:
+        if code is None:
+            # Значения нет в словаре: '!=' выполняется всегда, '==' — никогда (как в scan)
+            return everything if op == '!=' else 0
+        bitmap = self.bitmaps[code] if code < len(self.bitmaps) else 0
+        return everything & ~bitmap if op == '!=' else bitmap
+
+
+class SortedIndex:
+    """Сортированный индекс метрики: значения (без пропусков, с учётом positive) по возрастанию и номера их строк.
+
+    Диапазонные условия — двоичный поиск; строки без значения в индекс не входят.
+    Равные значения идут в порядке строк.
+    """
+
+    def __init__(self, values, metric: Metric, size: int) -> None:
+        self.values = array('d')
+        self.rows = array('L')
+        self.size = 0
+        self.extend(values, metric, size)
+
+    def extend(self, values, metric: Metric, size: int) -> None:
+        """Досчитывает строки [self.size, size): хвост сортируется и вливается в индекс.
+
+        Новые значения встают на места двоичным поиском, готовые отрезки индекса
+        копируются срезами array — O(k log k + k log n) операций Python на k строк.
+        """
+        effective = ((i, metric_value(metric, values[i])) for i in range(self.size, size))
+        tail = sorted(((value, i) for i, value in effective if value is not None), key=itemgetter(0))
+        if not self.values:
+            self.values = array('d', (value for value, _ in tail))
+            self.rows = array('L', (row for _, row in tail))
+        elif tail:
+            old_values, old_rows = self.values, self.rows
+            new_values, new_rows = array('d'), array('L')
+            start = 0
+            for value, row in tail:
+                # bisect_right: новые строки идут после равных значений из прежних строк
+                position = bisect_right(old_values, value, start)
+                new_values += old_values[start:position]
+                new_rows += old_rows[start:position]
+                new_values.append(value)
+                new_rows.append(row)
+                start = position
+            new_values += old_values[start:]
+            new_rows += old_rows[start:]
+            self.values, self.rows = new_values, new_rows
+        self.size = size
+
+    def bounds(self, op: str, operand: float) -> List[tuple]:
+        """Диапазоны позиций в индексе, удовлетворяющие условию."""
+        n = len(self.values)
+        if operand != operand:
+            # Сравнение с NaN ложно всегда, кроме '!='
+            return [(0, n)] if op == '!=' else []
+        lo, hi = bisect_left(self.values, operand), bisect_right(self.values, operand)
+        return {
+            '<': [(0, lo)],
+            '<=': [(0, hi)],
+            '>': [(hi, n)],
+            '>=': [(lo, n)],
+            '==': [(lo, hi)],
+            '!=': [(0, lo), (hi, n)],
+        }[op]
+
+    def count(self, op: str, operand: float) -> int:
+        return sum(end - start for start, end in self.bounds(op, operand))
+
+    def mask(self, op: str, operand: float) -> int:
+        rows = self.rows
+        return _bits((rows[i] for start, end in self.bounds(op, operand) for i in range(start, end)), self.size)
+
+
+class IndexSet:
+    """Индексы хранилища, строятся лениво по первому запросу к колонке.
+
+    После добавления строк индексы досчитываются инкрементально: bitmap — по кодам
+    новых строк, сортированные — вливанием отсортированного хвоста.
+    """
+
+    def __init__(self, store: ColumnStore) -> None:
+        self.store = store
+        self._bitmaps: Dict[str, BitmapIndex] = {}
+        self._sorted: Dict[str, SortedIndex] = {}
+
+    def bitmap(self, dimension: str) -> BitmapIndex:
+        index = self._bitmaps.get(dimension)
+        if index is None:
+            index = self._bitmaps[dimension] = BitmapIndex()
+        index.patch(self.store.categorical[DIMENSIONS[dimension]], len(self.store))
+        return index
+
+    def sorted(self, metric: str) -> SortedIndex:
+        index = self._sorted.get(metric)
+        values, size = self.store.numeric[METRICS[metric].column], len(self.store)
+        if index is None or index.size > size:
+            index = self._sorted[metric] = SortedIndex(values, METRICS[metric], size)
+        elif index.size < size:
+            index.extend(values, METRICS[metric], size)
+        return index
+
+    def predicate_mask(self, p: Predicate) -> int:
+        if p.field in DIMENSIONS:
+            column = self.store.categorical[DIMENSIONS[p.field]]
+            everything = (1 << len(self.store)) - 1
+            return self.bitmap(p.field).mask(p.op, column.encode(str(p.value)), everything)
+        return self.sorted(p.field).mask(p.op, float(p.value))
+
+    def mask(self, where: Sequence[Predicate]) -> int:
+        mask = (1 << len(self.store)) - 1
+        for p in where:
+            mask &= self.predicate_mask(p)
+            if not mask:
+                break
+        return mask
+
+    def count(self, where: Sequence[Predicate]) -> int:
+        """Число строк под фильтром; одно числовое условие — чистый двоичный поиск."""
+        if len(where) == 1 and where[0].field in METRICS:
+            p = where[0]
+            return self.sorted(p.field).count(p.op, float(p.value))
+        return self.mask(where).bit_count()
+
+    def answer(self, spec: AggSpec) -> GroupStats:
+        """Результат spec, идентичный scan: строки под маской обходятся в порядке файла."""
+        validate(spec)
+        mask = self.mask(spec.where)
+        if spec.metric is None and spec.by is None:
+            count = mask.bit_count()
+            if not count:
+                return {}
+            stats = Stats()
+            stats.count = count
+            return {None: stats}
+        metric = METRICS[spec.metric] if spec.metric else None
+        values = self.store.numeric[metric.column] if metric else None
+        keys = self.store.categorical[DIMENSIONS[spec.by]].codes if spec.by else None
+        acc: Dict[Optional[int], Stats] = {}
+        for i in iter_bits(mask):
+            value = None
+            if metric is not None:
+                value = metric_value(metric, values[i])
+                if value is None:
+                    continue
+            key = keys[i] if keys is not None else None
+            stats = acc.get(key)
+            if stats is None:
+                stats = acc[key] = Stats()
+            stats.add(value)
+        if spec.by is None:
+            return acc
+        dictionary = self.store.categorical[DIMENSIONS[spec.by]].dictionary
+        return {dictionary[code]: stats for code, stats in acc.items()}
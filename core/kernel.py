@@ -0,0 +1,233 @@
+import operator
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple, Union
+from core.columns import ColumnStore
+
+
+class Metric(NamedTuple):
+    """Метрика — числовая колонка; строки с пропуском (NaN) в ней не учитываются."""
+    column: str
+    # Учитывать только значения > 0 (например, длительность работ)
+    positive: bool = False
+
+
+METRICS: Dict[str, Metric] = {
+    'earnings': Metric('Earnings_USD'),
+    'job_completed': Metric('Job_Completed'),
+    'rehire_rate': Metric('Rehire_Rate'),
+    'hourly_rate': Metric('Hourly_Rate'),
+    'success_rate': Metric('Job_Success_Rate'),
+    'client_rating': Metric('Client_Rating'),
+    'marketing_spend': Metric('Marketing_Spend'),
+    'job_duration': Metric('Job_Duration_Days', positive=True),
+}
+
+DIMENSIONS: Dict[str, str] = {
+    'category': 'Job_Category',
+    'region': 'Client_Region',
+    'experience': 'Experience_Level',
+    'platform': 'Platform',
+    'project_type': 'Project_Type',
+    'payment_method': 'Payment_Method',
+}
+
+AGGREGATES = ('avg', 'sum', 'count', 'min', 'max', 'var', 'std')
+
+OPERATORS: Dict[str, Callable[[float, float], bool]] = {
+    '==': operator.eq,
+    '!=': operator.ne,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+}
+# Коды категорий идут в порядке первого появления, а не по смыслу значений:
+# измерения сравниваются только на равенство
+DIMENSION_OPERATORS = ('==', '!=')
+
+
+class Predicate(NamedTuple):
+    """Условие фильтра: поле (метрика или измерение), оператор, значение."""
+    field: str
+    op: str
+    value: Union[str, float]
+
+
+class AggSpec(NamedTuple):
+    """Что посчитать за проход: метрика (None — количество строк), группировка, фильтр."""
+    metric: Optional[str]
+    by: Optional[str] = None
+    where: Tuple[Predicate, ...] = ()
+
+
+class Stats:
+    """Накопитель count/sum/min/max и дисперсии (Уэлфорд) по одной группе.
+
+    Среднее считается как sum/count, чтобы совпадать с построчным расчётом;
+    дисперсия — устойчивым онлайн-алгоритмом Уэлфорда, при слиянии частичных
+    накопителей (чанки, партиции) — по формуле Чана.
+    """
+    __slots__ = ('count', 'total', 'min', 'max', '_mu', 'm2')
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+        self._mu = 0.0
+        self.m2 = 0.0
+
+    def add(self, value: Optional[float]) -> None:
+        self.count += 1
+        if value is None:
+            return
+        self.total = self.total + value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+        delta = value - self._mu
+        self._mu += delta / self.count
+        self.m2 += delta * (value - self._mu)
+
+    @classmethod
+    def from_moments(
+        cls, count: int, total: float = 0, min: Optional[float] = None, max: Optional[float] = None, m2: float = 0.0,
+    ) -> 'Stats':
+        """Накопитель из готовых итогов группы (векторизованный бэкенд, core/vectorized.py)."""
+        stats = cls()
+        stats.count = count
+        stats.total = total
+        stats.min = min
+        stats.max = max
+        if min is not None:
+            stats._mu = total / count
+        stats.m2 = m2
+        return stats
+
+    def merge(self, other: 'Stats') -> None:
+        if not other.count:
+            return
+        count = self.count + other.count
+        delta = other._mu - self._mu
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self._mu += delta * other.count / count
+        self.count = count
+        self.total = self.total + other.total
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+        if other.max is not None and (self.max is None or other.max > self.max):
+            self.max = other.max
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count
+
+    @property
+    def variance(self) -> float:
+        return self.m2 / self.count
+
+    def get(self, aggregate: str) -> float:
+        if aggregate == 'avg':
+            return self.mean
+        if aggregate == 'sum':
+            return self.total
+        if aggregate == 'var':
+            return self.variance
+        if aggregate == 'std':
+            return self.variance ** 0.5
+        return getattr(self, aggregate)
+
+
+GroupStats = Dict[Optional[str], Stats]
+
+
+def merge_groups(into: GroupStats, partial: GroupStats) -> GroupStats:
+    """Сливает частичный результат (чанк, партиция) в общий, сохраняя порядок групп."""
+    for key, stats in partial.items():
+        merged = into.get(key)
+        if merged is None:
+            merged = into[key] = Stats()
+        merged.merge(stats)
+    return into
+
+
+def validate(spec: AggSpec) -> None:
+    if spec.metric is not None and spec.metric not in METRICS:
+        raise ValueError(f'Неизвестная метрика: {spec.metric}')
+    if spec.by is not None and spec.by not in DIMENSIONS:
+        raise ValueError(f'Неизвестная группировка: {spec.by}')
+    for p in spec.where:
+        if p.field not in METRICS and p.field not in DIMENSIONS:
+            raise ValueError(f'Неизвестное поле фильтра: {p.field}')
+        if p.op not in OPERATORS:
+            raise ValueError(f'Неизвестный оператор фильтра: {p.op}')
+        if p.field in DIMENSIONS and p.op not in DIMENSION_OPERATORS:
+            raise ValueError(f'Измерение {p.field} сравнивается только через == и !=, получено {p.op}')
+
+
+def metric_value(metric: Metric, raw: float) -> Optional[float]:
+    if raw != raw:
+        return None
+    if metric.positive and not raw > 0:
+        return None
+    return raw
+
+
+def _compile_predicate(store: ColumnStore, p: Predicate) -> Callable[[int], bool]:
+    if p.field in DIMENSIONS:
+        column = store.categorical[DIMENSIONS[p.field]]
+        codes, code = column.codes, column.encode(str(p.value))
+        if code is None:
+            # Значения нет в словаре: '!=' выполняется всегда, '==' — никогда
+            return (lambda i: True) if p.op == '!=' else (lambda i: False)
+        if p.op == '!=':
+            return lambda i: codes[i] != code
+        return lambda i: codes[i] == code
+    op = OPERATORS[p.op]
+    metric = METRICS[p.field]
+    values, operand = store.numeric[metric.column], float(p.value)
+
+    def check(i: int) -> bool:
+        value = metric_value(metric, values[i])
+        return value is not None and op(value, operand)
+    return check
+
+
+def scan(store: ColumnStore, specs: Sequence[AggSpec]) -> List[GroupStats]:
+    """Один проход по строкам, в котором считаются сразу все specs.
+
+    Группы возвращаются в порядке первой учтённой строки.
+    """
+    plans = []
+    for spec in specs:
+        validate(spec)
+        metric = METRICS[spec.metric] if spec.metric else None
+        plans.append((
+            store.categorical[DIMENSIONS[spec.by]].codes if spec.by else None,
+            store.numeric[metric.column] if metric else None,
+            metric,
+            [_compile_predicate(store, p) for p in spec.where],
+            {},
+        ))
+    for i in range(len(store)):
+        for keys, values, metric, predicates, acc in plans:
+            if predicates and not all(check(i) for check in predicates):
+                continue
+            value = None
+            if metric is not None:
+                value = metric_value(metric, values[i])
+                if value is None:
+                    continue
+            key = keys[i] if keys is not None else None
+            stats = acc.get(key)
+            if stats is None:
+                stats = acc[key] = Stats()
+            stats.add(value)
+    results = []
+    for spec, (_, _, _, _, acc) in zip(specs, plans):
+        if spec.by is None:
+            results.append(acc)
+            continue
+        dictionary = store.categorical[DIMENSIONS[spec.by]].dictionary
+        results.append({dictionary[code]: stats for code, stats in acc.items()})
+    return results
@@ -1,4 +1,5 @@
-import os
+import atexit, logging, logging.config, logging.handlers, os, queue, threading
+from typing import Dict, List, Optional
 
 base_dir = 'logs'
 sub_dirs = [
@@ -11,8 +12,6 @@ os.makedirs(base_dir, exist_ok=True)
 for sub_dir in sub_dirs:
     os.makedirs(os.path.join(base_dir, sub_dir), exist_ok=True)
 
-
-
 logger_config = {
 	'version': 1,
 	'disable_existing_loggers': False,
@@ -40,7 +39,7 @@ logger_config = {
 		},
         'batch_analytics': {
 			'class': 'logging.handlers.TimedRotatingFileHandler',
-            'level': 'INFO',
+            'level': 'DEBUG',
             'filename': 'logs/main/info_batch_analytics.log',
             'when': 'W0',
             'interval': 1,
@@ -58,7 +57,7 @@ logger_config = {
         },
         'trim_logger': {
             'class': 'logging.handlers.TimedRotatingFileHandler',
-            'level': 'INFO',
+            'level': 'DEBUG',
             'filename': 'logs/main/info_trimming.log',
             'when': 'W0',
             'interval': 1,
@@ -88,4 +87,91 @@ logger_config = {
             'propagate': False
         },
 	},
-}
\ No newline at end of file
+}
+
+
+class _RoutingListener(logging.handlers.QueueListener):
+    """Слушатель очереди: запись уходит в файловые обработчики своего логгера."""
+
+    def __init__(self, log_queue: queue.SimpleQueue, routes: Dict[str, List[logging.Handler]]) -> None:
+        super().__init__(log_queue)
+        self.routes = routes
+
+    def handle(self, record: logging.LogRecord) -> None:
+        with _fork_lock:
+            for handler in self.routes.get(record.name, ()):
+                if record.levelno >= handler.level:
+                    handler.handle(record)
+
+
+class _LazyQueueHandler(logging.handlers.QueueHandler):
+    """Кладёт запись в очередь как есть: форматирование (msg % args) и запись
+    на диск выполняет поток слушателя, вызывающий код платит только за put.
+    Поэтому в args передаются значения, которые после вызова не меняются."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+_listener: Optional[_RoutingListener] = None
+# Держит слушатель на время записи: fork не должен случиться посреди записи в файл,
+# иначе дочерний процесс унаследует захваченные блокировки потока и обработчиков
+_fork_lock = threading.Lock()
+
+
+def setup_logging(use_queue: bool = True) -> None:
+    """Настраивает логгеры из logger_config (один раз на процесс).
+
+    С use_queue файловые обработчики работают в фоновом потоке QueueListener,
+    а у логгеров остаётся только QueueHandler; use_queue=False — прежние
+    синхронные обработчики (для сравнения в bench.logs).
+    """
+    global _listener
+    if _listener is not None:
+        if use_queue:
+            return
+        flush_logging()
+    logging.config.dictConfig(logger_config)
+    if not use_queue:
+        return
+    log_queue = queue.SimpleQueue()
+    routes = {}
+    for name in logger_config['loggers']:
+        target = logging.getLogger(name)
+        routes[name] = list(target.handlers)
+        target.handlers = [_LazyQueueHandler(log_queue)]
+    _listener = _RoutingListener(log_queue, routes)
+    _listener.start()
+
+
+def flush_logging() -> None:
+    """Дописывает очередь и возвращает логгерам синхронные обработчики."""
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    _use_sync_handlers()
+
+
+def _use_sync_handlers() -> None:
+    global _listener
+    for name, handlers in _listener.routes.items():
+        logging.getLogger(name).handlers = list(handlers)
+    _listener = None
+
+
+def _after_fork_in_child() -> None:
+    # В дочернем процессе (воркеры ProcessPoolExecutor) потока слушателя нет,
+    # а atexit при выходе воркера не вызывается — пишем синхронно
+    global _fork_lock
+    _fork_lock = threading.Lock()
+    if _listener is not None:
+        _use_sync_handlers()
+
+
+atexit.register(flush_logging)
+os.register_at_fork(
+    before=lambda: _fork_lock.acquire(),
+    after_in_parent=lambda: _fork_lock.release(),
+    after_in_child=_after_fork_in_child,
+)
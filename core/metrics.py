@@ -0,0 +1,258 @@
+import contextvars, os, threading, time
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+# Границы корзин гистограмм задержек, сек
+LATENCY_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+# Имя метрики -> (тип, описание)
+METRICS = {
+    'turn_seconds': ('histogram', 'Время хода агента: вопрос пользователя -> ответ'),
+    'trim_seconds': ('histogram', 'Обрезка истории перед вызовом модели'),
+    'llm_call_seconds': ('histogram', 'Вызов модели'),
+    'tool_seconds': ('histogram', 'Вызов инструмента агента'),
+    'analyzer_method_seconds': ('histogram', 'Метод DataAnalyzer (с учётом кэша результатов)'),
+    'llm_tokens_total': ('counter', 'Токены, израсходованные на вызовы модели'),
+    'llm_errors_total': ('counter', 'Ошибки вызова модели'),
+    'analyzer_rows_scanned_total': ('counter', 'Строк просмотрено проходами по данным'),
+    'analyzer_cache_hits_total': ('counter', 'Попадания в кэш результатов DataAnalyzer'),
+    'analyzer_cache_misses_total': ('counter', 'Промахи кэша результатов DataAnalyzer'),
+    'analyzer_cache_evictions_total': ('counter', 'Вытеснения из кэша результатов DataAnalyzer'),
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Sample(NamedTuple):
+    """Значение метрики, которое в момент экспорта отдаёт коллектор."""
+    name: str
+    labels: Dict[str, str]
+    value: float
+
+
+class Histogram:
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Оценка перцентиля сверху: граница корзины, в которую он попал."""
+        rank, seen = q * self.count, 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank and seen:
+                return bound
+        return float('inf')
+
+
+def _labels(labels: Dict[str, Any]) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(labels: Iterable[Tuple[str, str]]) -> str:
+    parts = []
+    for name, value in labels:
+        value = value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        parts.append(f'{name}="{value}"')
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class Metrics:
+    """Реестр метрик процесса: гистограммы задержек, счётчики и коллекторы,
+    которые отдают текущие значения (строки, кэш) в момент экспорта."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._histograms: Dict[Tuple[str, Labels], Histogram] = {}
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+        self._collectors: List[Callable[[], Iterable[Sample]]] = []
+
+    def observe(self, name: str, seconds: float, **labels: Any) -> None:
+        key = (name, _labels(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    def inc(self, name: str, value: float = 1, **labels: Any) -> None:
+        key = (name, _labels(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def add_collector(self, collector: Callable[[], Iterable[Sample]]) -> None:
+        self._collectors.append(collector)
+
+    def histogram(self, name: str, **labels: Any) -> Optional[Histogram]:
+        return self._histograms.get((name, _labels(labels)))
+
+    def counter(self, name: str, **labels: Any) -> float:
+        return self._counters.get((name, _labels(labels)), 0)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def render(self) -> str:
+        """Все метрики в текстовом формате Prometheus (exposition format 0.0.4)."""
+        with self._lock:
+            histograms = {key: (list(h.counts), h.sum, h.count, h.buckets) for key, h in self._histograms.items()}
+            counters = dict(self._counters)
+        for collector in self._collectors:
+            for sample in collector():
+                key = (sample.name, _labels(sample.labels))
+                counters[key] = counters.get(key, 0) + sample.value
+        lines = []
+        for name, (kind, help_text) in METRICS.items():
+            series = sorted(k for k in (histograms if kind == 'histogram' else counters) if k[0] == name)
+            if not series:
+                continue
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+            for _, labels in series:
+                if kind == 'counter':
+                    lines.append(f'{name}{_format_labels(labels)} {_format_value(counters[(name, labels)])}')
+                    continue
+                counts, total, count, buckets = histograms[(name, labels)]
+                cumulative = 0
+                for bound, bucket_count in zip(buckets + (float('inf'),), counts):
+                    cumulative += bucket_count
+                    le = labels + (('le', _format_value(bound) if bound != float('inf') else '+Inf'),)
+                    lines.append(f'{name}_bucket{_format_labels(le)} {cumulative}')
+                lines.append(f'{name}_sum{_format_labels(labels)} {total!r}')
+                lines.append(f'{name}_count{_format_labels(labels)} {count}')
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path: str) -> None:
+        """Записывает render() в файл атомарно (для textfile-коллектора node_exporter)."""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp = f'{path}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(self.render())
+        os.replace(tmp, path)
+
+
+class Span:
+    """Интервал трассировки: имя, атрибуты, время perf_counter_ns и вложенные интервалы."""
+    __slots__ = ('name', 'attrs', 'parent', 'children', 'start_ns', 'end_ns', '_metric', '_labels', '_tracer')
+
+    def __init__(self, tracer: 'Tracer', name: str, parent: Optional['Span'], metric: Optional[str], attrs: Dict[str, Any]) -> None:
+        self.name = name
+        self.attrs = attrs
+        self.parent = parent
+        self.children: List['Span'] = []
+        self._metric = metric
+        # Метки гистограммы — атрибуты на старте; добавленные позже (error, ...) меток не плодят
+        self._labels = dict(attrs) if metric else None
+        self._tracer = tracer
+        self.end_ns: Optional[int] = None
+        if parent is not None:
+            parent.children.append(self)
+        self.start_ns = time.perf_counter_ns()
+
+    @property
+    def seconds(self) -> float:
+        return ((self.end_ns or time.perf_counter_ns()) - self.start_ns) / 1e9
+
+    def end(self, **attrs: Any) -> None:
+        if self.end_ns is not None:
+            return
+        self.end_ns = time.perf_counter_ns()
+        self.attrs.update(attrs)
+        self._tracer._finish(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'ms': round(self.seconds * 1000, 3),
+            'offset_ms': round((self.start_ns - self._root().start_ns) / 1e6, 3),
+            **({'attrs': self.attrs} if self.attrs else {}),
+            **({'children': [c.to_dict() for c in self.children]} if self.children else {}),
+        }
+
+    def _root(self) -> 'Span':
+        span = self
+        while span.parent is not None:
+            span = span.parent
+        return span
+
+
+_current: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar('current_span', default=None)
+
+
+class Tracer:
+    """Вложенные интервалы одного хода: turn -> trim, llm, tool -> analyzer.
+
+    Текущий интервал хранится в contextvar, поэтому вложенность сохраняется
+    в узлах графа и в потоках, запущенных с копией контекста. Завершённый
+    интервал с metric пишет длительность в гистограмму metric; метки — атрибуты на старте.
+    Корневые интервалы последних keep ходов доступны в traces.
+    """
+
+    def __init__(self, registry: Metrics, keep: int = 100) -> None:
+        self.registry = registry
+        self.traces: 'deque[Span]' = deque(maxlen=keep)
+
+    def start(self, name: str, metric: Optional[str] = None, **attrs: Any) -> Span:
+        """Интервал — потомок текущего; текущим не становится (см. activate)."""
+        return Span(self, name, _current.get(), metric, attrs)
+
+    @contextmanager
+    def span(self, name: str, metric: Optional[str] = None, **attrs: Any) -> Iterator[Span]:
+        span = self.start(name, metric, **attrs)
+        token = self.activate(span)
+        try:
+            yield span
+        except BaseException as e:
+            # GeneratorExit — потребитель бросил потоковый ответ, это не ошибка хода
+            if not isinstance(e, GeneratorExit):
+                span.attrs['error'] = type(e).__name__
+            raise
+        finally:
+            self.deactivate(span, token)
+            span.end()
+
+    def activate(self, span: Span) -> contextvars.Token:
+        return _current.set(span)
+
+    def deactivate(self, span: Span, token: contextvars.Token) -> None:
+        try:
+            _current.reset(token)
+        except ValueError:
+            # Завершение пришло из другого контекста (например, асинхронный колбэк)
+            _current.set(span.parent)
+
+    @staticmethod
+    def current() -> Optional[Span]:
+        return _current.get()
+
+    def _finish(self, span: Span) -> None:
+        if span._metric is not None:
+            self.registry.observe(span._metric, span.seconds, **span._labels)
+        if span.parent is None:
+            self.traces.append(span)
+
+    def recent(self, limit: int = 20) -> List[Dict[str, Any]]:
+        return [span.to_dict() for span in list(self.traces)[-limit:]]
+
+
+metrics = Metrics()
+tracer = Tracer(metrics)
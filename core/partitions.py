@@ -0,0 +1,169 @@
+import glob, logging, os
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from core.columns import ColumnStore
+from core.kernel import DIMENSIONS, AggSpec, GroupStats, merge_groups
+
+logger = logging.getLogger('data_analyzer_logger')
+
+# Колонка CSV -> измерение: сегмент Platform=Fiverr равнозначен platform=Fiverr
+_COLUMN_DIMENSIONS = {column: dimension for dimension, column in DIMENSIONS.items()}
+
+# (путь к CSV, ключи партиции) -> анализатор одной партиции
+AnalyzerFactory = Callable[[str, Dict[str, str]], Any]
+
+
+def is_partitioned(path: str) -> bool:
+    return os.path.isdir(path) or glob.has_magic(path)
+
+
+def discover(path: str) -> List[str]:
+    """CSV-файлы партиций каталога (рекурсивно) или glob-шаблона, в порядке путей."""
+    pattern = os.path.join(path, '**', '*.csv') if os.path.isdir(path) else path
+    return sorted(p for p in glob.glob(pattern, recursive=True) if p.endswith('.csv') and os.path.isfile(p))
+
+
+def _root(path: str) -> str:
+    # Ключи партиций ищем только в сегментах пути ниже неизменяемой части шаблона
+    if os.path.isdir(path):
+        return path
+    fixed = []
+    for segment in path.split(os.sep):
+        if glob.has_magic(segment):
+            break
+        fixed.append(segment)
+    return os.sep.join(fixed) or os.curdir
+
+
+def partition_keys(path: str, root: str) -> Dict[str, str]:
+    """Ключи hive-партиции из сегментов пути вида key=value (ключи-колонки приводятся к измерениям)."""
+    keys = {}
+    for segment in os.path.relpath(os.path.dirname(path), root).split(os.sep):
+        name, sep, value = segment.partition('=')
+        if sep and name:
+            keys[_COLUMN_DIMENSIONS.get(name, name)] = value
+    return keys
+
+
+class Partition:
+    """Один CSV-файл датасета: загружается при первом запросе, агрегаты кэшируются по спецификации."""
+
+    def __init__(self, path: str, keys: Dict[str, str], factory: AnalyzerFactory) -> None:
+        self.path = path
+        self.keys = keys
+        self._factory = factory
+        self.analyzer = None
+        self._cache: Dict[AggSpec, GroupStats] = {}
+
+    def get(self):
+        if self.analyzer is None:
+            self.analyzer = self._factory(self.path, self.keys)
+        return self.analyzer
+
+    @property
+    def rows_scanned(self) -> int:
+        return self.analyzer.rows_scanned if self.analyzer is not None else 0
+
+    def matches(self, spec: AggSpec) -> bool:
+        """False, если фильтр по ключу партиции заведомо отсекает все её строки."""
+        for p in spec.where:
+            value = self.keys.get(p.field)
+            if value is None or p.field not in DIMENSIONS:
+                continue
+            if (p.op == '==' and value != str(p.value)) or (p.op == '!=' and value == str(p.value)):
+                return False
+        return True
+
+    def resolve(self, specs: Sequence[AggSpec]) -> List[GroupStats]:
+        missing = [spec for spec in dict.fromkeys(specs) if spec not in self._cache]
+        if missing:
+            self._cache.update(zip(missing, self.get()._resolve(missing)))
+        return [self._cache[spec] for spec in specs]
+
+    def ingest(self) -> Tuple[int, bool]:
+        """Дочитывает изменения файла загруженной партиции: (новых строк, изменилась ли партиция).
+
+        Незагруженную партицию проверять не нужно — она прочитается свежей при первом запросе.
+        """
+        if self.analyzer is None:
+            return 0, False
+        version = self.analyzer.data_version
+        added = self.analyzer.ingest()
+        if self.analyzer.data_version == version:
+            return 0, False
+        # Пересчитываются агрегаты только изменившейся партиции
+        self._cache.clear()
+        return added, True
+
+
+class PartitionedDataset:
+    """Датасет из нескольких CSV: каталог или glob, с необязательными сегментами key=value.
+
+    Партиции загружаются лениво; партиция, отсечённая фильтром по её ключу,
+    не читается вовсе. Результат равен разбору файлов, склеенных в порядке путей.
+    """
+
+    def __init__(self, path: str, factory: AnalyzerFactory) -> None:
+        self.path = path
+        self._factory = factory
+        self.partitions: Dict[str, Partition] = {}
+        # Растёт при любом изменении состава или содержимого партиций
+        self.version = 0
+        self.pruned = 0
+        # Склеенное хранилище и состояние партиций, из которого оно собрано
+        self._store: Optional[ColumnStore] = None
+        self._store_key: Tuple = ()
+        self.refresh()
+
+    def refresh(self) -> int:
+        """Подхватывает новые и удалённые файлы, дочитывает изменённые; возвращает число новых строк."""
+        files = discover(self.path)
+        if not files:
+            raise FileNotFoundError(f'Не найдено CSV-партиций: {self.path}')
+        root = _root(self.path)
+        changed = list(self.partitions) != files
+        partitions = {}
+        added = 0
+        for path in files:
+            partition = self.partitions.get(path)
+            if partition is None:
+                partition = Partition(path, partition_keys(path, root), self._factory)
+            else:
+                rows, updated = partition.ingest()
+                added += rows
+                changed = changed or updated
+            partitions[path] = partition
+        self.partitions = partitions
+        if changed:
+            self.version += 1
+            logger.info('Партиций в %s: %d', self.path, len(files))
+        return added
+
+    @property
+    def rows_scanned(self) -> int:
+        return sum(partition.rows_scanned for partition in self.partitions.values())
+
+    def resolve(self, specs: Sequence[AggSpec]) -> List[GroupStats]:
+        results: List[GroupStats] = [{} for _ in specs]
+        for partition in self.partitions.values():
+            indexes = [i for i, spec in enumerate(specs) if partition.matches(spec)]
+            if not indexes:
+                self.pruned += 1
+                continue
+            for i, groups in zip(indexes, partition.resolve([specs[i] for i in indexes])):
+                merge_groups(results[i], groups)
+        return results
+
+    def store(self) -> ColumnStore:
+        """Все партиции одним хранилищем (загружает незагруженные).
+
+        Склейка кэшируется и пересобирается, только когда меняется состав партиций
+        или данные одной из них (data_version её анализатора).
+        """
+        analyzers = [(path, partition.get()) for path, partition in self.partitions.items()]
+        key = tuple((path, analyzer, analyzer.data_version) for path, analyzer in analyzers)
+        if self._store is None or key != self._store_key:
+            store = ColumnStore()
+            for _, analyzer in analyzers:
+                store.extend_store(analyzer.data)
+            self._store, self._store_key = store, key
+        return self._store
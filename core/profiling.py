@@ -0,0 +1,246 @@
+"""Профиль сессии CLI (main.py --profile): cProfile и tracemalloc по ходам.
+
+В каталог сессии для каждого хода и для всей сессии (session.*) пишутся:
+    turn-NNN.pstats        статистика cProfile (python -m pstats, snakeviz)
+    turn-NNN.cpu.folded    стеки по времени, мкс
+    turn-NNN.alloc.folded  стеки по памяти, выделенной за ход и не освобождённой к его концу, байт
+*.folded — формат collapsed stacks (flamegraph.pl, inferno, speedscope).
+
+cProfile видит поток хода и остальные потоки (узлы графа, инструменты, пул
+batch_analytics). До Python 3.12 профайлер видит только свой поток, поэтому
+потокам, запущенным после start(), заводится собственный; с 3.12 cProfile
+работает через sys.monitoring — активен один профайлер на процесс, и он видит
+все потоки. Ход — разность снимков до и после, так что работа между ходами
+в профиль не попадает.
+Стеки по времени восстанавливаются из рёбер вызовов cProfile: время функции,
+вызванной из нескольких мест, делится между ними пропорционально.
+"""
+import cProfile, os, pstats, re, sys, threading, time, tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, NamedTuple, Tuple
+
+Func = Tuple[str, int, str]
+StatsDict = Dict[Func, tuple]
+
+# Стеки по времени: путь вызовов короче этого (сек) не разворачивается дальше
+MIN_PATH_SECONDS = 1e-6
+MAX_DEPTH = 128
+
+# Выделения самого профайлера в профиль памяти не попадают
+_OWN_FILES = {__file__, cProfile.__file__, pstats.__file__}
+# Поток пула, ждущий задачу, простаивает: это не время хода (ожидание, начатое
+# до хода, cProfile засчитывает целиком при возврате)
+IDLE = {"<method 'get' of '_queue.SimpleQueue' objects>"}
+# Обвязка потоков: её cumtime — это время вложенной работы, в таблице она лишняя
+PLUMBING_FILES = {'threading.py', 'concurrent/futures/thread.py'}
+PLUMBING = IDLE | {"<method 'run' of '_contextvars.Context' objects>", "<method 'disable' of '_lsprof.Profiler' objects>"}
+# Профайлер на каждый поток возможен только до 3.12: дальше второй enable() — ValueError
+PER_THREAD = sys.version_info < (3, 12)
+
+
+class TurnProfile(NamedTuple):
+    number: int
+    label: str
+    seconds: float
+    stats: StatsDict
+    alloc: Counter
+    alloc_lines: Counter
+    net_bytes: int
+    peak_bytes: int
+
+
+def short_path(filename: str) -> str:
+    """Пути стандартной библиотеки и пакетов — от корня пакета, проекта — от текущего каталога."""
+    short = re.sub(r'^.*[/\\](?:site-packages|python3\.\d+)[/\\]', '', filename)
+    if short == filename and os.path.isabs(filename):
+        short = os.path.relpath(filename)
+    return short
+
+
+def func_label(func: Func) -> str:
+    filename, lineno, name = func
+    label = name if filename == '~' else f'{name} ({short_path(filename)}:{lineno})'
+    return label.replace(';', ',')
+
+
+def diff_stats(after: StatsDict, before: StatsDict) -> StatsDict:
+    """Статистика pstats за интервал между двумя снимками одного профайлера."""
+    result = {}
+    for func, (cc, nc, tt, ct, callers) in after.items():
+        previous = before.get(func)
+        if previous is None:
+            result[func] = (cc, nc, tt, ct, callers)
+            continue
+        if nc == previous[1] and tt == previous[2]:
+            continue
+        delta = {}
+        for caller, edge in callers.items():
+            old = previous[4].get(caller)
+            if old is not None:
+                edge = tuple(a - b for a, b in zip(edge, old))
+            if edge[0] or edge[3]:
+                delta[caller] = edge
+        result[func] = (cc - previous[0], nc - previous[1], tt - previous[2], ct - previous[3], delta)
+    return result
+
+
+def merge_stats(parts: List[StatsDict]) -> StatsDict:
+    merged: StatsDict = {}
+    for stats in parts:
+        for func, entry in stats.items():
+            merged[func] = pstats.add_func_stats(merged[func], entry) if func in merged else entry
+    return merged
+
+
+def folded_time(stats: StatsDict) -> Counter:
+    """Стеки по собственному времени функций (мкс) из рёбер вызовов cProfile."""
+    callees: Dict[Func, Dict[Func, float]] = {}
+    for func, (_, _, _, _, callers) in stats.items():
+        for caller, edge in callers.items():
+            callees.setdefault(caller, {})[func] = edge[3]
+    folded: Counter = Counter()
+
+    def walk(func: Func, stack: Tuple[str, ...], on_stack: frozenset, share: float) -> None:
+        _, _, tt, ct, _ = stats[func]
+        stack += (func_label(func),)
+        if tt * share > 0:
+            folded[';'.join(stack)] += tt * share * 1e6
+        if len(stack) >= MAX_DEPTH:
+            return
+        on_stack |= {func}
+        for callee, edge_ct in callees.get(func, {}).items():
+            callee_ct = stats[callee][3] if callee in stats else 0
+            if callee in on_stack or callee[2] in IDLE or callee_ct <= 0 or edge_ct * share < MIN_PATH_SECONDS:
+                continue
+            walk(callee, stack, on_stack, share * edge_ct / callee_ct)
+
+    for func, entry in stats.items():
+        # Корни — функции, вошедшие в профиль без вызывающего (начало хода, run() потока)
+        if not any(caller in stats for caller in entry[4]):
+            walk(func, (), frozenset(), 1.0)
+    return Counter({stack: round(us) for stack, us in folded.items() if round(us) > 0})
+
+
+def write_folded(path: str, folded: Counter) -> None:
+    with open(path, 'w', encoding='utf-8') as f:
+        for stack, value in sorted(folded.items()):
+            f.write(f'{stack} {value}\n')
+
+
+def dump_stats(path: str, stats: StatsDict) -> None:
+    report = pstats.Stats()
+    report.stats = stats
+    report.dump_stats(path)
+
+
+class SessionProfiler:
+    """Профилирует ходы сессии: with profiler.turn(вопрос): ...
+
+    frames — глубина стеков tracemalloc (0 — без профиля памяти).
+    """
+
+    def __init__(self, out_dir: str, top: int = 15, frames: int = 32) -> None:
+        self.out_dir = os.path.join(out_dir, time.strftime('%Y%m%d-%H%M%S'))
+        self.top = top
+        self.frames = frames
+        self.turns: List[TurnProfile] = []
+        self._main = cProfile.Profile()
+        self._profilers: List[cProfile.Profile] = [self._main]
+        self._lock = threading.Lock()
+        self._session_stats: StatsDict = {}
+        self._session_alloc: Counter = Counter()
+        self._session_lines: Counter = Counter()
+
+    def start(self) -> None:
+        os.makedirs(self.out_dir, exist_ok=True)
+        if PER_THREAD:
+            threading.setprofile(self._profile_thread)
+
+    def _profile_thread(self, frame: Any, event: str, arg: Any) -> None:
+        # Первое событие в новом потоке: заменяем хук собственным профайлером потока
+        sys.setprofile(None)
+        profiler = cProfile.Profile()
+        with self._lock:
+            self._profilers.append(profiler)
+        profiler.enable()
+
+    def _snapshot(self) -> Dict[int, StatsDict]:
+        with self._lock:
+            profilers = list(self._profilers)
+        snapshot = {}
+        for profiler in profilers:
+            profiler.snapshot_stats()
+            snapshot[id(profiler)] = profiler.stats
+        return snapshot
+
+    @contextmanager
+    def turn(self, label: str) -> Iterator[None]:
+        before = self._snapshot()
+        # tracemalloc включён только на время хода: снимок в конце — ровно то, что ход
+        # выделил и не освободил, без сравнения с памятью всего процесса
+        trace = self.frames > 0 and not tracemalloc.is_tracing()
+        if trace:
+            tracemalloc.start(self.frames)
+        start = time.perf_counter()
+        self._main.enable()
+        try:
+            yield
+        finally:
+            self._main.disable()
+            seconds = time.perf_counter() - start
+            alloc, lines, net, peak = Counter(), Counter(), 0, 0
+            if trace:
+                peak = tracemalloc.get_traced_memory()[1]
+                memory = tracemalloc.take_snapshot()
+                tracemalloc.stop()
+                for stat in memory.statistics('traceback'):
+                    frames = list(stat.traceback)
+                    if any(f.filename in _OWN_FILES for f in frames):
+                        continue
+                    net += stat.size
+                    alloc[';'.join(f'{short_path(f.filename)}:{f.lineno}' for f in frames).replace(' ', '_')] += stat.size
+                    lines[f'{short_path(frames[-1].filename)}:{frames[-1].lineno}'] += stat.size
+            after = self._snapshot()
+            stats = merge_stats([diff_stats(stats, before.get(key, {})) for key, stats in after.items()])
+            self._record(TurnProfile(len(self.turns) + 1, label, seconds, stats, alloc, lines, net, peak))
+
+    def _record(self, turn: TurnProfile) -> None:
+        self.turns.append(turn)
+        base = os.path.join(self.out_dir, f'turn-{turn.number:03d}')
+        dump_stats(base + '.pstats', turn.stats)
+        write_folded(base + '.cpu.folded', folded_time(turn.stats))
+        if self.frames:
+            write_folded(base + '.alloc.folded', turn.alloc)
+        self._session_stats = merge_stats([self._session_stats, turn.stats])
+        self._session_alloc.update(turn.alloc)
+        self._session_lines.update(turn.alloc_lines)
+
+    def close(self) -> str:
+        """Пишет файлы сессии, останавливает профилирование и возвращает сводку."""
+        if PER_THREAD:
+            threading.setprofile(None)
+        base = os.path.join(self.out_dir, 'session')
+        dump_stats(base + '.pstats', self._session_stats)
+        write_folded(base + '.cpu.folded', folded_time(self._session_stats))
+        if self.frames:
+            write_folded(base + '.alloc.folded', self._session_alloc)
+        return self.summary()
+
+    def summary(self) -> str:
+        lines = [f'Профиль сессии: {self.out_dir} (ходов: {len(self.turns)})', '']
+        lines.append(f'{"ход":>4} {"время, с":>9} {"память, КиБ":>12} {"пик, КиБ":>9}  вопрос')
+        for turn in self.turns:
+            lines.append(f'{turn.number:>4} {turn.seconds:>9.3f} {turn.net_bytes / 1024:>12.1f} '
+                         f'{turn.peak_bytes / 1024:>9.1f}  {turn.label[:60]}')
+        profiled = [(func, entry) for func, entry in self._session_stats.items()
+                    if func[0] != __file__ and func[2] not in PLUMBING and short_path(func[0]) not in PLUMBING_FILES]
+        lines += ['', f'Топ-{self.top} функций по суммарному времени (cumtime):',
+                  f'{"вызовов":>9} {"tottime":>9} {"cumtime":>9}  функция']
+        for func, (cc, nc, tt, ct, _) in sorted(profiled, key=lambda item: item[1][3], reverse=True)[:self.top]:
+            lines.append(f'{nc:>9} {tt:>9.3f} {ct:>9.3f}  {func_label(func)}')
+        if self.frames:
+            lines += ['', f'Топ-{self.top} строк по выделенной за ходы памяти:', f'{"КиБ":>10}  строка']
+            for where, size in self._session_lines.most_common(self.top):
+                lines.append(f'{size / 1024:>10.1f}  {where}')
+        return '\n'.join(lines)
@@ -0,0 +1,77 @@
+from typing import Any, List, NamedTuple, Optional, Tuple
+from core.kernel import METRICS, AggSpec, Predicate
+from core.schemas import QueryInput
+
+AGGREGATE_TITLES = {
+    'avg': 'Среднее',
+    'sum': 'Сумма',
+    'count': 'Количество',
+    'min': 'Минимум',
+    'max': 'Максимум',
+    'var': 'Дисперсия',
+    'std': 'Стандартное отклонение',
+}
+
+EMPTY_MESSAGE = 'Нет данных, удовлетворяющих условиям запроса.'
+
+
+class QueryPlan(NamedTuple):
+    """Скомпилированный запрос: агрегат ядра, что из него взять и сколько групп оставить."""
+    spec: AggSpec
+    aggregate: str
+    top_k: Optional[int] = None
+
+
+def compile_query(query: QueryInput) -> QueryPlan:
+    """QueryInput -> AggSpec ядра; значения фильтров приводятся к типу поля."""
+    if query.metric is None and query.aggregate != 'count':
+        raise ValueError(f'Для агрегата {query.aggregate} нужна метрика')
+    where = []
+    for f in query.filters:
+        value = f.value
+        if f.field in METRICS:
+            try:
+                value = float(value)
+            except ValueError:
+                raise ValueError(f'Фильтр по {f.field}: ожидается число, получено {f.value!r}')
+        else:
+            value = str(value)
+        where.append(Predicate(f.field, f.op, value))
+    return QueryPlan(AggSpec(query.metric, query.group_by, tuple(where)), query.aggregate, query.top_k)
+
+
+def execute(analyzer: Any, plan: QueryPlan) -> List[Tuple[Optional[str], float]]:
+    """Значения по группам: в порядке файла, а с top_k — k наибольших по убыванию."""
+    spec = plan.spec
+    items = list(analyzer.aggregate(spec.metric, plan.aggregate, spec.by, spec.where).items())
+    if plan.top_k is not None:
+        items = sorted(items, key=lambda x: x[1], reverse=True)[:plan.top_k]
+    return items
+
+
+def _operand(value) -> str:
+    return f'{value:g}' if isinstance(value, float) else value
+
+
+def describe(plan: QueryPlan) -> str:
+    spec = plan.spec
+    text = f'{AGGREGATE_TITLES[plan.aggregate]} {spec.metric or "фрилансеров"}'
+    if spec.by:
+        text += f' по {spec.by}'
+    if spec.where:
+        text += ' при ' + ', '.join(f'{p.field} {p.op} {_operand(p.value)}' for p in spec.where)
+    if plan.top_k is not None and spec.by:
+        text += f' (топ-{plan.top_k})'
+    return text
+
+
+def render(plan: QueryPlan, items: List[Tuple[Optional[str], float]]) -> str:
+    if not items:
+        return EMPTY_MESSAGE
+    fmt = '{:.0f}' if plan.aggregate == 'count' else '{:.2f}'
+    if plan.spec.by is None:
+        return f'{describe(plan)}: {fmt.format(items[0][1])}'
+    result = f'{describe(plan)}:\n'
+    for key, value in items:
+        result += f'- {key}: {fmt.format(value)}\n'
+    return result
@@ -0,0 +1,38 @@
+import random
+from typing import Optional
+
+# Коды ответа провайдера, после которых запрос имеет смысл повторить
+RETRY_STATUS = (429, 503)
+
+
+def status_code(error: BaseException) -> Optional[int]:
+    code = getattr(error, 'status_code', None)
+    if code is None:
+        code = getattr(getattr(error, 'response', None), 'status_code', None)
+    return code
+
+
+def retry_after(error: BaseException) -> Optional[float]:
+    """Пауза из заголовка Retry-After ответа провайдера, если он есть (в секундах)."""
+    headers = getattr(getattr(error, 'response', None), 'headers', None) or {}
+    try:
+        return float(headers.get('retry-after'))
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt: int, base: float, cap: float, rng: random.Random = random) -> float:
+    """Экспоненциальная пауза с полным джиттером: случайное значение в [0, min(cap, base * 2^attempt)].
+
+    Джиттер разводит во времени повторы параллельных запросов, упёршихся в один лимит.
+    """
+    return rng.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def retry_delay(error: BaseException, attempt: int, attempts: int, base: float, cap: float) -> Optional[float]:
+    """Пауза перед повтором после ошибки или None, если повторять не нужно (не 429/503 или попытки кончились)."""
+    if status_code(error) not in RETRY_STATUS or attempt >= attempts:
+        return None
+    delay = backoff_delay(attempt, base, cap)
+    hint = retry_after(error)
+    return max(delay, hint) if hint is not None else delay
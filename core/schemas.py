@@ -1,5 +1,6 @@
-from pydantic import BaseModel, Field
-from typing import List, Optional
+from pydantic import BaseModel, ConfigDict, Field
+from typing import List, Literal, Optional, Union
+from core.kernel import AGGREGATES, DIMENSION_OPERATORS, DIMENSIONS, METRICS, OPERATORS
 
 
 class AvgHourlyRateByInput(BaseModel):
@@ -11,9 +12,47 @@ class AvgClientRatingByInput(BaseModel):
 class AvgMarketingSpendByInput(BaseModel):
     by: str = Field(description='Группировка: category, region, experience, platform, project_type')
 
+# Допустимые значения берутся из ядра агрегации, чтобы схема инструмента не расходилась с ним
+MetricName = Literal[tuple(METRICS)]
+DimensionName = Literal[tuple(DIMENSIONS)]
+AggregateName = Literal[AGGREGATES]
+OperatorName = Literal[tuple(OPERATORS)]
+DimensionOperatorName = Literal[DIMENSION_OPERATORS]
+
+
+class MetricFilter(BaseModel):
+    model_config = ConfigDict(extra='forbid')
+
+    field: MetricName = Field(description='Метрика')
+    op: OperatorName
+    value: Union[float, str] = Field(description='Число')
+
+
+class DimensionFilter(BaseModel):
+    model_config = ConfigDict(extra='forbid')
+
+    field: DimensionName = Field(description='Измерение')
+    op: DimensionOperatorName = Field(description='Измерения сравниваются только на равенство')
+    value: str = Field(description='Значение категории (например, Expert, Asia)')
+
+
+# Фильтр query: по метрике — любой оператор сравнения, по измерению — только == и !=
+QueryFilter = Union[MetricFilter, DimensionFilter]
+
+
+class QueryInput(BaseModel):
+    model_config = ConfigDict(extra='forbid')
+
+    metric: Optional[MetricName] = Field(None, description='Метрика; не указана — считается число фрилансеров (aggregate=count)')
+    aggregate: AggregateName = 'avg'
+    group_by: Optional[DimensionName] = None
+    filters: List[QueryFilter] = Field(default_factory=list, description='Условия, объединяются через И')
+    top_k: Optional[int] = Field(None, ge=1, description='Оставить k групп с наибольшим значением')
+
 class BatchAnalyticsMethod(BaseModel):
     method: str
     by: Optional[str] = None
 
 class BatchAnalyticsInput(BaseModel):
-    methods: List[BatchAnalyticsMethod]
\ No newline at end of file
+    methods: List[BatchAnalyticsMethod] = Field(default_factory=list)
+    queries: List[QueryInput] = Field(default_factory=list)
@@ -0,0 +1,153 @@
+import hashlib, json, logging, mmap, os, struct, sys, zlib
+from array import array
+from typing import Any, Dict, Optional
+from core.columns import CATEGORICAL_COLUMNS, NUMERIC_COLUMNS, CategoricalColumn, ColumnStore
+
+logger = logging.getLogger('data_analyzer_logger')
+
+# Формат: MAGIC | длина заголовка (uint32) | crc32 заголовка (uint32) | JSON-заголовок |
+# колонки сырыми байтами, каждая с выравниванием на 8 байт (для cast без копирования).
+MAGIC = b'FLSNAP01'
+VERSION = 4
+_PREFIX = struct.Struct('<8sII')
+_ALIGN = 8
+
+
+def snapshot_path(csv_path: str) -> str:
+    return f'{csv_path}.snapshot'
+
+
+def file_hash(path: str) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def source_key(csv_path: str, content_hash: Optional[str] = None) -> Dict[str, Any]:
+    stat = os.stat(csv_path)
+    return {
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'hash': content_hash or file_hash(csv_path),
+    }
+
+
+def _pad(offset: int) -> int:
+    return -offset % _ALIGN
+
+
+def _typecode(column) -> str:
+    # array.typecode, либо формат memoryview, если колонка уже отображена из снапшота
+    return column.typecode if isinstance(column, array) else column.format
+
+
+def write(csv_path: str, store: ColumnStore, source: Optional[Dict[str, Any]] = None) -> str:
+    """Сохраняет хранилище в бинарный снапшот рядом с CSV (атомарно через replace).
+
+    source — ключ CSV, снятый до разбора: если файл поменяется во время разбора,
+    снапшот окажется устаревшим, а не «свежим» с чужими данными.
+    """
+    columns = [(name, store.numeric[name]) for name in NUMERIC_COLUMNS]
+    columns += [(name, store.categorical[name].codes) for name in CATEGORICAL_COLUMNS]
+    header: Dict[str, Any] = {
+        'version': VERSION,
+        'byteorder': sys.byteorder,
+        'source': source or source_key(csv_path),
+        'rows': len(store),
+        'columns': {},
+        'dictionaries': {name: store.categorical[name].dictionary for name in CATEGORICAL_COLUMNS},
+        # Счётчики некорректных значений: после тёплого старта о них снова предупреждает log_invalid
+        'invalid': store.invalid,
+    }
+    offset = 0
+    for name, column in columns:
+        offset += _pad(offset)
+        nbytes = len(column) * column.itemsize
+        header['columns'][name] = [_typecode(column), offset, nbytes]
+        offset += nbytes
+    raw_header = json.dumps(header, ensure_ascii=False).encode('utf-8')
+    raw_header += b' ' * _pad(_PREFIX.size + len(raw_header))
+
+    path = snapshot_path(csv_path)
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(_PREFIX.pack(MAGIC, len(raw_header), zlib.crc32(raw_header)))
+        f.write(raw_header)
+        written = 0
+        for name, column in columns:
+            f.write(b'\0' * _pad(written))
+            written += _pad(written)
+            data = column.tobytes() if isinstance(column, array) else bytes(column)
+            f.write(data)
+            written += len(data)
+    os.replace(tmp_path, path)
+    return path
+
+
+def _read_header(mm: mmap.mmap) -> Dict[str, Any]:
+    if len(mm) < _PREFIX.size:
+        raise ValueError('файл короче заголовка')
+    magic, header_len, crc = _PREFIX.unpack_from(mm, 0)
+    if magic != MAGIC:
+        raise ValueError('неверная сигнатура')
+    raw_header = mm[_PREFIX.size:_PREFIX.size + header_len]
+    if len(raw_header) != header_len or zlib.crc32(raw_header) != crc:
+        raise ValueError('повреждён заголовок')
+    header = json.loads(raw_header)
+    if header.get('version') != VERSION or header.get('byteorder') != sys.byteorder:
+        raise ValueError('несовместимая версия или порядок байт')
+    header['data_offset'] = _PREFIX.size + header_len
+    return header
+
+
+def _is_fresh(csv_path: str, source: Dict[str, Any], verify_hash: bool) -> bool:
+    stat = os.stat(csv_path)
+    if stat.st_size != source['size']:
+        return False
+    if stat.st_mtime_ns == source['mtime_ns'] and not verify_hash:
+        return True
+    # mtime изменился (или требуется проверка) — решает хэш содержимого
+    return file_hash(csv_path) == source['hash']
+
+
+def load(csv_path: str, verify_hash: bool = False) -> Optional[ColumnStore]:
+    """Открывает снапшот через mmap без копирования колонок.
+
+    Возвращает None, если снапшота нет, он устарел или повреждён.
+    """
+    path = snapshot_path(csv_path)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'rb') as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        header = _read_header(mm)
+        if not _is_fresh(csv_path, header['source'], verify_hash):
+            logger.info('Снапшот %s устарел, будет пересобран', path)
+            return None
+        rows, base = header['rows'], header['data_offset']
+        view = memoryview(mm)
+        columns = {}
+        for name in NUMERIC_COLUMNS + CATEGORICAL_COLUMNS:
+            typecode, offset, nbytes = header['columns'][name]
+            start = base + offset
+            if start + nbytes > len(mm):
+                raise ValueError(f'колонка {name} обрезана')
+            column = view[start:start + nbytes].cast(typecode)
+            if len(column) != rows:
+                raise ValueError(f'колонка {name}: неверное число строк')
+            columns[name] = column
+        store = ColumnStore()
+        for name in NUMERIC_COLUMNS:
+            store.numeric[name] = columns[name]
+        for name in CATEGORICAL_COLUMNS:
+            store.categorical[name] = CategoricalColumn.from_codes(columns[name], header['dictionaries'][name])
+        store.invalid = {name: int(count) for name, count in header['invalid'].items()}
+        store._size = rows
+        store.mapped = mm
+        return store
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        logger.warning('Снапшот %s повреждён (%s), будет пересобран', path, e)
+        return None
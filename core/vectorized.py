@@ -0,0 +1,171 @@
+"""Векторизованный бэкенд ядра агрегации на NumPy (необязательная зависимость).
+
+Колонки ColumnStore (array или memoryview снапшота) оборачиваются в массивы
+NumPy без копирования, фильтры — булевы маски, группировки — bincount по кодам
+категорий. count, sum, min и max совпадают с построчным ядром (kernel.scan)
+бит в бит: bincount складывает веса в порядке строк, как Stats.add; группы
+идут в порядке первой учтённой строки. Дисперсия считается в два прохода
+(среднее, затем сумма квадратов отклонений), а не онлайн по Уэлфорду, и может
+отличаться в последних знаках — как и при слиянии частичных накопителей.
+
+Бэкенд выбирается по settings.scan_backend: 'auto' — от vectorized_min_rows
+строк, если NumPy установлен; 'numpy' и 'python' — принудительно. NumPy
+импортируется при первом векторизованном вызове, а не на старте.
+Представления колонок живут только внутри вызова: array, экспортирующий
+буфер, нельзя дописывать (вызовы идут под блокировкой данных анализатора).
+"""
+import logging
+from math import prod
+from typing import Dict, List, Optional, Sequence, Tuple
+from core.columns import ColumnStore
+from core.config import settings
+from core.kernel import DIMENSIONS, METRICS, OPERATORS, AggSpec, GroupStats, Metric, Predicate, Stats, validate
+
+np = None
+logger = logging.getLogger('data_analyzer_logger')
+
+BACKENDS = ('auto', 'numpy', 'python')
+# Составной ключ набора измерений длиннее этого числа групп сжимается через np.unique
+MAX_DENSE_GROUPS = 1 << 22
+
+_available: Optional[bool] = None
+
+
+def available() -> bool:
+    """Установлен ли NumPy; импорт — при первой проверке."""
+    global np, _available
+    if _available is None:
+        try:
+            import numpy
+        except ImportError:
+            _available = False
+            if settings.scan_backend == 'numpy':
+                logger.warning('scan_backend=numpy, но NumPy не установлен: агрегаты считаются на чистом Python')
+        else:
+            np, _available = numpy, True
+    return _available
+
+
+def enabled(rows: int) -> bool:
+    """Считать ли хранилище из rows строк векторизованно."""
+    backend = settings.scan_backend
+    if backend not in BACKENDS:
+        raise ValueError(f'Неизвестный бэкенд агрегации: {backend} (ожидается один из {", ".join(BACKENDS)})')
+    if backend == 'python' or (backend == 'auto' and rows < settings.vectorized_min_rows):
+        return False
+    return available()
+
+
+def _require() -> None:
+    if not available():
+        raise ImportError('Векторизованный бэкенд требует NumPy: pip install numpy')
+
+
+def _view(column) -> 'np.ndarray':
+    return np.frombuffer(column, dtype=getattr(column, 'typecode', None) or column.format)
+
+
+def _metric_values(store: ColumnStore, metric: Metric) -> Tuple['np.ndarray', 'np.ndarray']:
+    """Значения метрики и маска учитываемых строк (без пропусков), как kernel.metric_value."""
+    values = _view(store.numeric[metric.column])
+    valid = ~np.isnan(values)
+    if metric.positive:
+        valid &= values > 0
+    return values, valid
+
+
+def _predicate(store: ColumnStore, p: Predicate) -> 'np.ndarray':
+    if p.field in DIMENSIONS:
+        column = store.categorical[DIMENSIONS[p.field]]
+        code = column.encode(str(p.value))
+        if code is None:
+            # Значения нет в словаре: '!=' выполняется всегда, '==' — никогда
+            return np.full(len(store), p.op == '!=')
+        codes = _view(column.codes)
+        return codes != code if p.op == '!=' else codes == code
+    values, valid = _metric_values(store, METRICS[p.field])
+    mask = OPERATORS[p.op](values, float(p.value))
+    return mask if valid is None else mask & valid
+
+
+def _and(mask: Optional['np.ndarray'], other: Optional['np.ndarray']) -> Optional['np.ndarray']:
+    if other is None:
+        return mask
+    return other if mask is None else mask & other
+
+
+def _groups(keys: 'np.ndarray', size: int, values: Optional['np.ndarray']) -> List[Tuple[int, int, Stats]]:
+    """(группа, позиция первой строки, Stats) по ключам 0..size-1 в порядке первой строки."""
+    counts = np.bincount(keys, minlength=size)
+    first = np.full(size, len(keys), dtype=np.intp)
+    np.minimum.at(first, keys, np.arange(len(keys), dtype=np.intp))
+    present = np.flatnonzero(counts)
+    present = present[np.argsort(first[present], kind='stable')]
+    if values is None:
+        return [(g, first[g], Stats.from_moments(count)) for g, count in zip(present.tolist(), counts[present].tolist())]
+    totals = np.bincount(keys, weights=values, minlength=size)
+    low = np.full(size, np.inf)
+    np.minimum.at(low, keys, values)
+    high = np.full(size, -np.inf)
+    np.maximum.at(high, keys, values)
+    deviation = values - (totals / np.maximum(counts, 1))[keys]
+    m2 = np.bincount(keys, weights=deviation * deviation, minlength=size)
+    columns = (present, counts[present], totals[present], low[present], high[present], m2[present])
+    return [
+        (g, first[g], Stats.from_moments(count, total, lo, hi, sq))
+        for g, count, total, lo, hi, sq in zip(*(c.tolist() for c in columns))
+    ]
+
+
+def scan(store: ColumnStore, specs: Sequence[AggSpec]) -> List[GroupStats]:
+    """То же, что kernel.scan: по проходу масок и bincount на каждый spec."""
+    _require()
+    for spec in specs:
+        validate(spec)
+    results = []
+    for spec in specs:
+        metric = METRICS[spec.metric] if spec.metric else None
+        mask = None
+        for p in spec.where:
+            mask = _and(mask, _predicate(store, p))
+        values = None
+        if metric is not None:
+            values, valid = _metric_values(store, metric)
+            mask = _and(mask, valid)
+        rows = np.flatnonzero(mask) if mask is not None else None
+        if spec.by is not None:
+            column = store.categorical[DIMENSIONS[spec.by]]
+            keys, size, labels = _view(column.codes), len(column.dictionary), column.dictionary
+            keys = (keys if rows is None else keys[rows]).astype(np.intp)
+        else:
+            keys, size, labels = np.zeros(len(store) if rows is None else len(rows), dtype=np.intp), 1, [None]
+        if values is not None and rows is not None:
+            values = values[rows]
+        results.append({labels[g]: stats for g, _, stats in _groups(keys, size, values)})
+    return results
+
+
+def fold(store: ColumnStore, dims: Tuple[str, ...], cells: Dict[Optional[str], Dict[Tuple[int, ...], Stats]]) -> None:
+    """Ячейки набора измерений dims по всем строкам хранилища (AggregateCube._fold с нуля)."""
+    _require()
+    codes = [_view(store.categorical[DIMENSIONS[d]].codes) for d in dims]
+    sizes = [len(store.categorical[DIMENSIONS[d]].dictionary) for d in dims]
+    keys = np.zeros(len(store), dtype=np.intp)
+    for column, size in zip(codes, sizes):
+        keys = keys * size + column
+    size = prod(sizes)
+    if size > MAX_DENSE_GROUPS:
+        _, keys = np.unique(keys, return_inverse=True)
+        size = int(keys.max()) + 1 if len(keys) else 0
+
+    def fill(acc: Dict[Tuple[int, ...], Stats], rows: Optional['np.ndarray'], values: Optional['np.ndarray']) -> None:
+        selected = keys if rows is None else keys[rows]
+        for _, position, stats in _groups(selected, size, values):
+            row = position if rows is None else rows[position]
+            acc[tuple(int(column[row]) for column in codes)] = stats
+
+    fill(cells.setdefault(None, {}), None, None)
+    for name, metric in METRICS.items():
+        values, valid = _metric_values(store, metric)
+        rows = np.flatnonzero(valid) if valid is not None else None
+        fill(cells.setdefault(name, {}), rows, values if rows is None else values[rows])
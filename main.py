@@ -1,12 +1,14 @@
-import uuid, sys, re, inspect, logging.config
-from typing import Sequence, List, Union
-from langchain_core.language_models import LanguageModelLike
-from langchain_core.runnables import RunnableConfig
+import time
+_started = time.perf_counter()
+
+import asyncio, json, uuid, sys, re, argparse, importlib, logging
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from typing import TYPE_CHECKING, Any, AsyncIterator, Dict, Iterator, NamedTuple, Optional, Sequence, List, Tuple, Union
+from uuid import UUID
+from langchain_core.callbacks import BaseCallbackHandler
 from langchain_core.tools import BaseTool, tool
-from langchain_gigachat.chat_models import GigaChat
-from langchain_openai import ChatOpenAI
-from langgraph.prebuilt import create_react_agent
-from langgraph.checkpoint.memory import InMemorySaver
+from langchain_core.messages import AIMessage, AIMessageChunk, ToolMessage, HumanMessage, SystemMessage
 from core.schemas import (
     AvgHourlyRateByInput,
     AvgSuccessRateByInput,
@@ -14,31 +16,172 @@ from core.schemas import (
     AvgMarketingSpendByInput,
     BatchAnalyticsInput,
     BatchAnalyticsMethod,
+    QueryFilter,
+    QueryInput,
 )
-from core.data_analyzer import DataAnalyzer
+from core.data_analyzer import LazyDataAnalyzer
+from core.answer_cache import AnswerCache, ToolCalls
+from core.history import estimate_tokens, message_tokens, trim_history
+from core.retry import retry_delay, status_code
+from core.batch import BatchExecutor
 from core.config import settings
-from core.logger import logger_config
-from langchain_core.messages import AIMessage, ToolMessage, HumanMessage, SystemMessage
+from core.logger import setup_logging
+from core.metrics import Sample, Span, metrics, tracer
 
+if TYPE_CHECKING:
+    from langchain_core.language_models import LanguageModelLike
+    from langchain_core.runnables import RunnableConfig
+    from langgraph.checkpoint.base import BaseCheckpointSaver
+    from core.profiling import SessionProfiler
 
-logging.config.dictConfig(logger_config)
+
+setup_logging()
 logger = logging.getLogger('main_logger')
 batch_analytics_logger = logging.getLogger('batch_analytics_logger')
 trim_logger = logging.getLogger('trim_logger')
 
 
+class StartupReport:
+    """Разбивка времени до первого приглашения ввода по фазам запуска."""
+
+    PHASES = {
+        'imports': 'импорты',
+        'config': 'конфигурация и модель',
+        'data': 'загрузка данных',
+        'agent': 'сборка графа агента',
+    }
+
+    def __init__(self, started: float) -> None:
+        self._started = started
+        self.phases: Dict[str, float] = {}
+
+    def add(self, phase: str, seconds: float) -> None:
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    @contextmanager
+    def measure(self, phase: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(phase, time.perf_counter() - start)
+
+    def render(self, dataset: 'LazyDataAnalyzer') -> str:
+        lines = [f'Время до первого приглашения: {time.perf_counter() - self._started:.3f} сек']
+        for phase, title in self.PHASES.items():
+            if phase == 'data':
+                if dataset.load_seconds is None:
+                    lines.append(f'- {title}: ещё идёт в фоне')
+                else:
+                    lines.append(f'- {title}: {dataset.load_seconds:.3f} сек (в фоне)')
+                continue
+            lines.append(f'- {title}: {self.phases.get(phase, 0.0):.3f} сек')
+        return '\n'.join(lines)
+
+
+startup = StartupReport(_started)
+startup.add('imports', time.perf_counter() - _started)
+
+
+class TracingCallback(BaseCallbackHandler):
+    """Интервалы llm и tool внутри хода (core/metrics.py) по колбэкам LangChain.
+
+    Интервал инструмента становится текущим, чтобы в него вложились вызовы
+    DataAnalyzer; вызов модели — лист дерева.
+    """
+    # Колбэки выполняются в потоке узла графа, а не в отдельном исполнителе:
+    # иначе контекст с текущим интервалом теряется
+    run_inline = True
+
+    def __init__(self) -> None:
+        self._spans: Dict[UUID, Tuple[Span, Any]] = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, metadata=None, invocation_params=None, **kwargs) -> None:
+        model = ((metadata or {}).get('ls_model_name') or (invocation_params or {}).get('model')
+                 or (invocation_params or {}).get('model_name') or (serialized or {}).get('name') or 'unknown')
+        self._spans[run_id] = (tracer.start('llm', metric='llm_call_seconds', model=model), None)
+
+    def on_llm_end(self, response, *, run_id: UUID, **kwargs) -> None:
+        self._end(run_id)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs) -> None:
+        metrics.inc('llm_errors_total', status=status_code(error) or type(error).__name__)
+        self._end(run_id, error=type(error).__name__)
+
+    def on_tool_start(self, serialized, input_str, *, run_id: UUID, **kwargs) -> None:
+        span = tracer.start('tool', metric='tool_seconds', tool=(serialized or {}).get('name') or kwargs.get('name') or 'unknown')
+        self._spans[run_id] = (span, tracer.activate(span))
+
+    def on_tool_end(self, output, *, run_id: UUID, **kwargs) -> None:
+        self._end(run_id)
+
+    def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs) -> None:
+        self._end(run_id, error=type(error).__name__)
+
+    def _end(self, run_id: UUID, **attrs: Any) -> None:
+        entry = self._spans.pop(run_id, None)
+        if entry is None:
+            return
+        span, token = entry
+        if token is not None:
+            tracer.deactivate(span, token)
+        span.end(**attrs)
+
+
+class Turn(NamedTuple):
+    """Результат хода агента."""
+    answer: str
+    usage: Optional[dict] = None
+    retries: int = 0
+    error: bool = False
+
+
+class GraphRunError(Exception):
+    """Ошибка запуска графа: исходная ошибка LLM и число повторов, выполненных до неё."""
+
+    def __init__(self, error: Exception, retries: int) -> None:
+        super().__init__(str(error))
+        self.error = error
+        self.retries = retries
+
+
 class LLMAgent:
 
-    def __init__(self, model: 'LanguageModelLike', system_prompt: str, tools: Sequence['BaseTool']) -> None:
+    def __init__(
+        self,
+        model: 'LanguageModelLike',
+        system_prompt: str,
+        tools: Sequence['BaseTool'],
+        answer_cache: Optional[AnswerCache] = None,
+        context_tokens: int = 8192,
+        reply_tokens: int = 1024,
+        checkpointer: Optional['BaseCheckpointSaver'] = None,
+    ) -> None:
+        from langgraph.prebuilt import create_react_agent
+        from langgraph.checkpoint.memory import InMemorySaver
+        from langchain_core.utils.function_calling import convert_to_openai_tool
+
         self._model = model
+        self._tools = {t.name: t for t in tools}
+        self._answer_cache = answer_cache
+        # Кэш ответов можно выключить на время сессии, не теряя сохранённых записей
+        self.answer_cache_enabled = answer_cache is not None
         self._token_history = []
         self._system_prompt = system_prompt
+        self._system_message = SystemMessage(content=system_prompt)
+        # Системный промпт и схемы инструментов идут в каждый запрос; истории остаётся
+        # контекст модели за вычетом их и запаса на ответ
+        self._context_tokens = context_tokens
+        self._prefix_tokens = message_tokens(self._system_message) + sum(
+            estimate_tokens(json.dumps(convert_to_openai_tool(t), ensure_ascii=False)) for t in tools)
+        self._history_budget = max(context_tokens - reply_tokens - self._prefix_tokens, 0)
+        self._callbacks = [TracingCallback()]
         self._config: RunnableConfig = {
-            'configurable': {'thread_id': uuid.uuid4().hex}}
+            'configurable': {'thread_id': uuid.uuid4().hex}, 'callbacks': self._callbacks}
         self._agent = create_react_agent(
             model,
             tools=tools,
-            checkpointer=InMemorySaver(),
+            checkpointer=checkpointer or InMemorySaver(),
             pre_model_hook=self._pre_model_hook,
             # debug=True
         )
@@ -51,6 +194,7 @@ class LLMAgent:
             0
         )
         self._token_history.append({'total_tokens': total})
+        metrics.inc('llm_tokens_total', total)
 
     @property
     def _total_tokens_spent(self) -> int:
@@ -60,81 +204,72 @@ class LLMAgent:
             return 0
         return sum(extract_total(pair) for pair in self._token_history)
 
-    def _trim_messages_by_pairs(
+    def _trim_history(
         self,
         messages: List[Union[SystemMessage, HumanMessage, AIMessage, ToolMessage]],
-        max_pairs: int
     ) -> List[Union[SystemMessage, HumanMessage, AIMessage, ToolMessage]]:
-        trim_logger.info('=== TRIMMING START ===')
-        
-        # Сохраняем системное сообщение
-        sys = [m for m in messages if isinstance(m, SystemMessage)]
-        if sys:
-            trim_logger.info(f'Найдено системное сообщение: {sys[0].content[:50]}...')
-        
-        # Группируем сообщения в пары
-        pairs = []
-        current_pair = []
-        
-        for msg in messages:
-            if isinstance(msg, SystemMessage):
-                continue
-                
-            if isinstance(msg, HumanMessage):
-                if current_pair:  # Если есть предыдущая пара
-                    pairs.append(current_pair)
-                current_pair = [msg]  # Начинаем новую пару
-            elif current_pair:  # Добавляем к текущей паре
-                current_pair.append(msg)
-                
-        if current_pair:  # Добавляем последнюю пару
-            pairs.append(current_pair)
-        
-        trim_logger.info('=== TRIMMING UPDATE ===')
-        # Берем последние max_pairs пар
-        trimmed_pairs = pairs[-max_pairs:] if len(pairs) > max_pairs else pairs
-        trim_logger.info(f'Найдено пар: {len(pairs)}, будет сохранено пар: {len(trimmed_pairs)}')
-        
-        # Формируем финальный список
-        result = []
-        if sys:
-            result.append(sys[0])
-            
-        for pair in trimmed_pairs:
-            result.extend(pair)
-            
-        trim_logger.info(f'Было сообщений: {len(messages)}, стало: {len(result)}')
-        trim_logger.info('Финальный стек:')
-        for idx, msg in enumerate(result):
-            trim_logger.info(f'[{idx}] {type(msg).__name__}: {msg.content[:50]}...')
-        trim_logger.info('=== TRIMMING END ===')
+        # Системное сообщение — всегда один и тот же объект: вместе со схемами инструментов
+        # это неизменный префикс запроса, на котором срабатывает кэш промптов провайдера
+        with tracer.span('trim', metric='trim_seconds'):
+            history = trim_history(messages, self._history_budget, settings.max_history_pairs)
+        result = [self._system_message] + history
+        # Хук вызывается перед каждым запросом к модели: на INFO — одна дешёвая строка,
+        # размер истории в токенах и дамп стека — только если trim_logger включён на DEBUG
+        trim_logger.info(
+            'Бюджет истории: %d токенов (контекст %d, префикс ~%d), сообщений было %d, стало %d',
+            self._history_budget, self._context_tokens, self._prefix_tokens, len(messages), len(result),
+        )
+        if trim_logger.isEnabledFor(logging.DEBUG):
+            trim_logger.debug('История: ~%d токенов', sum(message_tokens(m) for m in history))
+            for idx, msg in enumerate(result):
+                trim_logger.debug('[%d] %s: %.50s...', idx, type(msg).__name__, msg.content)
         return result
 
     def _pre_model_hook(self, state):
-        trimmed = self._trim_messages_by_pairs(
-            state['messages'],
-            settings.max_history_pairs
-        )
-        return {'llm_input_messages': trimmed}
+        return {'llm_input_messages': self._trim_history(state['messages'])}
+
+    def _turn_tool_calls(self, messages: Sequence) -> ToolCalls:
+        """Вызовы инструментов последнего хода; пусто, если хоть один завершился ошибкой."""
+        last_human = max((i for i, m in enumerate(messages) if isinstance(m, HumanMessage)), default=-1)
+        calls = []
+        for msg in messages[last_human + 1:]:
+            if isinstance(msg, ToolMessage) and getattr(msg, 'status', None) == 'error':
+                return []
+            if isinstance(msg, AIMessage):
+                calls.extend({'name': c['name'], 'args': c['args']} for c in msg.tool_calls)
+        return calls
+
+    def _replay_cached(self, content: str, history: Sequence, config: 'RunnableConfig') -> Optional[str]:
+        """Отвечает на повторный вопрос вызовом тех же инструментов на текущих данных, без LLM."""
+        if not self.answer_cache_enabled:
+            return None
+        calls = self._answer_cache.lookup(content)
+        if not calls or any(c['name'] not in self._tools for c in calls):
+            return None
+        try:
+            answer = '\n\n'.join(str(self._tools[c['name']].invoke(c['args'])) for c in calls)
+        except Exception as e:
+            logger.warning('Не удалось воспроизвести ответ из кэша %s: %s', calls, e)
+            self._answer_cache.forget(content)
+            return None
+        logger.info('Ответ из кэша ответов без вызова LLM: %s', calls)
+        # Дописываем ход в историю, чтобы уточняющие вопросы видели контекст
+        turn = [HumanMessage(content=content), AIMessage(content=answer)]
+        if not history:
+            turn.insert(0, SystemMessage(content=self._system_prompt))
+        try:
+            self._agent.update_state(config, {'messages': turn}, as_node='agent')
+        except Exception as e:
+            logger.warning('Не удалось записать ответ из кэша в историю: %s', e)
+        return answer
 
     def _check_user_prompt_length(self, message: str, max_length: int) -> None:
         if len(message) > max_length:
-            logger.error(f'User prompt слишком длинный: {len(message)} символов (лимит {max_length})')
+            logger.error('User prompt слишком длинный: %d символов (лимит %d)', len(message), max_length)
             raise ValueError(f'Слишком длинный запрос, попробуйте его сократить')
 
-    def invoke(
-        self,
-        content: str,
-        temperature: float = settings.temperature
-    ) -> str:
-        logger.info(f'Thread_id: {self._config["configurable"]["thread_id"]}')
+    def _payload(self, content: str, messages: Sequence, temperature: float) -> dict:
         # Добавляем system prompt при первом запросе
-        try:
-            state = self._agent.get_state(self._config)
-            messages = state.values.get('messages', [])
-        except Exception:
-            messages = []
-        self._check_user_prompt_length(content, settings.max_length_human_prompt)
         if not messages:
             payload_messages = [
                 {'role': 'system', 'content': self._system_prompt},
@@ -146,38 +281,196 @@ class LLMAgent:
             'messages': payload_messages,
             'temperature': temperature,
         }
-        logger.info(f'Параметры вызова LLM: {payload}')
+        logger.info('Параметры вызова LLM: %s', payload)
+        return payload
+
+    def _finish_turn(self, content: str, messages: Sequence) -> Optional[dict]:
+        """Учёт токенов и запись вызовов инструментов хода в кэш ответов; возвращает usage хода."""
+        usage = None
+        for msg in reversed(messages):
+            if hasattr(msg, 'response_metadata') and msg.response_metadata and 'token_usage' in msg.response_metadata:
+                usage = msg.response_metadata['token_usage']
+                break
+            if isinstance(msg, HumanMessage):
+                break
+            if getattr(msg, 'usage_metadata', None):
+                # При потоковом ответе провайдер отдаёт usage в usage_metadata
+                usage = dict(msg.usage_metadata)
+                break
+        if usage:
+            self._update_token_history(usage)
+            logger.info('Всего использовано токенов: %d, в запросе: %s', self._total_tokens_spent, usage)
+        if self.answer_cache_enabled:
+            self._answer_cache.remember(content, self._turn_tool_calls(messages))
+        return usage
+
+    def _thread_config(self, thread_id: Optional[str]) -> 'RunnableConfig':
+        """Конфиг графа для сессии thread_id; None — собственная сессия агента."""
+        if thread_id is None:
+            return self._config
+        return {'configurable': {'thread_id': thread_id}, 'callbacks': self._callbacks}
+
+    def _retry_delay(self, error: Exception, attempt: int) -> Optional[float]:
+        delay = retry_delay(
+            error, attempt, settings.llm_retry_attempts, settings.llm_retry_base_delay, settings.llm_retry_max_delay)
+        if delay is not None:
+            logger.warning('LLM ответила %s, повтор %d/%d через %.2f сек', status_code(error), attempt + 1, settings.llm_retry_attempts, delay)
+        return delay
+
+    def _invoke_graph(self, payload: dict, config: 'RunnableConfig') -> Tuple[dict, int]:
+        """Запуск графа с повторами на 429/503; возвращает (результат, число повторов).
+
+        Повтор продолжает запуск с последнего чекпоинта (вход None): сообщение
+        пользователя уже в истории и второй раз не добавляется. Ошибка, после
+        которой повторов больше нет, поднимается как GraphRunError с их числом.
+        """
+        attempt = 0
+        while True:
+            try:
+                return self._agent.invoke(payload if attempt == 0 else None, config=config), attempt
+            except Exception as e:
+                delay = self._retry_delay(e, attempt)
+                if delay is None:
+                    raise GraphRunError(e, attempt) from e
+                attempt += 1
+                time.sleep(delay)
+
+    @staticmethod
+    def _llm_error(e: Exception) -> str:
+        logger.error(remove_surrogates(f'LLM ERROR: {e}'))
+        code = status_code(e)
+        if code is not None:
+            if code == 401:
+                return 'Ошибка LLM: неверный API-ключ или нет доступа (401 Unauthorized)'
+            if code == 429:
+                return 'Ошибка LLM: превышен лимит запросов (429 Too Many Requests)'
+            if code == 503:
+                return 'Ошибка LLM: сервис временно недоступен (503 Service Unavailable)'
+            if code == 500:
+                return 'Ошибка LLM: внутренняя ошибка сервиса (500 Internal Server Error)'
+            return f'Ошибка LLM: HTTP {code}'
+        return f'Ошибка LLM: {e}'
+
+    def ask(
+        self,
+        content: str,
+        temperature: float = settings.temperature,
+        thread_id: Optional[str] = None,
+    ) -> Turn:
+        """Ход диалога в сессии thread_id: ответ, usage и число повторов после 429/503."""
+        with tracer.span('turn', metric='turn_seconds', mode='invoke') as span:
+            turn = self._ask(content, temperature, thread_id)
+            span.attrs.update(retries=turn.retries, error=turn.error)
+            return turn
+
+    def _ask(self, content: str, temperature: float, thread_id: Optional[str]) -> Turn:
+        config = self._thread_config(thread_id)
+        logger.info('Thread_id: %s', config['configurable']['thread_id'])
         try:
-            result = self._agent.invoke(
-                payload,
-                config=self._config)
-            llm_response = result['messages'][-1].content
-            usage = None
-           
-            if isinstance(result, dict) and 'messages' in result:
-                for msg in reversed(result['messages']):
-                    if hasattr(msg, 'response_metadata') and msg.response_metadata and 'token_usage' in msg.response_metadata:
-                        usage = msg.response_metadata['token_usage']
-                        break
-            if usage:
-                self._update_token_history(usage)
-                logger.info(f'Всего использовано токенов: {self._total_tokens_spent}, в запросе: {usage}')
-            
-            return llm_response
+            state = self._agent.get_state(config)
+            messages = state.values.get('messages', [])
+        except Exception:
+            messages = []
+        self._check_user_prompt_length(content, settings.max_length_human_prompt)
+        cached = self._replay_cached(content, messages, config)
+        if cached is not None:
+            return Turn(cached)
+        payload = self._payload(content, messages, temperature)
+        retries = 0
+        try:
+            result, retries = self._invoke_graph(payload, config)
+            usage = self._finish_turn(content, result['messages'])
+            return Turn(result['messages'][-1].content, usage, retries)
+        except GraphRunError as e:
+            return Turn(self._llm_error(e.error), retries=e.retries, error=True)
         except Exception as e:
-            logger.error(remove_surrogates(f'LLM ERROR: {e}'))
-            if hasattr(e, 'status_code'):
-                code = getattr(e, 'status_code')
-                if code == 401:
-                    return 'Ошибка LLM: неверный API-ключ или нет доступа (401 Unauthorized)'
-                if code == 429:
-                    return 'Ошибка LLM: превышен лимит запросов (429 Too Many Requests)'
-                if code == 503:
-                    return 'Ошибка LLM: сервис временно недоступен (503 Service Unavailable)'
-                if code == 500:
-                    return 'Ошибка LLM: внутренняя ошибка сервиса (500 Internal Server Error)'
-                return f'Ошибка LLM: HTTP {code}'
-            return f'Ошибка LLM: {e}'
+            return Turn(self._llm_error(e), retries=retries, error=True)
+
+    def invoke(
+        self,
+        content: str,
+        temperature: float = settings.temperature,
+        thread_id: Optional[str] = None,
+    ) -> str:
+        return self.ask(content, temperature, thread_id).answer
+
+    async def astream(
+        self,
+        content: str,
+        temperature: float = settings.temperature,
+        thread_id: Optional[str] = None,
+    ) -> AsyncIterator[str]:
+        """Ответ по частям по мере генерации: токены модели и результаты return_direct-инструментов.
+
+        Время до первого токена (TTFT) пишется в лог. На 429/503 до первого токена
+        запуск повторяется с паузой, как в invoke.
+        """
+        with tracer.span('turn', metric='turn_seconds', mode='stream'):
+            async for text in self._astream(content, temperature, thread_id):
+                yield text
+
+    async def _astream(self, content: str, temperature: float, thread_id: Optional[str]) -> AsyncIterator[str]:
+        config = self._thread_config(thread_id)
+        logger.info('Thread_id: %s', config['configurable']['thread_id'])
+        started = time.perf_counter()
+        try:
+            state = await self._agent.aget_state(config)
+            messages = state.values.get('messages', [])
+        except Exception:
+            messages = []
+        self._check_user_prompt_length(content, settings.max_length_human_prompt)
+        # Инструменты синхронные: воспроизведение из кэша — в потоке, чтобы не блокировать цикл событий
+        cached = await asyncio.to_thread(self._replay_cached, content, messages, config)
+        if cached is not None:
+            yield cached
+            return
+        payload = self._payload(content, messages, temperature)
+        first_token = None
+        attempt = 0
+        try:
+            while True:
+                try:
+                    async for chunk, metadata in self._agent.astream(
+                            payload if attempt == 0 else None, config=config, stream_mode='messages'):
+                        node = metadata.get('langgraph_node')
+                        if node == 'agent' and isinstance(chunk, AIMessageChunk):
+                            text = chunk.content if isinstance(chunk.content, str) else ''
+                        elif node == 'tools' and isinstance(chunk, ToolMessage) and self._is_direct(chunk.name):
+                            # Результат return_direct-инструмента — это и есть ответ, модель его не пересказывает
+                            text = chunk.content
+                        else:
+                            continue
+                        if not text:
+                            continue
+                        if first_token is None:
+                            first_token = time.perf_counter() - started
+                            logger.info('Время до первого токена (TTFT): %.3f сек', first_token)
+                        yield text
+                    break
+                except Exception as e:
+                    # Напечатанное уже не отозвать: повторяем, только пока ответ не начался
+                    delay = self._retry_delay(e, attempt) if first_token is None else None
+                    if delay is None:
+                        raise
+                    attempt += 1
+                    await asyncio.sleep(delay)
+            state = await self._agent.aget_state(config)
+            self._finish_turn(content, state.values.get('messages', []))
+            logger.info('Ответ получен за %.3f сек', time.perf_counter() - started)
+        except Exception as e:
+            yield self._llm_error(e)
+
+    def _is_direct(self, name: Optional[str]) -> bool:
+        tool = self._tools.get(name)
+        return tool is not None and tool.return_direct
+
+    async def ainvoke(
+        self,
+        content: str,
+        temperature: float = settings.temperature,
+        thread_id: Optional[str] = None,
+    ) -> str:
+        return ''.join([chunk async for chunk in self.astream(content, temperature, thread_id)])
 
 
 def remove_surrogates(text: str) -> str:
@@ -190,11 +483,121 @@ def print_agent_response(llm_response: str) -> None:
     print(f'{settings.llm_response_color}{cleaned}{settings.llm_response_color_reset}')
 
 
+async def print_agent_stream(chunks: AsyncIterator[str]) -> str:
+    """Печатает ответ по мере поступления частей, в цвете ответа; возвращает весь текст."""
+    parts = []
+    print(settings.llm_response_color, end='', flush=True)
+    try:
+        async for chunk in chunks:
+            cleaned = remove_surrogates(chunk)
+            parts.append(cleaned)
+            print(cleaned, end='', flush=True)
+    finally:
+        print(settings.llm_response_color_reset, flush=True)
+    return ''.join(parts)
+
+
+def read_questions(path: str) -> List[Dict[str, Any]]:
+    """Вопросы из JSONL: поле question (или body), id — из id / request_id или номер строки."""
+    questions = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            question = item.get('question') or item.get('body')
+            if not question:
+                raise ValueError(f'{path}:{number}: нет поля question')
+            questions.append({'id': item.get('id', item.get('request_id', number)), 'question': question})
+    return questions
+
+
+def answer_questions(
+    agent: LLMAgent,
+    questions: Sequence[Dict[str, Any]],
+    concurrency: int,
+    profiler: Optional['SessionProfiler'] = None,
+) -> Iterator[Dict[str, Any]]:
+    """Отвечает на вопросы в пуле из concurrency потоков, каждый — в своей сессии агента.
+
+    Результаты отдаются в порядке вопросов по мере готовности. С profiler каждый
+    вопрос — отдельный ход профиля (concurrency должен быть 1).
+    """
+    def run(item: Dict[str, Any]) -> Dict[str, Any]:
+        start = time.perf_counter()
+        try:
+            with profiler.turn(item['question']) if profiler else nullcontext():
+                turn = agent.ask(item['question'], thread_id=uuid.uuid4().hex)
+        except ValueError as e:
+            turn = Turn(str(e), error=True)
+        return {
+            'id': item['id'],
+            'question': item['question'],
+            'answer': remove_surrogates(turn.answer),
+            'latency_s': round(time.perf_counter() - start, 3),
+            'usage': turn.usage,
+            'retries': turn.retries,
+            'error': turn.error,
+        }
+
+    with ThreadPoolExecutor(max_workers=max(concurrency, 1)) as pool:
+        yield from pool.map(run, questions)
+
+
+def run_questions(
+    agent: LLMAgent,
+    path: str,
+    out: Optional[str],
+    concurrency: int,
+    profiler: Optional['SessionProfiler'] = None,
+) -> None:
+    questions = read_questions(path)
+    if profiler is not None and concurrency != 1:
+        # Параллельные вопросы смешали бы ходы в профиле
+        logger.warning('Профилирование: вопросы обрабатываются по одному вместо %d', concurrency)
+        concurrency = 1
+    logger.info('Пакетный режим: %d вопросов из %s, параллельно %d', len(questions), path, concurrency)
+    start = time.perf_counter()
+    errors = 0
+    target = open(out, 'w', encoding='utf-8') if out else sys.stdout
+    try:
+        for result in answer_questions(agent, questions, concurrency, profiler):
+            errors += result['error']
+            target.write(json.dumps(result, ensure_ascii=False) + '\n')
+            target.flush()
+    finally:
+        if out:
+            target.close()
+    elapsed = time.perf_counter() - start
+    logger.info(
+        'Пакетный режим: %d вопросов за %.1f сек (%.2f вопр/сек), ошибок: %d',
+        len(questions), elapsed, len(questions) / elapsed if elapsed else 0, errors,
+    )
+
+
 def get_user_prompt() -> str:
     return input('\nВы: ')
 
 
-analyzer = DataAnalyzer()
+# Датасет грузится в фоне после старта (или при первом вызове инструмента)
+analyzer = LazyDataAnalyzer()
+
+
+def analyzer_samples() -> Iterator[Sample]:
+    """Счётчики DataAnalyzer для экспорта метрик; датасет ради них не загружается."""
+    if not analyzer.loaded:
+        return
+    instance = analyzer.get()
+    yield Sample('analyzer_rows_scanned_total', {}, instance.rows_scanned)
+    cache = instance.result_cache
+    if cache is not None:
+        yield Sample('analyzer_cache_hits_total', {}, cache.hits)
+        yield Sample('analyzer_cache_misses_total', {}, cache.misses)
+        yield Sample('analyzer_cache_evictions_total', {}, cache.evictions)
+
+
+metrics.add_collector(analyzer_samples)
+batch_executor: Optional[BatchExecutor] = None
 
 
 
@@ -293,8 +696,28 @@ def avg_marketing_spend_by(by: str = 'category') -> str:
     """Средние маркетинговые расходы, сгруппированные по одному из полей."""
     return analyzer.avg_marketing_spend_by(by)
 
+@tool('query', args_schema=QueryInput, return_direct=True)
+def query(
+    metric: Optional[str] = None,
+    aggregate: str = 'avg',
+    group_by: Optional[str] = None,
+    filters: Optional[List[QueryFilter]] = None,
+    top_k: Optional[int] = None,
+) -> str:
+    """Агрегат метрики по данным о фрилансерах: aggregate от metric в разрезе group_by с фильтрами.
+
+    Метрики: earnings, hourly_rate, job_completed, rehire_rate, success_rate, client_rating,
+    marketing_spend, job_duration. Без metric считается число фрилансеров (aggregate=count).
+    Пример: эксперты в Азии с rehire_rate > 70 — filters=[{"field": "experience", "op": "==", "value": "Expert"},
+    {"field": "region", "op": "==", "value": "Asia"}, {"field": "rehire_rate", "op": ">", "value": 70}].
+    """
+    return analyzer.query(metric, aggregate, group_by, [f.model_dump() for f in filters or []], top_k)
+
 @tool(args_schema=BatchAnalyticsInput)
-def batch_analytics(methods: List[BatchAnalyticsMethod]) -> str:
+def batch_analytics(
+    methods: Optional[List[BatchAnalyticsMethod]] = None,
+    queries: Optional[List[QueryInput]] = None,
+) -> str:
     """
     Универсальный инструмент для генерации отчёта по нескольким аналитическим вопросам.
 
@@ -302,89 +725,194 @@ def batch_analytics(methods: List[BatchAnalyticsMethod]) -> str:
     - {"method": "<имя_метода>"} — для методов без параметров
     - {"method": "<имя_метода>", "by": "<значение>"} — для методов с параметром by
 
+    Каждый элемент списка queries — аргументы инструмента query.
     Если by не указан, используется значение по умолчанию (обычно category).
     """
-    batch_analytics_logger.warning(f'batch_analytics: вызвано методов: {len(methods)}')
+    methods, queries = methods or [], queries or []
+    batch_analytics_logger.warning('batch_analytics: вызвано методов: %d, запросов query: %d', len(methods), len(queries))
     # if len(methods) > settings.max_batch_methods:
     #     methods = methods[:settings.max_batch_methods]
-    results = []
+    calls = []
     for m in methods:
-        method_name = m.method
-        func = getattr(analyzer, method_name, None)
-        batch_analytics_logger.info(f'batch_analytics: ищу метод {method_name} с параметрами {m.model_dump()}')
-        if func:
-            try:
-                params = m.model_dump(exclude_unset=True)
-                params.pop('method', None)
-                sig = inspect.signature(func)
-                filtered_params = {k: v for k, v in params.items() if k in sig.parameters}
-                batch_analytics_logger.info(f'batch_analytics: вызываю {method_name} с параметрами {filtered_params}')
-                result = func(**filtered_params)
-                batch_analytics_logger.info(f'batch_analytics: результат {method_name}')
-                results.append(f'{result}')
-            except Exception as e:
-                batch_analytics_logger.error(f'batch_analytics: ошибка при вызове {method_name} с параметрами {params}: {e}')
-                results.append(f'Извините, отвлёкся) повторите вопрос.')
-        else:
-            batch_analytics_logger.warning(f'batch_analytics: метод {method_name} не найден')
-            results.append(f'Извините, отвлёкся, повторите ваш вопрос.')
+        params = m.model_dump(exclude_unset=True)
+        params.pop('method', None)
+        calls.append((m.method, params))
+    calls.extend(('query', q.model_dump()) for q in queries)
+    rows_before = analyzer.rows_scanned
+    with analyzer.fused(calls) as specs:
+        batch_analytics_logger.info('batch_analytics: %d агрегатов объединено в один проход по данным', len(specs))
+        results = _batch_executor().run(calls)
+    batch_analytics_logger.info('batch_analytics: просмотрено строк за батч: %d', analyzer.rows_scanned - rows_before)
     return '\n\n'.join(results)
 
 
-def main() -> None:
+def _batch_executor() -> BatchExecutor:
+    global batch_executor
+    if batch_executor is None:
+        batch_executor = BatchExecutor(
+            analyzer,
+            workers=settings.batch_workers,
+            kind=settings.batch_executor,
+            timeout=settings.batch_method_timeout,
+            path=settings.csv_path,
+            batch_timeout=settings.batch_timeout,
+        )
+    return batch_executor
+
+
+# Именованные методы — пресеты над теми же агрегатами, что и query
+PRESET_TOOLS = [
+    crypto_vs_other_income,
+    income_by_region,
+    percent_experts_lt_100_projects,
+    avg_income_by_category,
+    avg_income_by_experience,
+    top5_regions_by_experts,
+    percent_high_rehire,
+    avg_job_duration_all,
+    avg_job_duration_by_category,
+    avg_job_duration_by_region,
+    avg_job_duration_by_experience,
+    avg_job_duration_by_platform,
+    avg_job_duration_by_project_type,
+    avg_income_by_platform,
+    avg_income_by_project_type,
+    avg_marketing_spend_by,
+    avg_hourly_rate_by,
+    avg_success_rate_by,
+    avg_client_rating_by,
+]
+
+ALL_TOOLS = PRESET_TOOLS + [query, batch_analytics]
+
+# В режиме 'query' модели видны только два инструмента: меньше токенов схем в каждом ходе
+TOOLS = [query, batch_analytics] if settings.tools_mode == 'query' else ALL_TOOLS
+
+# Модули провайдеров импортируются только для выбранной модели
+PROVIDER_MODULES = {
+    settings.llm_groq.model: 'langchain_openai',
+    settings.llm_gigachat.model: 'langchain_gigachat.chat_models',
+}
+
+
+def import_agent_modules() -> None:
+    module = PROVIDER_MODULES.get(settings.allowed_llm_model)
+    if module is None:
+        raise ValueError(f'Модель {settings.llm_groq.model} или {settings.llm_gigachat.model} не поддерживается')
+    importlib.import_module(module)
+    importlib.import_module('langgraph.prebuilt')
+
+
+def build_model() -> Tuple['LanguageModelLike', str]:
+    if settings.llm_groq.model == settings.allowed_llm_model:
+        from langchain_openai import ChatOpenAI
+        return ChatOpenAI(
+            model=settings.llm_groq.model,
+            base_url=settings.llm_groq.base_url,
+            api_key=settings.llm_groq.api_key
+        ), settings.llm_groq.system_prompt
+    if settings.llm_gigachat.model == settings.allowed_llm_model:
+        from langchain_gigachat.chat_models import GigaChat
+        return GigaChat(
+            credentials=settings.llm_gigachat.api_key,
+            model=settings.llm_gigachat.model,
+            verify_ssl_certs=settings.llm_gigachat.verify_ssl_certs
+        ), settings.llm_gigachat.system_prompt if settings.tools_mode == 'query' else settings.llm_gigachat.methods_prompt
+    raise ValueError(f'Модель {settings.llm_groq.model} или {settings.llm_gigachat.model} не поддерживается')
+
+
+def build_checkpointer() -> Optional['BaseCheckpointSaver']:
+    """Хранилище истории сессий из настроек; None — InMemorySaver агента."""
+    if not settings.checkpoint_path:
+        return None
+    from core.checkpoint import SqliteSaver
+    return SqliteSaver(
+        settings.checkpoint_path,
+        window_turns=settings.checkpoint_window_turns,
+        keep_checkpoints=settings.checkpoint_keep,
+        cache_threads=settings.checkpoint_cache_threads,
+        max_threads=settings.checkpoint_max_threads,
+    )
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Аналитик данных о фрилансерах (CLI)')
+    parser.add_argument('--startup-report', action='store_true',
+                        help='показать разбивку времени запуска до первого приглашения ввода')
+    parser.add_argument('--no-answer-cache', action='store_true',
+                        help='не использовать кэш ответов в этой сессии (всегда спрашивать LLM)')
+    parser.add_argument('--no-stream', action='store_true',
+                        help='печатать ответ целиком после завершения, а не по мере генерации')
+    parser.add_argument('--questions', metavar='JSONL',
+                        help='пакетный режим: ответить на вопросы из JSONL (поле question) и завершиться')
+    parser.add_argument('--out', metavar='JSONL', help='куда писать ответы пакетного режима (по умолчанию stdout)')
+    parser.add_argument('--concurrency', type=int, default=settings.questions_concurrency,
+                        help='сколько вопросов пакетного режима обрабатывать одновременно')
+    parser.add_argument('--tail', action='store_true',
+                        help='дочитывать строки, дописанные в CSV, без перезапуска (см. tail_interval)')
+    parser.add_argument('--metrics-out', metavar='PATH', default=settings.metrics_path,
+                        help='записать метрики в формате Prometheus в файл при выходе')
+    parser.add_argument('--profile', action='store_true',
+                        help='профилировать ходы сессии (cProfile, tracemalloc) в profile_dir и напечатать сводку при выходе')
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    args = parse_args(argv)
+    if args.tail:
+        settings.tail_enabled = True
+    profiler = None
+    if args.profile:
+        from core.profiling import SessionProfiler
+        # До фоновой загрузки датасета: профилируются потоки, запущенные после start()
+        profiler = SessionProfiler(settings.profile_dir, settings.profile_top, settings.profile_frames)
+        profiler.start()
     try:
-        if settings.llm_groq.model == settings.allowed_llm_model:
-            system_prompt = settings.llm_groq.system_prompt
-            model = ChatOpenAI(
-                model=settings.llm_groq.model,
-                base_url=settings.llm_groq.base_url,
-                api_key=settings.llm_groq.api_key
-            )
-        elif settings.llm_gigachat.model == settings.allowed_llm_model:
-            system_prompt = settings.llm_gigachat.system_prompt
-            model = GigaChat(
-                credentials=settings.llm_gigachat.api_key,
-                model=settings.llm_gigachat.model,
-                verify_ssl_certs=settings.llm_gigachat.verify_ssl_certs
+        analyzer.preload()
+        with startup.measure('imports'):
+            import_agent_modules()
+        with startup.measure('config'):
+            model, system_prompt = build_model()
+        answer_cache = None
+        if settings.answer_cache_enabled and not args.no_answer_cache:
+            answer_cache = AnswerCache(settings.answer_cache_path, settings.answer_cache_size)
+        with startup.measure('agent'):
+            agent = LLMAgent(
+                model, system_prompt, tools=TOOLS, answer_cache=answer_cache,
+                context_tokens=settings.llm.context_tokens, reply_tokens=settings.llm.reply_tokens,
+                checkpointer=build_checkpointer(),
             )
-        else:
-            raise ValueError(f'Модель {settings.llm_groq.model} или {settings.llm_gigachat.model} не поддерживается')
-
-        agent = LLMAgent(model, system_prompt, tools=[
-            crypto_vs_other_income,
-            income_by_region,
-            percent_experts_lt_100_projects,
-            avg_income_by_category,
-            avg_income_by_experience,
-            top5_regions_by_experts,
-            percent_high_rehire,
-            avg_job_duration_all,
-            avg_job_duration_by_category,
-            avg_job_duration_by_region,
-            avg_job_duration_by_experience,
-            avg_job_duration_by_platform,
-            avg_job_duration_by_project_type,
-            avg_income_by_platform,
-            avg_income_by_project_type,
-            avg_marketing_spend_by,
-            avg_hourly_rate_by,
-            avg_success_rate_by,
-            avg_client_rating_by,
-            batch_analytics
-        ])
+        if args.questions:
+            run_questions(agent, args.questions, args.out, args.concurrency, profiler)
+            return
         agent_response = None
+        stream = settings.stream_output and not args.no_stream
+        # Один цикл событий на сессию: асинхронные HTTP-клиенты провайдеров привязаны к нему
+        loop = asyncio.new_event_loop() if stream else None
         print_agent_response(settings.first_message)
+        if args.startup_report:
+            print(startup.render(analyzer))
         while True:
             if agent_response is not None:
                 print_agent_response(agent_response)
             prompt = get_user_prompt()
             try:
-                agent_response = agent.invoke(prompt)
+                with profiler.turn(prompt) if profiler else nullcontext():
+                    if stream:
+                        agent_response = None
+                        loop.run_until_complete(print_agent_stream(agent.astream(prompt)))
+                    else:
+                        agent_response = agent.invoke(prompt)
             except ValueError as e:
                 print(f'{settings.llm_response_color}{e}{settings.llm_response_color_reset}')
     except Exception as e:
         logger.error(remove_surrogates(f'CRITICAL ERROR: {e}'))
         sys.exit(1)
+    finally:
+        if args.metrics_out:
+            metrics.write(args.metrics_out)
+        if profiler is not None:
+            print(profiler.close(), file=sys.stderr)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,245 @@
+"""Локальный сервер аналитики: один прогретый DataAnalyzer и граф агента на все сессии.
+
+    python server.py --port 8765
+    python server.py --unix /tmp/freelance-analytics.sock
+
+API (JSON):
+    POST /v1/chat          {"message": "...", "thread_id": "..."} -> ответ агента в сессии thread_id
+    POST /v1/tools/<имя>   аргументы инструмента -> результат без LLM
+    GET  /health           состояние сервера
+    GET  /v1/traces        интервалы последних ходов: turn -> trim, llm, tool -> analyzer
+
+GET /metrics — метрики в текстовом формате Prometheus (core/metrics.py).
+"""
+import argparse, json, logging, os, socketserver, threading, time, uuid
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Union
+
+import main
+from core.answer_cache import AnswerCache
+from core.config import settings
+from core.metrics import metrics, tracer
+
+logger = logging.getLogger('main_logger')
+
+MAX_BODY_BYTES = 64 * 1024
+MAX_THREAD_ID = 128
+
+
+class RequestError(Exception):
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+class AnalyticsServer:
+    """Сессии чата поверх одного LLMAgent: граф, модель (и её HTTP-пул соединений)
+    и датасет общие, история каждой сессии хранится в чекпоинтере по thread_id.
+
+    Запросы одной сессии выполняются по очереди, разных — параллельно.
+    Замок сессии живёт, только пока к ней есть запросы в работе: thread_id
+    выбирает клиент, и хранить замки всех когда-либо виденных сессий нельзя.
+    """
+
+    def __init__(self, agent: 'main.LLMAgent', tools: Sequence[Any]) -> None:
+        self.agent = agent
+        self.tools = {t.name: t for t in tools}
+        self.started = time.time()
+        self.requests = 0
+        # thread_id -> [замок сессии, число запросов в работе]
+        self._sessions: Dict[str, List[Any]] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _session(self, thread_id: str) -> Iterator[None]:
+        with self._lock:
+            self.requests += 1
+            entry = self._sessions.get(thread_id)
+            if entry is None:
+                entry = self._sessions[thread_id] = [threading.Lock(), 0]
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._sessions[thread_id]
+
+    def chat(self, message: Any, thread_id: Optional[Any] = None) -> Dict[str, Any]:
+        if not isinstance(message, str) or not message.strip():
+            raise RequestError(400, 'Поле message должно быть непустой строкой')
+        if thread_id is None:
+            thread_id = uuid.uuid4().hex
+        if not isinstance(thread_id, str) or not thread_id or len(thread_id) > MAX_THREAD_ID:
+            raise RequestError(400, f'thread_id — строка до {MAX_THREAD_ID} символов')
+        start = time.perf_counter()
+        with self._session(thread_id):
+            try:
+                turn = self.agent.ask(message, thread_id=thread_id)
+            except ValueError as e:
+                raise RequestError(400, str(e))
+        return {
+            'thread_id': thread_id,
+            'answer': main.remove_surrogates(turn.answer),
+            'usage': turn.usage,
+            'retries': turn.retries,
+            'error': turn.error,
+            'latency_s': round(time.perf_counter() - start, 4),
+        }
+
+    def call_tool(self, name: str, args: Dict[str, Any]) -> Dict[str, Any]:
+        tool = self.tools.get(name)
+        if tool is None:
+            raise RequestError(404, f'Нет инструмента {name}')
+        try:
+            return {'result': str(tool.invoke(args))}
+        except ValueError as e:
+            # ValidationError аргументов тоже ValueError
+            raise RequestError(400, str(e))
+
+    def health(self) -> Dict[str, Any]:
+        return {
+            'status': 'ok',
+            'data_loaded': main.analyzer.loaded,
+            # Сессии с запросами в работе (история завершённых остаётся в чекпоинтере)
+            'sessions': len(self._sessions),
+            'requests': self.requests,
+            'uptime_s': round(time.time() - self.started, 1),
+        }
+
+
+def make_handler(app: AnalyticsServer):
+    class Handler(BaseHTTPRequestHandler):
+        # HTTP/1.1: клиент держит соединение открытым между запросами
+        protocol_version = 'HTTP/1.1'
+
+        def address_string(self) -> str:
+            # У Unix-сокета нет адреса клиента
+            return self.client_address[0] if isinstance(self.client_address, tuple) else 'unix'
+
+        def log_message(self, format: str, *args) -> None:
+            logger.debug('%s ' + format, self.address_string(), *args)
+
+        def _send(self, status: int, payload: Union[Dict[str, Any], str]) -> None:
+            if isinstance(payload, str):
+                body, content_type = payload.encode('utf-8'), 'text/plain; version=0.0.4; charset=utf-8'
+            else:
+                body, content_type = json.dumps(payload, ensure_ascii=False).encode('utf-8'), 'application/json; charset=utf-8'
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _body(self) -> Dict[str, Any]:
+            length = int(self.headers.get('Content-Length') or 0)
+            if length > MAX_BODY_BYTES:
+                raise RequestError(413, 'Слишком большой запрос')
+            raw = self.rfile.read(length) if length else b'{}'
+            try:
+                body = json.loads(raw)
+            except ValueError:
+                raise RequestError(400, 'Тело запроса — не JSON')
+            if not isinstance(body, dict):
+                raise RequestError(400, 'Тело запроса — JSON-объект')
+            return body
+
+        def _handle(self, route) -> None:
+            try:
+                self._send(200, route())
+            except RequestError as e:
+                self._send(e.status, {'error': str(e)})
+            except Exception as e:
+                logger.error(main.remove_surrogates(f'Ошибка сервера на {self.path}: {e}'))
+                self._send(500, {'error': 'Внутренняя ошибка сервера'})
+
+        def do_GET(self) -> None:
+            def route() -> Union[Dict[str, Any], str]:
+                if self.path == '/health':
+                    return app.health()
+                if self.path == '/metrics':
+                    return metrics.render()
+                if self.path == '/v1/traces':
+                    return {'traces': tracer.recent()}
+                raise RequestError(404, f'Нет пути {self.path}')
+            self._handle(route)
+
+        def do_POST(self) -> None:
+            def route() -> Dict[str, Any]:
+                body = self._body()
+                if self.path == '/v1/chat':
+                    return app.chat(body.get('message'), body.get('thread_id'))
+                if self.path.startswith('/v1/tools/'):
+                    return app.call_tool(self.path[len('/v1/tools/'):], body)
+                raise RequestError(404, f'Нет пути {self.path}')
+            self._handle(route)
+
+    return Handler
+
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def make_server(app: AnalyticsServer, host: str = '127.0.0.1', port: int = 8765, unix: Optional[str] = None):
+    """HTTP-сервер на TCP-порту или Unix-сокете; каждый запрос — в своём потоке."""
+    handler = make_handler(app)
+    if unix:
+        if os.path.exists(unix):
+            os.unlink(unix)
+        return ThreadingUnixHTTPServer(unix, handler)
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def build_app(
+    model=None,
+    system_prompt: str = '',
+    answer_cache: bool = settings.answer_cache_enabled,
+    checkpointer=None,
+) -> AnalyticsServer:
+    """Сервер с моделью из настроек (или переданной, например заглушкой для нагрузочного теста).
+
+    Модель создаётся один раз на процесс, так что её HTTP-клиент и пул соединений
+    к провайдеру переиспользуются всеми сессиями.
+    """
+    if model is None:
+        main.import_agent_modules()
+        model, system_prompt = main.build_model()
+        checkpointer = checkpointer or main.build_checkpointer()
+    cache = AnswerCache(settings.answer_cache_path, settings.answer_cache_size) if answer_cache else None
+    agent = main.LLMAgent(
+        model, system_prompt, tools=main.TOOLS, answer_cache=cache,
+        context_tokens=settings.llm.context_tokens, reply_tokens=settings.llm.reply_tokens,
+        checkpointer=checkpointer,
+    )
+    return AnalyticsServer(agent, main.ALL_TOOLS)
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Локальный сервер аналитики с общим DataAnalyzer')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--unix', metavar='PATH', help='слушать Unix-сокет вместо TCP')
+    return parser.parse_args(argv)
+
+
+def serve(argv: Optional[Sequence[str]] = None) -> None:
+    args = parse_args(argv)
+    main.analyzer.preload()
+    server = make_server(build_app(), args.host, args.port, args.unix)
+    logger.info('Сервер аналитики слушает %s', args.unix or f'http://{args.host}:{args.port}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    serve()
@@ -0,0 +1,202 @@
+import asyncio, re
+import pytest
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage, SystemMessage
+from langchain_core.outputs import ChatGenerationChunk
+from core.answer_cache import AnswerCache, is_contextual, normalize_question
+from core.config import settings
+from core.retry import backoff_delay
+import main
+
+
+class FakeToolModel(GenericFakeChatModel):
+    """Фейковая модель: отдаёт заранее заданные ответы и умеет bind_tools."""
+    calls: int = 0
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _generate(self, *args, **kwargs):
+        self.calls += 1
+        return super()._generate(*args, **kwargs)
+
+    def _stream(self, *args, **kwargs):
+        # Потоковый ответ: по слову на чанк; вызов инструмента — одним чанком
+        self.calls += 1
+        message = next(self.messages)
+        if message.tool_calls:
+            yield ChatGenerationChunk(message=AIMessageChunk(content='', tool_call_chunks=[
+                {'name': c['name'], 'args': '{}', 'id': c['id'], 'index': i} for i, c in enumerate(message.tool_calls)]))
+            return
+        for part in re.split(r'(\s+)', message.content):
+            if part:
+                yield ChatGenerationChunk(message=AIMessageChunk(content=part))
+
+
+def tool_call(name, args=None):
+    return AIMessage(content='', tool_calls=[{'name': name, 'args': args or {}, 'id': f'call_{name}'}])
+
+
+def make_agent(responses, answer_cache=None):
+    model = FakeToolModel(messages=iter(responses))
+    return main.LLMAgent(model, 'system', main.ALL_TOOLS, answer_cache=answer_cache), model
+
+
+def test_normalize_question_variants():
+    assert normalize_question('Средний доход по регионам?') == normalize_question('  средний ДОХОД, по региону ')
+    assert normalize_question('Средний доход по регионам') != normalize_question('Средний доход по платформам')
+    # Те же слова в другом порядке меняют смысл фильтров
+    assert normalize_question('Сколько фрилансеров с доходом больше 1000 и ставкой меньше 50?') != \
+        normalize_question('Сколько фрилансеров с доходом больше 50 и ставкой меньше 1000?')
+    assert is_contextual('А по категориям?')
+    assert not is_contextual('Средний доход по категориям')
+
+
+def test_repeat_question_replayed_without_llm(tmp_path):
+    cache = AnswerCache(str(tmp_path / 'answers.json'), maxsize=10)
+    agent, model = make_agent([tool_call('income_by_region')], answer_cache=cache)
+    first = agent.invoke('Средний доход по регионам')
+    assert model.calls == 1 and 'Средний доход по регионам' in first
+    second = agent.invoke('средний доход по региону!')
+    assert second == first and model.calls == 1
+    history = agent._agent.get_state(agent._config).values['messages']
+    assert isinstance(history[0], SystemMessage)
+    assert [m.content for m in history if isinstance(m, HumanMessage)][-1] == 'средний доход по региону!'
+
+
+def test_answer_cache_persisted_and_bounded(tmp_path):
+    path = str(tmp_path / 'answers.json')
+    cache = AnswerCache(path, maxsize=2)
+    cache.remember('доход по регионам', [{'name': 'income_by_region', 'args': {}}])
+    cache.remember('доход по категориям', [{'name': 'avg_income_by_category', 'args': {}}])
+    cache.remember('ставка по платформам', [{'name': 'avg_hourly_rate_by', 'args': {'by': 'platform'}}])
+    reloaded = AnswerCache(path, maxsize=2)
+    assert len(reloaded) == 2
+    assert reloaded.lookup('доход по регионам') is None
+    assert reloaded.lookup('Ставка по платформам') == [{'name': 'avg_hourly_rate_by', 'args': {'by': 'platform'}}]
+
+
+def test_answer_cache_disabled_per_session(tmp_path):
+    cache = AnswerCache(str(tmp_path / 'answers.json'), maxsize=10)
+    cache.remember('Средний доход по регионам', [{'name': 'income_by_region', 'args': {}}])
+    agent, model = make_agent([AIMessage(content='ответ модели')], answer_cache=cache)
+    agent.answer_cache_enabled = False
+    assert agent.invoke('Средний доход по регионам') == 'ответ модели'
+    assert model.calls == 1
+
+
+def test_chat_without_tools_is_not_cached(tmp_path):
+    cache = AnswerCache(str(tmp_path / 'answers.json'), maxsize=10)
+    agent, _ = make_agent([AIMessage(content='Привет!')], answer_cache=cache)
+    agent.invoke('Привет, как дела')
+    assert len(cache) == 0
+
+
+def test_query_tool_replayed_without_llm(tmp_path):
+    cache = AnswerCache(str(tmp_path / 'answers.json'), maxsize=10)
+    args = {'metric': 'earnings', 'group_by': 'region', 'filters': [{'field': 'experience', 'op': '==', 'value': 'Expert'}]}
+    agent, model = make_agent([tool_call('query', args)], answer_cache=cache)
+    first = agent.invoke('Средний доход экспертов по регионам')
+    assert first.startswith('Среднее earnings по region при experience == Expert')
+    assert agent.invoke('средний доход экспертов по регионам') == first and model.calls == 1
+
+
+def test_system_prompt_is_stable_prefix():
+    agent, _ = make_agent([])
+    history = [SystemMessage(content='system'), HumanMessage(content='Привет'), AIMessage(content='Привет!')]
+    first = agent._trim_history(history)
+    second = agent._trim_history(history + [HumanMessage(content='Доход по регионам')])
+    assert first[0] is second[0] is agent._system_message
+    assert second[:len(first)] == first
+
+
+def test_astream_yields_tokens_and_direct_tool_result(tmp_path, caplog):
+    cache = AnswerCache(str(tmp_path / 'answers.json'), maxsize=10)
+    agent, model = make_agent([AIMessage(content='Привет, чем помочь?'), tool_call('income_by_region')], answer_cache=cache)
+
+    async def collect(content):
+        return [chunk async for chunk in agent.astream(content)]
+
+    with caplog.at_level('INFO', logger='main_logger'):
+        chunks = asyncio.run(collect('Привет'))
+    assert len(chunks) > 1 and ''.join(chunks) == 'Привет, чем помочь?'
+    assert any('TTFT' in r.getMessage() for r in caplog.records)
+    (report,) = asyncio.run(collect('Средний доход по регионам'))
+    assert report == main.analyzer.income_by_region()
+    # Ход записан в кэш ответов так же, как при invoke
+    assert asyncio.run(agent.ainvoke('средний доход по региону')) == report and model.calls == 2
+
+
+class RateLimited(Exception):
+    status_code = 429
+
+
+class FlakyModel(FakeToolModel):
+    """Первые failures вызовов модели отвечают 429."""
+    failures: int = 0
+
+    def _generate(self, *args, **kwargs):
+        if self.failures:
+            self.failures -= 1
+            raise RateLimited('429 Too Many Requests')
+        return super()._generate(*args, **kwargs)
+
+
+@pytest.fixture
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(settings, 'llm_retry_base_delay', 0.0)
+    monkeypatch.setattr(settings, 'llm_retry_attempts', 2)
+
+
+def test_rate_limit_retried_from_checkpoint(no_backoff):
+    model = FlakyModel(messages=iter([AIMessage(content='ok')]), failures=2)
+    agent = main.LLMAgent(model, 'system', main.TOOLS)
+    turn = agent.ask('Привет')
+    assert (turn.answer, turn.retries, turn.error) == ('ok', 2, False)
+    history = agent._agent.get_state(agent._config).values['messages']
+    assert [m.content for m in history if isinstance(m, HumanMessage)] == ['Привет']
+    model = FlakyModel(messages=iter([AIMessage(content='ok')]), failures=3)
+    turn = main.LLMAgent(model, 'system', main.TOOLS).ask('Привет')
+    assert turn.error and '429' in turn.answer and turn.retries == 2
+
+
+class ServerError(Exception):
+    status_code = 500
+
+
+class ScriptedErrorsModel(FakeToolModel):
+    """Вызовы модели по очереди поднимают ошибки из errors."""
+    errors: list = []
+
+    def _generate(self, *args, **kwargs):
+        if self.errors:
+            raise self.errors.pop(0)
+        return super()._generate(*args, **kwargs)
+
+
+def test_failed_turn_reports_retries_done(no_backoff):
+    # Один повтор после 429, затем ошибка без повторов: в ходе один повтор, а не лимит попыток
+    model = ScriptedErrorsModel(messages=iter([]), errors=[RateLimited('429'), ServerError('500 Internal Server Error')])
+    turn = main.LLMAgent(model, 'system', main.TOOLS).ask('Привет')
+    assert turn.error and '500' in turn.answer and turn.retries == 1
+
+
+def test_backoff_delay_bounds():
+    assert all(0 <= backoff_delay(attempt, 1.0, 8.0) <= min(8.0, 2 ** attempt) for attempt in range(6) for _ in range(50))
+
+
+def test_batch_questions_in_separate_sessions(tmp_path):
+    path = tmp_path / 'questions.jsonl'
+    path.write_text('\n'.join([
+        '{"request_id": "q1", "body": "Средний доход по регионам"}',
+        '',
+        '{"question": "Доход по регионам, пожалуйста"}',
+    ]), encoding='utf-8')
+    questions = main.read_questions(str(path))
+    assert [q['id'] for q in questions] == ['q1', 3]
+    agent, model = make_agent([tool_call('income_by_region'), tool_call('income_by_region')])
+    results = list(main.answer_questions(agent, questions, concurrency=2))
+    assert [r['id'] for r in results] == ['q1', 3] and model.calls == 2
+    assert all(r['answer'] == main.analyzer.income_by_region() and not r['error'] and r['latency_s'] >= 0 for r in results)
+    # Собственная сессия агента не тронута: вопросы шли в отдельных thread_id
+    assert not agent._agent.get_state(agent._config).values.get('messages')
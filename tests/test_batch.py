@@ -0,0 +1,157 @@
+import shutil, threading, time
+import pytest
+import main
+from core.batch import ERROR_MESSAGE, NOT_FOUND_MESSAGE, BatchExecutor, accepted_params
+from core.config import settings
+from core.data_analyzer import DataAnalyzer
+from test_analyzer import TEST_DATA
+
+class BatchAnalyzer(DataAnalyzer):
+    def __init__(self, data):
+        self.data = data
+
+CALLS = [
+    ('income_by_region', {}),
+    ('avg_hourly_rate_by', {'by': 'region'}),
+    ('percent_high_rehire', {'threshold': 10.0, 'by': 'ignored'}),
+    ('crypto_vs_other_income', {}),
+]
+
+@pytest.fixture
+def analyzer():
+    return BatchAnalyzer(TEST_DATA)
+
+def test_results_in_request_order(analyzer):
+    executor = BatchExecutor(analyzer, workers=4)
+    try:
+        results = executor.run(CALLS)
+    finally:
+        executor.shutdown()
+    assert results == [
+        analyzer.income_by_region(),
+        analyzer.avg_hourly_rate_by(by='region'),
+        analyzer.percent_high_rehire(threshold=10.0),
+        analyzer.crypto_vs_other_income(),
+    ]
+
+def test_slow_method_gets_partial_marker(analyzer):
+    release = threading.Event()
+    def slow():
+        release.wait(5)
+        return 'поздно'
+    analyzer.income_by_region = slow
+    executor = BatchExecutor(analyzer, workers=2, timeout=0.2)
+    try:
+        results = executor.run(CALLS[:2])
+    finally:
+        release.set()
+        executor.shutdown()
+    assert results[0] == executor.timeout_marker('income_by_region')
+    assert 'частичный результат' in results[0]
+    assert results[1] == analyzer.avg_hourly_rate_by(by='region')
+
+def test_unknown_and_failing_methods(analyzer):
+    def broken():
+        raise RuntimeError('сбой')
+    analyzer.crypto_vs_other_income = broken
+    executor = BatchExecutor(analyzer, workers=2)
+    try:
+        results = executor.run([('no_such_method', {}), ('_scan', {}), ('crypto_vs_other_income', {})])
+    finally:
+        executor.shutdown()
+    assert results == [NOT_FOUND_MESSAGE, NOT_FOUND_MESSAGE, ERROR_MESSAGE]
+
+@pytest.mark.parametrize('method', ['ingest', 'append', 'start_tail', 'stop_tail', 'aggregate'])
+def test_service_methods_not_reachable_from_tool(method, monkeypatch):
+    called = []
+    monkeypatch.setattr(DataAnalyzer, method, lambda self, *args, **kwargs: called.append(method))
+    out = main.batch_analytics.invoke({'methods': [{'method': method, 'by': 'region'}]})
+    assert out == NOT_FOUND_MESSAGE and not called
+    assert accepted_params('fused') is None and accepted_params('plan_batch') is None
+
+def test_budget_starts_when_method_starts(analyzer):
+    def slow(by='category'):
+        time.sleep(0.15)
+        return by
+    analyzer.avg_hourly_rate_by = slow
+    # Один воркер: третий метод ждёт в очереди 0.3 сек, но его бюджет отсчитывается от старта
+    executor = BatchExecutor(analyzer, workers=1, timeout=0.3)
+    try:
+        results = executor.run([('avg_hourly_rate_by', {'by': by}) for by in ('region', 'platform', 'category')])
+    finally:
+        executor.shutdown()
+    assert results == ['region', 'platform', 'category']
+
+def test_batch_timeout_bounds_queue_wait(analyzer):
+    analyzer.income_by_region = lambda: time.sleep(0.6) or 'готово'
+    executor = BatchExecutor(analyzer, workers=1, timeout=5, batch_timeout=0.3)
+    try:
+        results = executor.run(CALLS[:2])
+    finally:
+        executor.shutdown()
+    assert results == ['готово', executor.queue_marker('avg_hourly_rate_by')]
+
+def test_stuck_worker_pool_is_replaced(analyzer):
+    release = threading.Event()
+    analyzer.income_by_region = lambda: release.wait(5) and 'поздно'
+    executor = BatchExecutor(analyzer, workers=1, timeout=0.2)
+    try:
+        pool = executor.threads
+        # Единственный воркер занят после таймаута: очередь переходит в новый пул
+        results = executor.run(CALLS[:2])
+        assert results == [executor.timeout_marker('income_by_region'), analyzer.avg_hourly_rate_by(by='region')]
+        assert executor.threads is not pool
+        start = time.monotonic()
+        assert executor.run(CALLS[3:]) == [analyzer.crypto_vs_other_income()]
+        assert time.monotonic() - start < 1
+    finally:
+        release.set()
+        executor.shutdown()
+
+def test_signature_resolved_once(analyzer, monkeypatch):
+    accepted_params.cache_clear()
+    assert accepted_params('avg_hourly_rate_by') == frozenset({'by'})
+    accepted_params('avg_hourly_rate_by')
+    assert accepted_params.cache_info().misses == 1
+    # Планы batch_analytics тоже не разбирают сигнатуры на каждый вызов
+    expected = analyzer.plan_batch(CALLS)
+    def signature(*args, **kwargs):
+        raise AssertionError('inspect.signature при планировании батча')
+    monkeypatch.setattr('inspect.signature', signature)
+    assert analyzer.plan_batch(CALLS) == expected
+    assert len(analyzer.plan_batch([('query', {'metric': 'earnings', 'group_by': 'region'})])) == 1
+
+def test_process_pool(tmp_path):
+    path = tmp_path / 'data.csv'
+    shutil.copy(settings.csv_path, path)
+    local = DataAnalyzer(str(path))
+    executor = BatchExecutor(None, workers=2, kind='process', path=str(path))
+    try:
+        results = executor.run(CALLS)
+    finally:
+        executor.shutdown()
+    assert results[0] == local.income_by_region()
+    assert results[1] == local.avg_hourly_rate_by(by='region')
+
+def test_process_pool_follows_analyzer_data(tmp_path):
+    path = tmp_path / 'data.csv'
+    shutil.copy(settings.csv_path, path)
+    local = DataAnalyzer(str(path))
+    executor = BatchExecutor(local, workers=1, kind='process', path=str(path))
+    try:
+        executor.run(CALLS[:1])
+        # Строки, дописанные в CSV после старта воркера: воркер дочитывает файл до offset анализатора
+        lines = path.read_bytes().splitlines(keepends=True)
+        path.write_bytes(b''.join(lines + lines[1:50]))
+        local.ingest()
+        assert executor.run(CALLS[:1]) == [local.income_by_region()]
+        # Строки только в памяти анализатора: пул процессов их не видит, батч идёт в потоках
+        local.append(TEST_DATA)
+        assert local.file_offset is None
+        assert executor.run(CALLS[:1]) == [local.income_by_region()]
+    finally:
+        executor.shutdown()
+
+def test_unknown_pool_kind(analyzer):
+    with pytest.raises(ValueError):
+        BatchExecutor(analyzer, workers=1, kind='fiber')
@@ -0,0 +1,44 @@
+import csv
+from bench.generate import parse_rows, profile_dataset, write_dataset
+from bench.run import analytics_methods, compare, measure
+from core.columns import CATEGORICAL_COLUMNS
+from core.config import settings
+from core.data_analyzer import DataAnalyzer
+
+def read_rows(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return list(csv.DictReader(f))
+
+def test_generated_dataset_matches_schema_and_ranges(tmp_path):
+    profile = profile_dataset(settings.csv_path)
+    path = write_dataset(str(tmp_path / 'synthetic.csv'), 300, seed=1, profile=profile)
+    rows = read_rows(path)
+    assert len(rows) == 300
+    assert list(rows[0]) == profile.header
+    assert [row['Freelancer_ID'] for row in rows[:3]] == ['1', '2', '3']
+    for column in CATEGORICAL_COLUMNS:
+        assert {row[column] for row in rows} <= set(profile.categorical[column].values)
+    for column, numeric in profile.numeric.items():
+        values = [float(row[column]) for row in rows]
+        assert numeric.values[0] <= min(values) and max(values) <= numeric.values[-1]
+    # Тот же seed — тот же файл
+    again = write_dataset(str(tmp_path / 'again.csv'), 300, seed=1, profile=profile)
+    assert read_rows(again) == rows
+
+def test_parse_rows():
+    assert parse_rows('10k') == 10_000
+    assert parse_rows('1M') == 1_000_000
+    assert parse_rows('2500') == 2500
+
+def test_measure_reports_every_method(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, 'result_cache_size', settings.result_cache_size)
+    monkeypatch.setattr(settings, 'snapshot_enabled', settings.snapshot_enabled)
+    path = write_dataset(str(tmp_path / 'synthetic.csv'), 200, seed=2)
+    result = measure(path, repeat=1)
+    assert result['rows'] == 200
+    assert set(result['methods']) == set(analytics_methods())
+    assert all(hasattr(DataAnalyzer, name) for name in result['methods'])
+    assert result['batch_analytics']['methods'] == len(result['methods'])
+    assert {'parse_s', 'snapshot_load_s', 'cube_build_s'} <= set(result['load'])
+    report = {'results': [result]}
+    assert any('batch_analytics' in line for line in compare(report, report))
@@ -0,0 +1,84 @@
+import asyncio
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+from core.checkpoint import SqliteSaver, split_window
+from test_agent import FakeToolModel, FlakyModel, no_backoff, tool_call
+import main
+
+
+def make_agent(saver, responses):
+    model = FakeToolModel(messages=iter(responses))
+    return main.LLMAgent(model, 'system', main.ALL_TOOLS, checkpointer=saver), model
+
+
+def humans(messages):
+    return [m.content for m in messages if isinstance(m, HumanMessage)]
+
+
+def test_split_window_keeps_system_and_last_turns():
+    messages = [SystemMessage('s')] + [m for i in range(3) for m in (HumanMessage(f'q{i}'), AIMessage(f'a{i}'))]
+    old, window = split_window(messages, 2)
+    assert [m.content for m in old] == ['q0', 'a0']
+    assert [m.content for m in window] == ['s', 'q1', 'a1', 'q2', 'a2']
+    assert split_window(messages, 0) == ([], messages)
+
+
+def test_history_persisted_windowed_and_compacted(tmp_path):
+    path = str(tmp_path / 'checkpoints.sqlite')
+    saver = SqliteSaver(path, window_turns=2, keep_checkpoints=2)
+    agent, model = make_agent(saver, [
+        tool_call('income_by_region'), AIMessage(content='первый'), AIMessage(content='второй'), AIMessage(content='третий')])
+    for question in ('Средний доход по регионам', 'Спасибо', 'А ещё?', 'Пока'):
+        agent.ask(question)
+    assert model.calls == 4
+    stats = saver.stats()
+    assert stats['threads'] == 1 and stats['checkpoints'] == 2
+    # Остались только значения каналов, на которые ссылаются оставшиеся чекпоинты
+    referenced = {(c, v) for t in saver.list(None) for c, v in t.checkpoint['channel_versions'].items()}
+    assert stats['blobs'] == len(referenced)
+    saver.close()
+
+    reopened = SqliteSaver(path, window_turns=2)
+    agent, _ = make_agent(reopened, [])
+    thread_id = next(iter(reopened.list(None))).config['configurable']['thread_id']
+    window = agent._agent.get_state({'configurable': {'thread_id': thread_id}}).values['messages']
+    assert isinstance(window[0], SystemMessage) and humans(window) == ['А ещё?', 'Пока']
+    full = reopened.history(thread_id)
+    assert isinstance(full[0], SystemMessage) and humans(full) == ['Средний доход по регионам', 'Спасибо', 'А ещё?', 'Пока']
+    assert sum(isinstance(m, SystemMessage) for m in full) == 1
+
+
+def test_idle_threads_evicted(tmp_path):
+    saver = SqliteSaver(str(tmp_path / 'checkpoints.sqlite'), cache_threads=1, max_threads=2)
+    agent, _ = make_agent(saver, [AIMessage(content=f'ответ {i}') for i in range(4)])
+    for thread_id in ('a', 'b', 'a', 'c'):
+        agent.ask('Привет', thread_id=thread_id)
+        saver.get_tuple({'configurable': {'thread_id': thread_id}})
+    assert saver.get_tuple({'configurable': {'thread_id': 'b'}}) is None
+    assert humans(saver.history('a')) == ['Привет', 'Привет']
+    assert saver.stats()['threads'] == 2 and saver.stats()['cached_threads'] == 1
+
+
+def test_retry_and_stream_on_sqlite(tmp_path, no_backoff):
+    saver = SqliteSaver(str(tmp_path / 'checkpoints.sqlite'))
+    model = FlakyModel(messages=iter([AIMessage(content='ok'), AIMessage(content='потоковый ответ')]), failures=2)
+    agent = main.LLMAgent(model, 'system', main.TOOLS, checkpointer=saver)
+    turn = agent.ask('Привет')
+    assert (turn.answer, turn.retries) == ('ok', 2)
+
+    async def collect():
+        return [chunk async for chunk in agent.astream('Ещё')]
+    assert ''.join(asyncio.run(collect())) == 'потоковый ответ'
+    assert humans(agent._agent.get_state(agent._config).values['messages']) == ['Привет', 'Ещё']
+
+
+def test_working_set_matches_disk(tmp_path):
+    path = str(tmp_path / 'checkpoints.sqlite')
+    saver = SqliteSaver(path, window_turns=1)
+    agent, _ = make_agent(saver, [tool_call('income_by_region'), AIMessage(content='ответ')])
+    agent.ask('Средний доход по регионам')
+    agent.ask('Спасибо')
+    assert saver.stats()['cached_threads'] == 1
+    cached = saver.get_tuple(agent._config)
+    disk = SqliteSaver(path).get_tuple(agent._config)
+    assert cached.checkpoint == disk.checkpoint and cached.pending_writes == disk.pending_writes
+    assert humans(cached.checkpoint['channel_values']['messages']) == ['Спасибо']
@@ -0,0 +1,67 @@
+import math
+from core.columns import ColumnStore, CategoricalColumn
+from core.data_analyzer import DataAnalyzer
+from core.kernel import Predicate
+from core.config import settings
+
+
+def test_categorical_column_dictionary_encoding():
+    col = CategoricalColumn()
+    for value in ['Asia', 'Europe', 'Asia', None]:
+        col.append(value)
+    assert col.dictionary == ['Asia', 'Europe', 'Unknown']
+    assert list(col.codes) == [0, 1, 0, 2]
+    assert col.codes.typecode == 'B'
+    assert col.encode('Europe') == 1 and col.encode('Mars') is None
+
+def test_categorical_column_widens_codes():
+    col = CategoricalColumn()
+    for i in range(300):
+        col.append(f'v{i}')
+    assert col.codes.typecode == 'H'
+    assert col[0] == 'v0' and col[299] == 'v299'
+
+def test_column_store_missing_values():
+    store = ColumnStore.from_rows([{'Earnings_USD': 10, 'Hourly_Rate': 'bad'}, {'Job_Category': 'Design'}])
+    assert len(store) == 2
+    assert store.numeric['Earnings_USD'][0] == 10.0
+    assert math.isnan(store.numeric['Hourly_Rate'][0])
+    assert store.row(0)['Job_Category'] == 'Unknown'
+    assert store.row(1)['Job_Category'] == 'Design'
+
+def test_schema_converters_track_nulls_and_invalid():
+    store = ColumnStore.from_rows([
+        {'Job_Completed': '12', 'Earnings_USD': '1.5e3', 'Client_Rating': 'NA', 'Platform': ''},
+        {'Job_Completed': '12.5', 'Earnings_USD': 'inf', 'Client_Rating': '4.5', 'Platform': 'Fiverr'},
+        {'Job_Completed': '7.0', 'Earnings_USD': 'n/a', 'Client_Rating': 'five'},
+    ])
+    assert list(store.numeric['Earnings_USD'][:1]) == [1500.0] and store.numeric['Job_Completed'][2] == 7.0
+    # Дробное в целой колонке, бесконечность и текст — пропуски с учётом как некорректных
+    assert math.isnan(store.numeric['Job_Completed'][1]) and math.isnan(store.numeric['Earnings_USD'][1])
+    assert store.invalid == {'Job_Completed': 1, 'Earnings_USD': 1, 'Client_Rating': 1}
+    assert store.row(0)['Platform'] == 'Unknown'
+    # Дробная длительность — обычное значение, а не ошибка
+    durations = ColumnStore.from_rows([{'Job_Duration_Days': '12.5'}, {'Job_Duration_Days': '3'}])
+    assert list(durations.numeric['Job_Duration_Days']) == [12.5, 3.0] and durations.invalid == {}
+    # Строки хранилища с пропусками разбираются повторно без ложных ошибок
+    assert ColumnStore.from_rows(store).invalid == {}
+
+def test_missing_metrics_are_not_fake_zeros():
+    class MissingAnalyzer(DataAnalyzer):
+        def __init__(self, data):
+            self.data = data
+    analyzer = MissingAnalyzer([
+        {'Earnings_USD': '1000', 'Rehire_Rate': '80', 'Client_Region': 'Asia'},
+        {'Earnings_USD': 'bad', 'Rehire_Rate': '', 'Client_Region': 'Asia'},
+    ])
+    assert analyzer.aggregate('earnings', 'avg', by='region') == {'Asia': 1000.0}
+    assert analyzer.aggregate('rehire_rate', 'count') == {None: 1}
+    assert analyzer.filtered_count([Predicate('rehire_rate', '<', 50)]) == 0
+
+def test_csv_loaded_into_columns(monkeypatch):
+    monkeypatch.setattr(settings, 'snapshot_enabled', False)
+    analyzer = DataAnalyzer(settings.csv_path)
+    store = analyzer.data
+    assert len(store) == 1950
+    assert store.numeric['Earnings_USD'].typecode == 'd'
+    assert set(store.categorical['Experience_Level'].dictionary) == {'Beginner', 'Intermediate', 'Expert'}
@@ -0,0 +1,86 @@
+import csv
+import pytest
+from core.columns import CATEGORICAL_COLUMNS, NUMERIC_COLUMNS, ColumnStore
+from core.config import settings
+from core.csv_reader import UnsafeSplit, parse_parallel, parse_range, read_header, split_ranges
+from core.data_analyzer import DataAnalyzer
+
+def serial_store(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return ColumnStore.from_rows(csv.DictReader(f))
+
+def assert_same(left, right):
+    assert len(left) == len(right)
+    for name in NUMERIC_COLUMNS:
+        assert left.numeric[name].tobytes() == right.numeric[name].tobytes()
+    for name in CATEGORICAL_COLUMNS:
+        assert left.categorical[name].dictionary == right.categorical[name].dictionary
+        assert left.categorical[name].codes.tobytes() == right.categorical[name].codes.tobytes()
+
+def test_ranges_are_newline_aligned():
+    path = settings.csv_path
+    _, start = read_header(path)
+    with open(path, 'rb') as f:
+        data = f.read()
+    ranges = split_ranges(path, start, len(data), 7)
+    assert ranges[0][0] == start and ranges[-1][1] == len(data)
+    for (_, end), (next_start, _) in zip(ranges, ranges[1:]):
+        assert end == next_start and data[end - 1:end] == b'\n'
+
+def test_parallel_parse_identical_to_serial():
+    expected = serial_store(settings.csv_path)
+    assert_same(parse_parallel(settings.csv_path, None, workers=3), expected)
+
+def test_dictionary_order_follows_file(tmp_path):
+    # Новые значения появляются только в поздних частях файла и в обратном порядке
+    with open(settings.csv_path, 'r', encoding='utf-8') as f:
+        lines = f.readlines()
+    tail = [line.replace('Fiverr', 'Zeta').replace('Upwork', 'Alpha') for line in lines[1:200]]
+    path = tmp_path / 'data.csv'
+    path.write_text(''.join(lines[:800] + tail[::-1]), encoding='utf-8')
+    expected = serial_store(path)
+    assert_same(parse_parallel(str(path), None, workers=4), expected)
+
+def test_multiline_record_is_unsafe(tmp_path, monkeypatch):
+    with open(settings.csv_path, 'r', encoding='utf-8') as f:
+        lines = f.readlines()
+    broken = lines[10].replace('Data Entry', '"Data\nEntry"')
+    path = tmp_path / 'data.csv'
+    path.write_text(''.join(lines[:10] + [broken] + lines[11:300]), encoding='utf-8')
+    with pytest.raises(UnsafeSplit):
+        parse_parallel(str(path), None, workers=2)
+    # DataAnalyzer в этом случае разбирает файл последовательно
+    monkeypatch.setattr(settings, 'snapshot_enabled', False)
+    monkeypatch.setattr(settings, 'parse_workers', 2)
+    monkeypatch.setattr(settings, 'parse_parallel_min_bytes', 0)
+    analyzer = DataAnalyzer(str(path))
+    assert len(analyzer.data) == 299
+    assert 'Data\nEntry' in analyzer.data.categorical['Job_Category'].dictionary
+
+def test_range_cut_inside_quoted_field_is_unsafe(tmp_path):
+    with open(settings.csv_path, 'r', encoding='utf-8') as f:
+        lines = f.readlines()
+    # Запись в середине файла: строки 1..40, разрезанная — 29-я
+    broken = lines[29].replace('Web Development', '"Web\nDevelopment"', 1)
+    assert broken != lines[29]
+    path = tmp_path / 'data.csv'
+    path.write_bytes(''.join(lines[:29] + [broken] + lines[30:41]).encode('utf-8'))
+    fields, start = read_header(str(path))
+    data = path.read_bytes()
+    # Граница сразу после перевода строки внутри кавычек: каждая половина по отдельности выглядит целой
+    cut = data.index(b'"Web\n') + len(b'"Web\n')
+    for range_start, range_end in [(start, cut), (cut, len(data))]:
+        with pytest.raises(UnsafeSplit):
+            parse_range(str(path), range_start, range_end, fields, None)
+    # Целиком файл разбирается: запись одна, просто на двух строках файла
+    assert len(serial_store(path)) == 40
+
+def test_analyzer_uses_parallel_parse(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, 'snapshot_enabled', False)
+    monkeypatch.setattr(settings, 'parse_workers', 1)
+    serial_analyzer = DataAnalyzer(settings.csv_path)
+    monkeypatch.setattr(settings, 'parse_workers', 2)
+    monkeypatch.setattr(settings, 'parse_parallel_min_bytes', 0)
+    parallel_analyzer = DataAnalyzer(settings.csv_path)
+    assert_same(parallel_analyzer.data, serial_analyzer.data)
+    assert parallel_analyzer.income_by_region() == serial_analyzer.income_by_region()
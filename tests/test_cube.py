@@ -0,0 +1,51 @@
+import pytest
+from core.columns import ColumnStore
+from core.cube import AggregateCube
+from core.kernel import AggSpec, Predicate, scan
+from core.data_analyzer import DataAnalyzer
+from test_analyzer import TEST_DATA
+
+SPECS = [
+    AggSpec(None),
+    AggSpec('earnings', 'region'),
+    AggSpec('job_duration', 'platform'),
+    AggSpec(None, 'region', (Predicate('experience', '==', 'Expert'),)),
+    AggSpec('earnings', where=(Predicate('payment_method', '!=', 'Crypto'),)),
+    AggSpec('hourly_rate', 'category', (Predicate('region', '==', 'Mars'),)),
+]
+
+def as_tuples(groups):
+    return [(k, s.count, s.total, s.min, s.max) for k, s in groups.items()]
+
+@pytest.mark.parametrize('lazy', [False, True])
+def test_cube_matches_scan(lazy):
+    store = ColumnStore.from_rows(TEST_DATA)
+    cube = AggregateCube(store, lazy=lazy)
+    for spec, expected in zip(SPECS, scan(store, SPECS)):
+        assert as_tuples(cube.answer(spec)) == as_tuples(expected)
+
+def test_cube_rejects_numeric_predicates():
+    cube = AggregateCube(ColumnStore.from_rows(TEST_DATA))
+    assert not cube.can_answer(AggSpec(None, where=(Predicate('rehire_rate', '>', 50),)))
+    assert cube.can_answer(SPECS[3])
+
+def test_cube_patch_after_append():
+    store = ColumnStore.from_rows(TEST_DATA[:2])
+    cube = AggregateCube(store)
+    cube.answer(SPECS[3])
+    store.extend(TEST_DATA[2:])
+    cube.patch()
+    full = ColumnStore.from_rows(TEST_DATA)
+    for spec, expected in zip(SPECS, scan(full, SPECS)):
+        assert as_tuples(cube.answer(spec)) == as_tuples(expected)
+
+def test_analyzer_answers_from_cube_without_scanning():
+    class CubeAnalyzer(DataAnalyzer):
+        def __init__(self):
+            self.data = TEST_DATA[:3]
+    analyzer = CubeAnalyzer()
+    analyzer.append(TEST_DATA[3:])
+    before = analyzer.rows_scanned
+    out = analyzer.avg_income_by_category()
+    assert analyzer.rows_scanned == before
+    assert 'Design: 750.00 USD' in out
@@ -0,0 +1,50 @@
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+from core.history import message_tokens, split_turns, trim_history
+
+REPORT = 'Средний доход по регионам:\n' + ''.join(f'- Region {i}: {5000 + i}.00 USD\n' for i in range(200))
+
+
+def tool_turn(question, name, output):
+    return [
+        HumanMessage(content=question),
+        AIMessage(content='', tool_calls=[{'name': name, 'args': {}, 'id': f'call_{name}'}]),
+        ToolMessage(content=output, tool_call_id=f'call_{name}'),
+        AIMessage(content='Готово.'),
+    ]
+
+
+HISTORY = (
+    [SystemMessage(content='system')]
+    + tool_turn('Сводка по регионам', 'batch_analytics', REPORT)
+    + [HumanMessage(content='Спасибо'), AIMessage(content='Пожалуйста!')]
+    + tool_turn('А по опыту?', 'avg_income_by_experience', 'Средний доход по уровню опыта:\n- Expert: 5100.00 USD')
+)
+
+
+def tokens(messages):
+    return sum(message_tokens(m) for m in messages)
+
+
+def test_fits_budget_unchanged():
+    trimmed = trim_history(HISTORY, budget=10_000)
+    assert trimmed == HISTORY[1:]
+
+
+def test_old_tool_output_summarized_before_turns_dropped():
+    without_report = tokens(HISTORY[1:]) - message_tokens(HISTORY[3])
+    trimmed = trim_history(HISTORY, budget=without_report + 40)
+    assert len(trimmed) == len(HISTORY) - 1
+    summary = trimmed[2]
+    assert summary.tool_call_id == 'call_batch_analytics'
+    assert summary.content.startswith('Средний доход по регионам:') and 'сокращён' in summary.content
+    assert tokens(trimmed) <= without_report + 40
+    # Сокращение детерминировано: следующий ход видит тот же префикс истории
+    assert trim_history(HISTORY + [HumanMessage(content='ещё')], budget=without_report + 60)[:len(trimmed)] == trimmed
+
+
+def test_oldest_turns_dropped_last_turn_kept():
+    _, thanks, last = split_turns(HISTORY)
+    # Даже сокращённый первый ход не помещается — он отбрасывается целиком
+    assert trim_history(HISTORY, budget=tokens(thanks + last)) == thanks + last
+    assert trim_history(HISTORY, budget=0) == last
+    assert trim_history(HISTORY, budget=10_000, max_turns=1) == last
@@ -0,0 +1,103 @@
+import random
+import pytest
+from core.columns import CategoricalColumn, ColumnStore
+from core.config import settings
+from core.data_analyzer import DataAnalyzer
+from core.indexes import BitmapIndex, IndexSet, iter_bits
+from core.kernel import AggSpec, Predicate, scan
+from test_analyzer import TEST_DATA
+from test_analyzer_edge import MISSING_FIELDS
+
+class IndexedAnalyzer(DataAnalyzer):
+    def __init__(self, data):
+        self.data = data
+
+@pytest.fixture(scope='module')
+def store():
+    return DataAnalyzer(settings.csv_path).data
+
+WHERE = [
+    (Predicate('rehire_rate', '>', 50.0),),
+    (Predicate('rehire_rate', '<=', 50),),
+    (Predicate('job_completed', '<', 100), Predicate('experience', '==', 'Expert')),
+    (Predicate('experience', '==', 'Expert'), Predicate('region', '==', 'Asia'), Predicate('rehire_rate', '>', 70)),
+    (Predicate('region', '!=', 'Asia'), Predicate('hourly_rate', '>=', 50.5)),
+    (Predicate('job_duration', '==', 30),),
+    (Predicate('client_rating', '!=', 4.5),),
+    (Predicate('region', '==', 'Atlantis'),),
+    (Predicate('region', '!=', 'Atlantis'),),
+    (Predicate('earnings', '>', float('nan')),),
+    (Predicate('earnings', '!=', float('nan')),),
+]
+
+@pytest.mark.parametrize('where', WHERE)
+@pytest.mark.parametrize('metric,by', [(None, None), ('earnings', None), ('hourly_rate', 'region'), (None, 'experience')])
+def test_index_answer_identical_to_scan(store, where, metric, by):
+    spec = AggSpec(metric, by, where)
+    (expected,) = scan(store, [spec])
+    answer = IndexSet(store).answer(spec)
+    assert list(answer) == list(expected)
+    for key, stats in expected.items():
+        assert (answer[key].count, answer[key].total, answer[key].min, answer[key].max) == \
+            (stats.count, stats.total, stats.min, stats.max)
+
+def test_count_is_binary_search(store):
+    indexes = IndexSet(store)
+    assert indexes.count((Predicate('rehire_rate', '>', 50.0),)) == sum(1 for v in store.numeric['Rehire_Rate'] if v > 50)
+    # Одно числовое условие не строит битовых масок
+    assert not indexes._bitmaps
+
+def test_missing_values_follow_metric_semantics():
+    store = ColumnStore.from_rows(MISSING_FIELDS)
+    for where in [(Predicate('earnings', '>=', 0),), (Predicate('hourly_rate', '<', 1e9),)]:
+        spec = AggSpec(None, where=where)
+        assert IndexSet(store).answer(spec).keys() == scan(store, [spec])[0].keys()
+
+def test_indexes_follow_append():
+    analyzer = IndexedAnalyzer(TEST_DATA[:2])
+    where = [Predicate('experience', '==', 'Expert'), Predicate('rehire_rate', '>', 10)]
+    before = analyzer.filtered_count(where)
+    analyzer.append(TEST_DATA[2:])
+    reference = IndexedAnalyzer(TEST_DATA)
+    reference._indexes = None
+    assert analyzer.filtered_count(where) == reference.filtered_count(where) > before
+    assert analyzer.filtered_avg('earnings', where) == reference.filtered_avg('earnings', where)
+
+def test_sorted_index_merges_appended_rows(store):
+    rows = list(store)
+    random.Random(7).shuffle(rows)
+    head = ColumnStore.from_rows(rows[:1000])
+    indexes = IndexSet(head)
+    index = indexes.sorted('rehire_rate')
+    for start, end in [(1000, 1001), (1001, 1500), (1500, len(rows))]:
+        head.extend(rows[start:end])
+        # Индекс дополняется на месте, а не строится заново, и совпадает с построенным с нуля
+        assert indexes.sorted('rehire_rate') is index
+        fresh = IndexSet(ColumnStore.from_rows(rows[:end])).sorted('rehire_rate')
+        assert (index.values, index.rows, index.size) == (fresh.values, fresh.rows, fresh.size)
+
+def test_filtered_api(store):
+    analyzer = IndexedAnalyzer(store)
+    where = [Predicate('experience', '==', 'Expert'), Predicate('region', '==', 'Asia'), Predicate('rehire_rate', '>', 70)]
+    rows = [row for row in store if row['Experience_Level'] == 'Expert' and row['Client_Region'] == 'Asia' and row['Rehire_Rate'] > 70]
+    assert analyzer.filtered_count(where) == len(rows)
+    assert analyzer.filtered_avg('earnings', where) == sum(r['Earnings_USD'] for r in rows) / len(rows)
+    assert analyzer.filtered_avg('earnings', [Predicate('region', '==', 'Atlantis')]) is None
+    scanned = analyzer.rows_scanned
+    analyzer.percent_high_rehire(threshold=65.5)
+    assert analyzer.rows_scanned == scanned
+    with pytest.raises(ValueError):
+        analyzer.filtered_count([Predicate('salary', '>', 1)])
+
+def test_bitmap_wide_codes():
+    column = CategoricalColumn()
+    rng = random.Random(3)
+    values = [f'v{rng.randrange(300)}' for _ in range(2000)]
+    for value in values:
+        column.append(value)
+    assert column.codes.typecode == 'H'
+    index = BitmapIndex()
+    index.patch(column, 1000)
+    index.patch(column, 2000)
+    code = column.encode(values[1500])
+    assert list(iter_bits(index.bitmaps[code])) == [i for i, v in enumerate(values) if v == values[1500]]
@@ -0,0 +1,93 @@
+import time
+import pytest
+from core.config import settings
+from core.data_analyzer import DataAnalyzer
+
+METHODS = ('income_by_region', 'avg_income_by_category', 'percent_high_rehire', 'top5_regions_by_experts')
+
+@pytest.fixture
+def lines():
+    with open(settings.csv_path, 'r', encoding='utf-8') as f:
+        return f.readlines()
+
+def write(path, lines, mode='w'):
+    with open(path, mode, encoding='utf-8') as f:
+        f.writelines(lines)
+
+def outputs(analyzer):
+    return [getattr(analyzer, name)() for name in METHODS]
+
+def expected(tmp_path, lines):
+    path = tmp_path / 'expected.csv'
+    write(path, lines)
+    return outputs(DataAnalyzer(str(path)))
+
+def test_ingest_reads_only_appended_rows(tmp_path, lines):
+    path = tmp_path / 'data.csv'
+    write(path, lines[:1001])
+    analyzer = DataAnalyzer(str(path))
+    before = outputs(analyzer)
+    assert analyzer.ingest() == 0
+    write(path, lines[1001:1101], 'a')
+    scanned = analyzer.rows_scanned
+    assert analyzer.ingest() == 100
+    assert len(analyzer.data) == 1100
+    assert outputs(analyzer) == expected(tmp_path, lines[:1101]) != before
+    # Новые строки досчитаны в куб, полного прохода по данным не было
+    assert analyzer.rows_scanned - scanned <= 2 * 1100
+
+def test_incomplete_last_line_waits(tmp_path, lines):
+    path = tmp_path / 'data.csv'
+    write(path, lines[:11])
+    analyzer = DataAnalyzer(str(path))
+    write(path, [lines[11][:10]], 'a')
+    assert analyzer.ingest() == 0
+    write(path, [lines[11][10:]], 'a')
+    assert analyzer.ingest() == 1
+    assert outputs(analyzer) == expected(tmp_path, lines[:12])
+
+def test_truncated_or_rewritten_file_reloads(tmp_path, lines):
+    path = tmp_path / 'data.csv'
+    write(path, lines[:101])
+    analyzer = DataAnalyzer(str(path))
+    write(path, lines[:51])
+    assert analyzer.ingest() == 50
+    assert outputs(analyzer) == expected(tmp_path, lines[:51])
+    # Тот же размер, другое содержимое: заметит отпечаток прочитанных байт
+    rewritten = [lines[0]] + [line.replace('Beginner', 'Beginnerx')[:-2] + '\n' if 'Beginner' in line else line for line in lines[1:51]]
+    write(path, rewritten)
+    assert analyzer.ingest() == 50
+    assert outputs(analyzer) == expected(tmp_path, rewritten)
+
+def test_ingest_after_snapshot_load(tmp_path, lines):
+    path = tmp_path / 'data.csv'
+    write(path, lines[:201])
+    DataAnalyzer(str(path))
+    warm = DataAnalyzer(str(path))
+    assert warm.data.mapped is not None
+    write(path, lines[201:301], 'a')
+    assert warm.ingest() == 100
+    assert outputs(warm) == expected(tmp_path, lines[:301])
+
+def test_ingest_streaming(tmp_path, lines):
+    path = tmp_path / 'data.csv'
+    write(path, lines[:301])
+    analyzer = DataAnalyzer(str(path), streaming=True)
+    write(path, lines[301:401], 'a')
+    assert analyzer.ingest() == 100
+    assert analyzer.row_count == 400
+    assert outputs(analyzer) == expected(tmp_path, lines[:401])
+
+def test_tail_mode(tmp_path, lines):
+    path = tmp_path / 'data.csv'
+    write(path, lines[:101])
+    analyzer = DataAnalyzer(str(path))
+    analyzer.start_tail(interval=0.02)
+    try:
+        write(path, lines[101:121], 'a')
+        deadline = time.monotonic() + 5
+        while len(analyzer.data) < 120 and time.monotonic() < deadline:
+            time.sleep(0.02)
+    finally:
+        analyzer.stop_tail()
+    assert len(analyzer.data) == 120
@@ -0,0 +1,47 @@
+import pytest
+from core.kernel import AggSpec, Predicate
+from core.data_analyzer import DataAnalyzer
+from test_analyzer import TEST_DATA
+
+class KernelAnalyzer(DataAnalyzer):
+    def __init__(self, data):
+        self.data = data
+
+@pytest.fixture
+def analyzer():
+    return KernelAnalyzer(TEST_DATA)
+
+def test_aggregate_avg_by_group(analyzer):
+    out = analyzer.aggregate('earnings', 'avg', by='region')
+    assert out == {'RU': 1100.0, 'US': 800.0, 'IN': 500.0}
+
+def test_aggregate_with_filter(analyzer):
+    out = analyzer.aggregate(None, 'count', by='region', where=[Predicate('experience', '==', 'Expert')])
+    assert out == {'RU': 2}
+    out = analyzer.aggregate('hourly_rate', 'max', where=[Predicate('rehire_rate', '>', 20)])
+    assert out == {None: 60.0}
+
+def test_aggregate_unknown_metric(analyzer):
+    with pytest.raises(ValueError):
+        analyzer.aggregate('salary')
+
+def test_plan_batch_deduplicates(analyzer):
+    specs = analyzer.plan_batch([
+        ('avg_income_by_category', {}),
+        ('avg_hourly_rate_by', {'by': 'category'}),
+        ('avg_hourly_rate_by', {'by': 'category'}),
+        ('unknown_method', {}),
+    ])
+    assert specs == [AggSpec('earnings', 'category'), AggSpec('hourly_rate', 'category')]
+
+def test_fused_batch_scans_once(monkeypatch):
+    # Без индексов порог percent_high_rehire считается проходом по строкам — он должен быть один
+    monkeypatch.setattr('core.data_analyzer.settings.index_enabled', False)
+    analyzer = KernelAnalyzer(TEST_DATA)
+    calls = [(name, {}) for name in ('income_by_region', 'avg_job_duration_all', 'percent_high_rehire')]
+    expected = [getattr(analyzer, name)() for name, _ in calls]
+    before = analyzer.rows_scanned
+    with analyzer.fused(calls):
+        results = [getattr(analyzer, name)() for name, _ in calls]
+    assert results == expected
+    assert analyzer.rows_scanned - before == len(TEST_DATA)
@@ -0,0 +1,21 @@
+import pytest
+from core.config import settings
+from core.data_analyzer import DataAnalyzer, LazyDataAnalyzer
+
+def test_lazy_analyzer_loads_on_first_use():
+    lazy = LazyDataAnalyzer(settings.csv_path)
+    assert not lazy.loaded
+    assert lazy.income_by_region() == DataAnalyzer(settings.csv_path).income_by_region()
+    assert lazy.loaded and lazy.load_seconds is not None
+
+def test_lazy_analyzer_preload_in_background():
+    lazy = LazyDataAnalyzer(settings.csv_path)
+    lazy.preload()
+    assert isinstance(lazy.get(), DataAnalyzer)
+    assert len(lazy.data) == 1950
+
+def test_lazy_analyzer_reports_load_error(tmp_path):
+    lazy = LazyDataAnalyzer(str(tmp_path / 'missing.csv'))
+    lazy.preload()
+    with pytest.raises(RuntimeError):
+        lazy.get()
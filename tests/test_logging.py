@@ -0,0 +1,48 @@
+import logging, logging.handlers, queue, threading
+from core import logger as log_setup
+
+
+class Remember(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.lines = []
+
+    def emit(self, record):
+        self.lines.append(self.format(record))
+
+
+class Traced:
+    """Аргумент лога, который запоминает, в каком потоке его отформатировали."""
+    thread = None
+
+    def __str__(self):
+        Traced.thread = threading.current_thread()
+        return 'traced'
+
+
+def test_records_routed_and_formatted_in_listener_thread():
+    log_queue = queue.SimpleQueue()
+    first, second = Remember(), Remember()
+    second.setLevel(logging.WARNING)
+    listener = log_setup._RoutingListener(log_queue, {'a': [first], 'b': [second]})
+    handler = log_setup._LazyQueueHandler(log_queue)
+    listener.start()
+    try:
+        for name in ('a', 'b'):
+            record = logging.LogRecord(name, logging.INFO, __file__, 1, 'значение %s, %d', (Traced(), 7), None)
+            handler.handle(record)
+    finally:
+        listener.stop()
+    assert first.lines == ['значение traced, 7'] and second.lines == []
+    assert Traced.thread is not threading.current_thread()
+
+
+def test_setup_logging_switches_between_queue_and_sync_handlers():
+    main_logger = logging.getLogger('main_logger')
+    kinds = lambda: {type(h) for h in main_logger.handlers}
+    log_setup.setup_logging()
+    assert log_setup._LazyQueueHandler in kinds() and logging.handlers.TimedRotatingFileHandler not in kinds()
+    log_setup.flush_logging()
+    assert log_setup._LazyQueueHandler not in kinds() and logging.handlers.TimedRotatingFileHandler in kinds()
+    log_setup.setup_logging()
+    assert log_setup._LazyQueueHandler in kinds()
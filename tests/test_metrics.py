@@ -0,0 +1,77 @@
+import asyncio, http.client
+from langchain_core.messages import AIMessage
+from core.metrics import Metrics, Sample, Tracer, metrics, tracer
+import main, server
+from bench.load import StubModel
+from tests.test_agent import FakeToolModel, tool_call
+from tests.test_server import call, serve
+
+
+def shape(span):
+    return (span['name'], [shape(child) for child in span.get('children', [])])
+
+
+def test_render_prometheus_text():
+    registry = Metrics()
+    spans = Tracer(registry)
+    with spans.span('analyzer', metric='analyzer_method_seconds', method='query'):
+        pass
+    registry.observe('analyzer_method_seconds', 0.3, method='query')
+    registry.inc('llm_tokens_total', 120)
+    registry.add_collector(lambda: [Sample('analyzer_cache_hits_total', {}, 7)])
+    lines = registry.render().splitlines()
+    assert '# TYPE analyzer_method_seconds histogram' in lines
+    assert 'analyzer_method_seconds_bucket{method="query",le="0.25"} 1' in lines
+    assert 'analyzer_method_seconds_bucket{method="query",le="0.5"} 2' in lines
+    assert 'analyzer_method_seconds_bucket{method="query",le="+Inf"} 2' in lines
+    assert 'analyzer_method_seconds_count{method="query"} 2' in lines
+    assert 'llm_tokens_total 120' in lines and 'analyzer_cache_hits_total 7' in lines
+    assert registry.histogram('analyzer_method_seconds', method='query').quantile(0.99) == 0.5
+    assert len(spans.traces) == 1
+
+
+def test_turn_spans_nest_trim_llm_tool_analyzer():
+    model = FakeToolModel(messages=iter([
+        tool_call('query', {'metric': 'earnings', 'group_by': 'region'}),
+        tool_call('batch_analytics', {'methods': [{'method': 'income_by_region'}, {'method': 'percent_high_rehire'}]}),
+        AIMessage(content='Отчёт готов'), AIMessage(content='Привет!'),
+    ]))
+    agent = main.LLMAgent(model, 'system', main.ALL_TOOLS)
+    before = metrics.histogram('tool_seconds', tool='query')
+    before = before.count if before is not None else 0
+    assert agent.ask('Доход по регионам').answer.startswith('Среднее earnings по region')
+    turn = tracer.recent(1)[0]
+    assert shape(turn) == ('turn', [
+        ('trim', []), ('llm', []), ('tool', [('analyzer', [])]),
+    ])
+    assert turn['children'][2]['attrs'] == {'tool': 'query'}
+    assert turn['children'][2]['children'][0]['attrs'] == {'method': 'query'}
+    assert metrics.histogram('tool_seconds', tool='query').count == before + 1
+    # Методы batch_analytics выполняются в пуле потоков, но остаются внутри интервала инструмента
+    assert agent.ask('Отчёт по регионам и повторным наймам').answer == 'Отчёт готов'
+    turn = tracer.recent(1)[0]
+    (tool,) = [child for child in turn['children'] if child['name'] == 'tool']
+    assert sorted(c['attrs']['method'] for c in tool['children']) == ['income_by_region', 'percent_high_rehire']
+    assert asyncio.run(agent.ainvoke('Привет')) == 'Привет!'
+    assert shape(tracer.recent(1)[0]) == ('turn', [('trim', []), ('llm', [])])
+    assert tracer.recent(1)[0]['attrs'] == {'mode': 'stream'}
+
+
+def test_metrics_and_traces_endpoints():
+    app = server.build_app(StubModel(latency=0), 'system', answer_cache=False)
+    httpd = serve(server.make_server(app, port=0))
+    try:
+        conn = http.client.HTTPConnection(*httpd.server_address[:2], timeout=30)
+        assert call(conn, 'POST', '/v1/chat', {'message': 'Средний доход по регионам'})[0] == 200
+        conn.request('GET', '/metrics')
+        response = conn.getresponse()
+        text = response.read().decode('utf-8')
+        assert response.status == 200 and response.getheader('Content-Type').startswith('text/plain; version=0.0.4')
+        assert '# TYPE turn_seconds histogram' in text and 'tool_seconds_bucket{tool="query",le="+Inf"}' in text
+        assert 'analyzer_rows_scanned_total' in text
+        conn.request('GET', '/v1/traces')
+        response = conn.getresponse()
+        assert response.status == 200 and b'"turn"' in response.read()
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
@@ -0,0 +1,101 @@
+import csv, os
+import pytest
+from core.config import settings
+from core.data_analyzer import DataAnalyzer
+from core.kernel import Predicate
+from core.partitions import discover, partition_keys
+
+METHODS = ('income_by_region', 'avg_income_by_category', 'percent_high_rehire', 'avg_income_by_platform')
+
+@pytest.fixture
+def source():
+    with open(settings.csv_path, 'r', encoding='utf-8') as f:
+        reader = csv.DictReader(f)
+        return reader.fieldnames, list(reader)
+
+def write_csv(path, fields, rows):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=fields, lineterminator='\n')
+        writer.writeheader()
+        writer.writerows(rows)
+
+@pytest.fixture
+def hive(tmp_path, source):
+    """Партиции Platform=<платформа>/part.csv без колонки Platform в самих файлах."""
+    fields, rows = source
+    root = tmp_path / 'hive'
+    ordered = []
+    for platform in sorted({row['Platform'] for row in rows}):
+        part = [row for row in rows if row['Platform'] == platform]
+        write_csv(str(root / f'Platform={platform}' / 'part.csv'),
+                  [f for f in fields if f != 'Platform'], [{k: v for k, v in row.items() if k != 'Platform'} for row in part])
+        ordered += part
+    # Эталон — те же строки одним файлом в порядке партиций
+    write_csv(str(tmp_path / 'flat.csv'), fields, ordered)
+    return root
+
+def test_partition_keys_and_discovery(hive):
+    files = discover(str(hive))
+    assert len(files) == 5 and all(f.endswith('part.csv') for f in files)
+    assert partition_keys(files[0], str(hive)) == {'platform': 'Fiverr'}
+    assert partition_keys('d/month=2024-01/x.csv', 'd') == {'month': '2024-01'}
+
+def test_results_match_single_file(hive, tmp_path):
+    partitioned = DataAnalyzer(str(hive))
+    flat = DataAnalyzer(str(tmp_path / 'flat.csv'))
+    for name in METHODS:
+        assert getattr(partitioned, name)() == getattr(flat, name)()
+    assert partitioned.aggregate('earnings', by='platform') == flat.aggregate('earnings', by='platform')
+    assert len(partitioned.data) == len(flat.data)
+
+def test_partitions_load_lazily_and_are_pruned(hive, tmp_path):
+    analyzer = DataAnalyzer(str(hive))
+    partitions = analyzer._partitions.partitions
+    assert not any(p.analyzer for p in partitions.values())
+    flat = DataAnalyzer(str(tmp_path / 'flat.csv'))
+    where = [Predicate('platform', '==', 'Upwork')]
+    assert analyzer.aggregate('earnings', where=where) == flat.aggregate('earnings', where=where)
+    assert [os.path.basename(os.path.dirname(p.path)) for p in partitions.values() if p.analyzer] == ['Platform=Upwork']
+    assert analyzer._partitions.pruned == 4
+
+def test_only_changed_partition_is_recomputed(hive, source, monkeypatch):
+    # Без куба каждый агрегат партиции — проход по её строкам, так виден кэш партиций
+    monkeypatch.setattr(settings, 'cube_enabled', False)
+    analyzer = DataAnalyzer(str(hive))
+    first = analyzer.aggregate('earnings', by='region')
+    scanned = analyzer.rows_scanned
+    assert scanned == 1950
+    # Повторный запрос — из кэша агрегатов партиций, без проходов по строкам
+    assert analyzer.aggregate('earnings', by='region') == first
+    assert analyzer.rows_scanned == scanned
+    partitions = list(analyzer._partitions.partitions.values())
+    fields, rows = source
+    with open(partitions[0].path, 'a', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=[x for x in fields if x != 'Platform'], lineterminator='\n', extrasaction='ignore')
+        writer.writerows(rows[:3])
+    before = [p.rows_scanned for p in partitions]
+    version = analyzer.data_version
+    merged = analyzer.data
+    # Склейка партиций кэшируется, пока ни одна из них не изменилась
+    assert analyzer.data is merged and len(merged) == 1950
+    assert analyzer.ingest() == 3
+    assert analyzer.data is not merged and len(analyzer.data) == 1953
+    assert analyzer.data_version == version + 1
+    analyzer.aggregate('earnings', by='region')
+    after = [p.rows_scanned for p in partitions]
+    assert after[1:] == before[1:] and after[0] > before[0]
+    counts = analyzer.aggregate('earnings', 'count', by='platform')
+    assert counts['Fiverr'] == len([r for r in rows if r['Platform'] == 'Fiverr']) + 3
+
+def test_glob_and_new_partition(hive, source):
+    analyzer = DataAnalyzer(str(hive / 'Platform=*' / '*.csv'))
+    assert len(analyzer._partitions.partitions) == 5
+    fields, rows = source
+    merged = analyzer.data
+    write_csv(str(hive / 'Platform=Toptal' / 'part.csv'), fields, rows[:10])
+    analyzer.ingest()
+    assert analyzer.aggregate('earnings', 'count', by='platform')['Toptal'] == 10
+    # Файл Toptal перезаписан десятью строками — склейка пересобрана
+    replaced = sum(1 for row in rows if row['Platform'] == 'Toptal')
+    assert analyzer.data is not merged and len(analyzer.data) == len(merged) - replaced + 10
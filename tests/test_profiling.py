@@ -0,0 +1,93 @@
+import cProfile, os, threading, time
+from langchain_core.messages import AIMessage
+from langchain_core.tools import tool
+from core.profiling import SessionProfiler, folded_time, func_label
+import main
+from tests.test_agent import FakeToolModel, tool_call
+
+
+def leaf():
+    time.sleep(0.01)
+
+
+def middle():
+    leaf()
+
+
+def outer():
+    leaf()
+    middle()
+
+
+def test_folded_time_splits_shared_callee_by_caller():
+    profiler = cProfile.Profile()
+    profiler.enable()
+    outer()
+    profiler.disable()
+    profiler.create_stats()
+    folded = folded_time(profiler.stats)
+    label = {func[2]: func_label(func) for func in profiler.stats}
+    sleeps = {stack: us for stack, us in folded.items() if stack.endswith('time.sleep>')}
+    # sleep вызывается из одной функции leaf, но по двум путям — каждый получает свою долю
+    assert set(sleeps) == {
+        ';'.join([label['outer'], label['leaf'], '<built-in method time.sleep>']),
+        ';'.join([label['outer'], label['middle'], label['leaf'], '<built-in method time.sleep>']),
+    }
+    assert all(8000 < us < 15000 for us in sleeps.values()), sleeps
+
+
+def allocate(store):
+    store.append([bytearray(1024) for _ in range(64)])
+
+
+def test_session_profiler_per_turn_threads_and_memory(tmp_path):
+    profiler = SessionProfiler(str(tmp_path), top=5, frames=8)
+    profiler.start()
+    kept = []
+    try:
+        with profiler.turn('первый'):
+            worker = threading.Thread(target=outer)
+            worker.start()
+            worker.join()
+            allocate(kept)
+        # Между ходами — не в профиле
+        middle()
+        with profiler.turn('второй'):
+            leaf()
+    finally:
+        summary = profiler.close()
+    first, second = profiler.turns
+    names = lambda turn: {func[2] for func in turn.stats}
+    assert {'outer', 'middle', 'leaf'} <= names(first)
+    assert 'middle' not in names(second) and 'leaf' in names(second)
+    where = f'tests/test_profiling.py:{allocate.__code__.co_firstlineno + 1}'
+    assert first.net_bytes >= 64 * 1024 and first.alloc_lines[where] >= 64 * 1024
+    assert any(stack.endswith(where) for stack in first.alloc)
+    files = set(os.listdir(profiler.out_dir))
+    assert {'turn-001.pstats', 'turn-001.cpu.folded', 'turn-001.alloc.folded', 'session.cpu.folded'} <= files
+    assert 'первый' in summary and 'outer (' in summary and where in summary
+
+
+def test_profiled_turn_with_tool_on_worker_thread(tmp_path):
+    threads = []
+
+    @tool
+    def regions() -> str:
+        """Средний доход по регионам."""
+        threads.append(threading.current_thread())
+        return main.analyzer.income_by_region()
+
+    profiler = SessionProfiler(str(tmp_path), top=5, frames=0)
+    profiler.start()
+    try:
+        # Второй ход: на Python 3.12+ повторный enable() не должен конфликтовать с профайлером потоков
+        for question in ('Доход по регионам', 'Ещё раз доход по регионам'):
+            model = FakeToolModel(messages=iter([tool_call('regions'), AIMessage(content='Готово')]))
+            agent = main.LLMAgent(model, 'system', [regions])
+            with profiler.turn(question):
+                assert agent.ask(question).answer == 'Готово'
+    finally:
+        profiler.close()
+    assert threads and all(thread is not threading.main_thread() for thread in threads)
+    for turn in profiler.turns:
+        assert 'regions' in {func[2] for func in turn.stats}
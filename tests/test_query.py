@@ -0,0 +1,66 @@
+import pytest
+from pydantic import ValidationError
+from core.config import settings
+from core.data_analyzer import DataAnalyzer
+from core.kernel import AggSpec, Predicate, validate
+from core.query import EMPTY_MESSAGE, compile_query
+from core.schemas import QueryInput
+
+EXPERTS_IN_ASIA = [
+    {'field': 'experience', 'op': '==', 'value': 'Expert'},
+    {'field': 'region', 'op': '==', 'value': 'Asia'},
+    {'field': 'rehire_rate', 'op': '>', 'value': 70},
+]
+
+@pytest.fixture(scope='module')
+def analyzer():
+    return DataAnalyzer(settings.csv_path)
+
+def test_compile_to_kernel_spec():
+    plan = compile_query(QueryInput(metric='earnings', group_by='region', filters=EXPERTS_IN_ASIA, top_k=3))
+    assert plan.spec == AggSpec('earnings', 'region', (
+        Predicate('experience', '==', 'Expert'), Predicate('region', '==', 'Asia'), Predicate('rehire_rate', '>', 70.0)))
+    assert (plan.aggregate, plan.top_k) == ('avg', 3)
+
+@pytest.mark.parametrize('params', [
+    {'metric': 'salary'},
+    {'metric': 'earnings', 'aggregate': 'median'},
+    {'metric': 'earnings', 'group_by': 'country'},
+    {'metric': 'earnings', 'filters': [{'field': 'region', 'op': 'like', 'value': 'A'}]},
+    {'aggregate': 'count', 'filters': [{'field': 'experience', 'op': '<', 'value': 'Expert'}]},
+    {'aggregate': 'count', 'filters': [{'field': 'region', 'op': '>=', 'value': 'Asia'}]},
+    {'metric': 'earnings', 'top_k': 0},
+    {'metric': 'earnings', 'by': 'region'},
+])
+def test_schema_is_strict(params):
+    with pytest.raises(ValidationError):
+        QueryInput(**params)
+
+def test_compile_errors():
+    with pytest.raises(ValueError):
+        compile_query(QueryInput(aggregate='avg'))
+    # Коды категорий не упорядочены по смыслу: ядро тоже не принимает сравнение измерений на порядок
+    with pytest.raises(ValueError):
+        validate(AggSpec(None, where=(Predicate('experience', '<', 'Expert'),)))
+    with pytest.raises(ValueError):
+        compile_query(QueryInput(metric='earnings', filters=[{'field': 'rehire_rate', 'op': '>', 'value': 'много'}]))
+
+def test_presets_match_query(analyzer):
+    # Пресет и query считают один и тот же агрегат ядра
+    by_category = analyzer.query('earnings', group_by='category').splitlines()[1:]
+    assert by_category == analyzer.avg_income_by_category().replace(' USD', '').splitlines()[1:]
+    top = analyzer.query(aggregate='count', group_by='region', filters=[{'field': 'experience', 'op': '==', 'value': 'Expert'}], top_k=5)
+    assert top.splitlines()[1:] == analyzer.top5_regions_by_experts().splitlines()[1:]
+
+def test_filtered_query(analyzer):
+    rows = [row for row in analyzer.data if row['Experience_Level'] == 'Expert' and row['Client_Region'] == 'Asia' and row['Rehire_Rate'] > 70]
+    assert analyzer.query(aggregate='count', filters=EXPERTS_IN_ASIA) == \
+        f'Количество фрилансеров при experience == Expert, region == Asia, rehire_rate > 70: {len(rows)}'
+    assert analyzer.query('earnings', 'max', filters=EXPERTS_IN_ASIA).endswith(f': {max(r["Earnings_USD"] for r in rows):.2f}')
+    assert analyzer.query('earnings', filters=[{'field': 'region', 'op': '==', 'value': 'Atlantis'}]) == EMPTY_MESSAGE
+
+def test_query_in_fused_batch(analyzer):
+    calls = [('query', {'metric': 'hourly_rate', 'group_by': 'platform', 'filters': EXPERTS_IN_ASIA}), ('income_by_region', {})]
+    with analyzer.fused(calls) as specs:
+        assert specs[0] == compile_query(QueryInput(**calls[0][1])).spec
+        assert len(specs) == 2
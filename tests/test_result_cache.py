@@ -0,0 +1,60 @@
+from core.cache import ResultCache
+from core.config import settings
+from core.data_analyzer import DataAnalyzer
+from test_analyzer import TEST_DATA
+
+class CachedAnalyzer(DataAnalyzer):
+    def __init__(self, data):
+        self.data = data
+
+def test_repeated_call_is_served_from_cache():
+    analyzer = CachedAnalyzer(TEST_DATA)
+    first = analyzer.income_by_region()
+    scanned = analyzer.rows_scanned
+    assert analyzer.income_by_region() == first
+    assert analyzer.result_cache.hits == 1 and analyzer.result_cache.misses == 1
+    assert analyzer.rows_scanned == scanned
+
+def test_arguments_are_normalized():
+    analyzer = CachedAnalyzer(TEST_DATA)
+    analyzer.percent_high_rehire()
+    analyzer.percent_high_rehire(50.0)
+    analyzer.percent_high_rehire(threshold=50.0)
+    analyzer.avg_hourly_rate_by()
+    analyzer.avg_hourly_rate_by(by='category')
+    assert analyzer.result_cache.misses == 2 and analyzer.result_cache.hits == 3
+    # 50 и 50.0 печатаются по-разному, поэтому это разные записи
+    assert analyzer.percent_high_rehire(50) != analyzer.percent_high_rehire(50.0)
+
+def test_cache_invalidated_when_data_changes():
+    analyzer = CachedAnalyzer(TEST_DATA[:2])
+    before = analyzer.avg_income_by_category()
+    analyzer.append(TEST_DATA[2:])
+    after = analyzer.avg_income_by_category()
+    assert before != after
+    assert analyzer.result_cache.invalidations == 1
+    analyzer.data = TEST_DATA[:2]
+    assert analyzer.avg_income_by_category() == before
+
+def test_lru_eviction(monkeypatch):
+    monkeypatch.setattr(settings, 'result_cache_size', 2)
+    analyzer = CachedAnalyzer(TEST_DATA)
+    for by in ('category', 'region', 'platform', 'category'):
+        analyzer.avg_client_rating_by(by)
+    stats = analyzer.result_cache.stats()
+    assert stats['evictions'] == 2 and stats['size'] == 2 and stats['hits'] == 0
+
+def test_cache_disabled(monkeypatch):
+    monkeypatch.setattr(settings, 'result_cache_size', 0)
+    analyzer = CachedAnalyzer(TEST_DATA)
+    analyzer.income_by_region()
+    assert analyzer.result_cache is None
+
+def test_result_cache_move_to_end():
+    cache = ResultCache(2)
+    cache.get_or_compute('a', 1, lambda: 1)
+    cache.get_or_compute('b', 1, lambda: 2)
+    cache.get_or_compute('a', 1, lambda: 0)
+    cache.get_or_compute('c', 1, lambda: 3)
+    assert cache.get_or_compute('a', 1, lambda: 0) == 1
+    assert cache.get_or_compute('b', 1, lambda: 0) == 0
@@ -0,0 +1,83 @@
+import http.client, json, threading
+import pytest
+import server
+from bench.load import StubModel, UnixHTTPConnection, percentile, run_load
+
+@pytest.fixture
+def app():
+    return server.build_app(StubModel(latency=0), 'system', answer_cache=False)
+
+def serve(httpd):
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd
+
+@pytest.fixture
+def tcp(app):
+    httpd = serve(server.make_server(app, port=0))
+    yield lambda: http.client.HTTPConnection(*httpd.server_address[:2], timeout=30)
+    httpd.shutdown()
+    httpd.server_close()
+
+def call(conn, method, path, body=None):
+    conn.request(method, path, body=json.dumps(body) if body is not None else None)
+    response = conn.getresponse()
+    return response.status, json.loads(response.read())
+
+def test_sessions_share_agent_and_keep_history(app, tcp):
+    conn = tcp()
+    status, first = call(conn, 'POST', '/v1/chat', {'message': 'Средний доход по регионам'})
+    assert status == 200 and first['answer'].startswith('Среднее earnings по region')
+    thread_id = first['thread_id']
+    # Тот же keep-alive коннект, та же сессия
+    status, second = call(conn, 'POST', '/v1/chat', {'message': 'Сколько экспертов по платформам', 'thread_id': thread_id})
+    assert status == 200 and second['thread_id'] == thread_id
+    status, other = call(conn, 'POST', '/v1/chat', {'message': 'Средний доход по регионам'})
+    assert other['thread_id'] != thread_id
+    history = app.agent._agent.get_state({'configurable': {'thread_id': thread_id}}).values['messages']
+    assert [m.content for m in history if m.type == 'human'] == ['Средний доход по регионам', 'Сколько экспертов по платформам']
+    status, health = call(conn, 'GET', '/health')
+    assert status == 200 and health['sessions'] == 0 and health['requests'] == 3
+
+def test_session_locks_live_while_in_flight(app, monkeypatch):
+    for i in range(20):
+        app.chat('Средний доход по регионам', thread_id=f'client-{i}')
+    # Замки завершённых сессий не копятся
+    assert not app._sessions and app.health()['sessions'] == 0
+    ask, started, release = app.agent.ask, threading.Event(), threading.Event()
+    def blocking_ask(message, thread_id):
+        started.set()
+        release.wait(10)
+        return ask(message, thread_id=thread_id)
+    monkeypatch.setattr(app.agent, 'ask', blocking_ask)
+    worker = threading.Thread(target=app.chat, args=('Средний доход по регионам', 'busy'))
+    worker.start()
+    assert started.wait(10)
+    assert app.health()['sessions'] == 1
+    release.set()
+    worker.join(10)
+    assert not app._sessions and app.health()['requests'] == 21
+
+def test_tools_and_errors(tcp):
+    conn = tcp()
+    status, result = call(conn, 'POST', '/v1/tools/income_by_region', {})
+    assert status == 200 and result['result'] == server.main.analyzer.income_by_region()
+    assert call(conn, 'POST', '/v1/tools/query', {'metric': 'salary'})[0] == 400
+    assert call(conn, 'POST', '/v1/tools/nope', {})[0] == 404
+    assert call(conn, 'POST', '/v1/chat', {'message': ''})[0] == 400
+    assert call(conn, 'POST', '/v1/chat', [1, 2])[0] == 400
+    assert call(conn, 'GET', '/missing')[0] == 404
+
+def test_unix_socket_and_load(app, tmp_path):
+    path = str(tmp_path / 'analytics.sock')
+    httpd = serve(server.make_server(app, unix=path))
+    try:
+        report = run_load(lambda: UnixHTTPConnection(path), requests=12, concurrency=3)
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+    assert report['errors'] == 0 and report['requests'] == 12
+    assert report['p50_ms'] <= report['p99_ms'] <= report['max_ms']
+
+def test_percentile():
+    samples = list(range(1, 101))
+    assert (percentile(samples, 50), percentile(samples, 99), percentile([7], 99)) == (50, 99, 7)
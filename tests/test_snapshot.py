@@ -0,0 +1,72 @@
+import os
+import shutil
+import pytest
+from core import snapshot
+from core.config import settings
+from core.data_analyzer import DataAnalyzer
+
+@pytest.fixture
+def csv_copy(tmp_path):
+    path = tmp_path / 'data.csv'
+    shutil.copy(settings.csv_path, path)
+    return str(path)
+
+def test_snapshot_written_and_mapped(csv_copy):
+    cold = DataAnalyzer(csv_copy)
+    assert os.path.exists(snapshot.snapshot_path(csv_copy))
+    store = snapshot.load(csv_copy)
+    assert store is not None and store.mapped is not None
+    assert isinstance(store.numeric['Earnings_USD'], memoryview)
+    warm = DataAnalyzer(csv_copy)
+    assert warm.data.mapped is not None
+    assert warm.income_by_region() == cold.income_by_region()
+    assert warm.avg_hourly_rate_by('platform') == cold.avg_hourly_rate_by('platform')
+
+def test_stale_snapshot_is_rebuilt(csv_copy):
+    DataAnalyzer(csv_copy)
+    with open(csv_copy, 'a', encoding='utf-8') as f:
+        f.write('1951,Web Development,Fiverr,Expert,Asia,Crypto,10,100000,10,10,1,1,Fixed,10,0\n')
+    assert snapshot.load(csv_copy) is None
+    assert len(DataAnalyzer(csv_copy).data) == 1951
+    assert len(snapshot.load(csv_copy)) == 1951
+
+def test_invalid_counts_survive_warm_start(csv_copy, caplog):
+    with open(csv_copy, 'a', encoding='utf-8') as f:
+        f.write('1951,Web Development,Fiverr,Expert,Asia,Crypto,many,100000,10,10,1,1,Fixed,10,0\n')
+    cold = DataAnalyzer(csv_copy)
+    assert cold.data.invalid == {'Job_Completed': 1}
+    caplog.clear()
+    warm = DataAnalyzer(csv_copy)
+    assert warm.data.mapped is not None and warm.data.invalid == {'Job_Completed': 1}
+    assert 'Job_Completed: 1' in caplog.text
+
+def test_touched_csv_keeps_snapshot_by_hash(csv_copy):
+    DataAnalyzer(csv_copy)
+    stat = os.stat(csv_copy)
+    os.utime(csv_copy, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert snapshot.load(csv_copy) is not None
+
+@pytest.mark.parametrize('damage', [
+    lambda raw: raw[:len(raw) // 2],
+    lambda raw: b'garbage' + raw[7:],
+    lambda raw: raw[:40] + b'\xff' * 8 + raw[48:],
+    lambda raw: b'',
+])
+def test_corrupt_snapshot_is_rebuilt(csv_copy, damage):
+    expected = DataAnalyzer(csv_copy).avg_income_by_category()
+    path = snapshot.snapshot_path(csv_copy)
+    with open(path, 'rb') as f:
+        raw = f.read()
+    with open(path, 'wb') as f:
+        f.write(damage(raw))
+    assert snapshot.load(csv_copy) is None
+    assert DataAnalyzer(csv_copy).avg_income_by_category() == expected
+    assert snapshot.load(csv_copy) is not None
+
+def test_append_to_mapped_store(csv_copy):
+    DataAnalyzer(csv_copy)
+    analyzer = DataAnalyzer(csv_copy)
+    analyzer.append([{'Earnings_USD': 1, 'Client_Region': 'Mars'}])
+    assert analyzer.data.mapped is None
+    assert len(analyzer.data) == 1951
+    assert 'Mars: 1.00 USD' in analyzer.income_by_region()
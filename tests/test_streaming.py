@@ -0,0 +1,57 @@
+import tracemalloc
+import pytest
+from core.config import settings
+from core.data_analyzer import DataAnalyzer, stream_memory_ceiling
+
+METHODS = [
+    'crypto_vs_other_income',
+    'income_by_region',
+    'percent_experts_lt_100_projects',
+    'top5_regions_by_experts',
+    'percent_high_rehire',
+    'avg_job_duration_by_platform',
+]
+
+def write_csv(path, rows):
+    with open(settings.csv_path, encoding='utf-8') as f:
+        header, *body = f.read().splitlines()
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(header + '\n')
+        for i in range(rows):
+            f.write(body[i % len(body)] + '\n')
+    return str(path)
+
+@pytest.fixture
+def small_chunks(monkeypatch):
+    monkeypatch.setattr(settings, 'stream_chunk_rows', 500)
+    return 500
+
+def test_streaming_matches_in_memory(small_chunks):
+    memory = DataAnalyzer(settings.csv_path)
+    stream = DataAnalyzer(settings.csv_path, streaming=True)
+    assert stream.row_count == 1950 and len(stream.data) == 0
+    for name in METHODS:
+        assert getattr(stream, name)() == getattr(memory, name)()
+    assert stream.avg_hourly_rate_by('region') == memory.avg_hourly_rate_by('region')
+    assert stream.percent_high_rehire(70) == memory.percent_high_rehire(70)
+
+def test_streaming_variance_matches_two_pass(small_chunks):
+    stream = DataAnalyzer(settings.csv_path, streaming=True)
+    memory = DataAnalyzer(settings.csv_path)
+    values = [v for v in memory.data.numeric['Hourly_Rate']]
+    mean = sum(values) / len(values)
+    expected = sum((v - mean) ** 2 for v in values) / len(values)
+    assert stream.aggregate('hourly_rate', 'var')[None] == pytest.approx(expected, rel=1e-12)
+
+def test_streaming_memory_is_flat(tmp_path, small_chunks):
+    peaks = []
+    for rows in (1500, 4500):
+        path = write_csv(tmp_path / f'{rows}.csv', rows)
+        tracemalloc.start()
+        analyzer = DataAnalyzer(path, streaming=True)
+        analyzer.percent_high_rehire(75)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        assert analyzer.row_count == rows
+    assert max(peaks) < stream_memory_ceiling(small_chunks)
+    assert peaks[1] < peaks[0] * 1.5
@@ -0,0 +1,73 @@
+import pytest
+from core import vectorized
+from core.columns import ColumnStore
+from core.config import settings
+from core.cube import AggregateCube
+from core.kernel import AggSpec, Predicate, scan
+from core.data_analyzer import DataAnalyzer
+from test_analyzer import TEST_DATA
+from test_cube import SPECS, as_tuples
+
+pytest.importorskip('numpy')
+
+# Пропуски, мусор и нули: пропуск не учитывается, positive отбрасывает нули
+ROWS = TEST_DATA + [
+    dict(TEST_DATA[0], Earnings_USD='', Hourly_Rate=0, Client_Region='IN'),
+    dict(TEST_DATA[1], Job_Duration_Days=None, Rehire_Rate='', Platform='Fiverr'),
+]
+
+VECTOR_SPECS = SPECS + [
+    AggSpec('hourly_rate', 'region', (Predicate('rehire_rate', '>', 20),)),
+    AggSpec('rehire_rate', 'experience', (Predicate('platform', '!=', 'Mars'),)),
+    AggSpec(None, 'platform', (Predicate('region', '==', 'Mars'),)),
+    AggSpec('job_duration', 'category', (Predicate('earnings', '<=', 900), Predicate('region', '!=', 'US'))),
+]
+
+
+class VectorAnalyzer(DataAnalyzer):
+    def __init__(self, data):
+        self.data = data
+
+
+def test_scan_matches_kernel():
+    store = ColumnStore.from_rows(ROWS)
+    for got, expected in zip(vectorized.scan(store, VECTOR_SPECS), scan(store, VECTOR_SPECS)):
+        assert as_tuples(got) == as_tuples(expected)
+        for key, stats in got.items():
+            assert stats.m2 == pytest.approx(expected[key].m2)
+
+
+def test_cube_fold_matches_python(monkeypatch):
+    store = ColumnStore.from_rows(ROWS)
+    monkeypatch.setattr(settings, 'scan_backend', 'numpy')
+    fast = AggregateCube(store)
+    monkeypatch.setattr(settings, 'scan_backend', 'python')
+    slow = AggregateCube(store)
+    for spec in SPECS:
+        assert as_tuples(fast.answer(spec)) == as_tuples(slow.answer(spec))
+
+
+def test_analyzer_reports_match(monkeypatch):
+    reports = {}
+    for backend in ('python', 'numpy'):
+        monkeypatch.setattr(settings, 'scan_backend', backend)
+        analyzer = VectorAnalyzer(ROWS)
+        reports[backend] = [
+            analyzer.income_by_region(), analyzer.percent_high_rehire(),
+            analyzer.avg_job_duration_by_platform(), analyzer.crypto_vs_other_income(),
+            analyzer.aggregate('hourly_rate', 'max', by='experience', where=[Predicate('earnings', '>', 600)]),
+        ]
+    assert reports['numpy'] == reports['python']
+
+
+def test_enabled_threshold_and_modes(monkeypatch):
+    monkeypatch.setattr(settings, 'scan_backend', 'auto')
+    monkeypatch.setattr(settings, 'vectorized_min_rows', 100)
+    assert not vectorized.enabled(99) and vectorized.enabled(100)
+    monkeypatch.setattr(settings, 'scan_backend', 'numpy')
+    assert vectorized.enabled(1)
+    monkeypatch.setattr(settings, 'scan_backend', 'python')
+    assert not vectorized.enabled(10 ** 9)
+    monkeypatch.setattr(settings, 'scan_backend', 'gpu')
+    with pytest.raises(ValueError):
+        vectorized.enabled(1)